@@ -1,14 +1,163 @@
+import asyncio
 import fastapi
+import hmac
+import json
 import logging
-import pandas as pd
+import numpy
+import os
+import time
 
+from challenge import metrics, profiling, schema
+from challenge.batcher import MicroBatcher
+from challenge.cache import PredictionCache
+from challenge.drift import DriftMonitor
+from challenge.encoder import FeatureEncoder
 from challenge.model import DelayModel
 from challenge.model_wrapper import ModelWrapper
-from challenge.utils import adjust_dummy_columns, get_dummy_representation
 
+PREDICT_MODE = os.environ.get("PREDICT_MODE", "lookup")
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "0"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "2"))
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+BULK_BLOCK_SIZE = int(os.environ.get("BULK_BLOCK_SIZE", "1000"))
+MAX_REQUEST_FLIGHTS = int(os.environ.get("MAX_REQUEST_FLIGHTS", "10000"))
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "0"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", "300"))
+DECISION_THRESHOLD = float(os.environ.get("DECISION_THRESHOLD", DelayModel.Probability_Threshold))
+if not 0.0 < DECISION_THRESHOLD < 1.0:
+    raise ValueError("DECISION_THRESHOLD must be between 0 and 1, got {}".format(DECISION_THRESHOLD))
+DRIFT_WINDOW_SECONDS = float(os.environ.get("DRIFT_WINDOW_SECONDS", "3600"))
+DRIFT_BUCKETS = int(os.environ.get("DRIFT_BUCKETS", "60"))
+DRIFT_PSI_THRESHOLD = float(os.environ.get("DRIFT_PSI_THRESHOLD", "0.2"))
+PROBABILITY_DECIMALS = 4
+PREDICTION_LINES = (b'{"predict":0}\n', b'{"predict":1}\n')
 
-model_wrapper = ModelWrapper()
+
+def encode_flights(flights) -> numpy.ndarray:
+    if PREDICT_MODE == "booster":
+        return feature_encoder.encode(flights)
+    return feature_encoder.encode_bitmask(flights)
+
+
+def encode_flight_columns(operators, flight_types, months) -> numpy.ndarray:
+    bitmasks = feature_encoder.encode_bitmask_columns(operators, flight_types, months)
+    if PREDICT_MODE == "booster":
+        return feature_encoder.decode_bitmasks(bitmasks)
+    return bitmasks
+
+
+def score_features(features: numpy.ndarray) -> numpy.ndarray:
+    prediction_model = ModelWrapper.get_model()
+    if PREDICT_MODE == "booster":
+        return prediction_model.predict_proba(features)
+    return prediction_model.predict_lookup_proba(features)
+
+
+def get_labels(probabilities: numpy.ndarray) -> numpy.ndarray:
+    return (probabilities > DECISION_THRESHOLD).astype(numpy.uint8)
+
+
+def record_drift(flights, labels: numpy.ndarray) -> None:
+    if drift_monitor is not None:
+        drift_monitor.record(flights, labels)
+
+
+def record_drift_columns(columns: dict, labels: numpy.ndarray) -> None:
+    if drift_monitor is not None:
+        drift_monitor.record_columns(columns, labels)
+
+
+def set_drift_reference(version: int) -> None:
+    drift_monitor.set_reference(ModelWrapper.get_model().get_reference())
+
+
+async def predict_features(features: numpy.ndarray) -> numpy.ndarray:
+    if prediction_batcher is not None:
+        return await prediction_batcher.submit(features)
+    return score_features(features)
+
+
+async def predict_features_cached(features: numpy.ndarray) -> numpy.ndarray:
+    """
+        Answers each distinct flight from the cache, scoring only the ones it misses.
+
+        Flights are cached by their encoded form, so flights that only differ in values
+        the model ignores share an entry.
+    """
+    version = ModelWrapper.get_model_version()
+    bitmasks = FeatureEncoder.get_bitmasks(features) if features.ndim == 2 else features
+    keys, first_rows, inverse = numpy.unique(bitmasks, return_index=True, return_inverse=True)
+    keys = keys.tolist()
+    predictions = prediction_cache.get_many(keys)
+    misses = [index for index, prediction in enumerate(predictions) if prediction is None]
+    if misses:
+        scored = (await predict_features(features[first_rows[misses]])).tolist()
+        for index, prediction in zip(misses, scored):
+            predictions[index] = prediction
+        prediction_cache.put_many([keys[index] for index in misses], scored, version)
+    return numpy.asarray(predictions, dtype=numpy.float32)[inverse]
+
+
+feature_encoder = FeatureEncoder(DelayModel.Top_10_Features, operators=DelayModel.Operators)
+prediction_batcher = None
+if BATCH_MAX_SIZE > 0:
+    prediction_batcher = MicroBatcher(score_features, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS / 1000.0)
+prediction_cache = None
+if RESPONSE_CACHE_SIZE > 0:
+    prediction_cache = PredictionCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS,
+                                       ModelWrapper.get_model_version())
+    ModelWrapper.add_swap_listener(prediction_cache.invalidate)
+drift_monitor = None
+if DRIFT_WINDOW_SECONDS > 0:
+    drift_monitor = DriftMonitor(DelayModel.Operators, DelayModel.Top_10_Features, DRIFT_WINDOW_SECONDS,
+                                 DRIFT_BUCKETS, DRIFT_PSI_THRESHOLD)
+    ModelWrapper.add_swap_listener(set_drift_reference)
+    if ModelWrapper.get_readiness()["state"] == "ready":
+        set_drift_reference(ModelWrapper.get_model_version())
 app = fastapi.FastAPI()
+BATCHER_STATS = metrics.REGISTRY.register(metrics.Gauge(
+    "predict_batcher", "Micro-batching queue depth, batch sizes and waiting times.", ("stat",)))
+CACHE_STATS = metrics.REGISTRY.register(metrics.Gauge(
+    "prediction_cache", "Prediction cache size, hits and misses.", ("stat",)))
+DRIFT_STATS = metrics.REGISTRY.register(metrics.Gauge(
+    "input_drift", "Population stability index of each flight column and share of flights predicted delayed, "
+                   "over the drift window and in the training data.", ("stat", "window")))
+
+
+def collect_batcher_stats() -> None:
+    if prediction_batcher is not None:
+        for stat, value in prediction_batcher.stats().items():
+            BATCHER_STATS.set(value, stat)
+
+
+def collect_cache_stats() -> None:
+    if prediction_cache is not None:
+        for stat, value in prediction_cache.stats().items():
+            CACHE_STATS.set(value, stat)
+
+
+def collect_drift_stats() -> None:
+    if drift_monitor is not None:
+        report = drift_monitor.report()
+        for window, rate in report["positive_rate"].items():
+            if rate is not None:
+                DRIFT_STATS.set(rate, "positive_rate", window)
+        for column in ("OPERA", "TIPOVUELO", "MES"):
+            if report[column]["psi"] is not None:
+                DRIFT_STATS.set(report[column]["psi"], "psi_" + column, "current")
+            for window, share in report[column]["uncovered"].items():
+                if share is not None:
+                    DRIFT_STATS.set(share, "uncovered_" + column, window)
+
+
+metrics.REGISTRY.add_collector(collect_batcher_stats)
+metrics.REGISTRY.add_collector(collect_cache_stats)
+metrics.REGISTRY.add_collector(collect_drift_stats)
+
+
+@app.on_event("startup")
+async def prepare_model() -> None:
+    ModelWrapper.start_initialize()
 
 
 @app.get("/health", status_code=200)
@@ -18,24 +167,265 @@ async def get_health() -> dict:
     }
 
 
-@app.post("/predict", status_code=200, response_model=dict)
-async def post_predict(request: fastapi.Request, response: fastapi.Response) -> dict:
-    prediction_model = ModelWrapper.get_model()
+@app.get("/ready", status_code=200)
+async def get_ready(response: fastapi.Response) -> dict:
+    """
+        Tells whether the model is ready to serve predictions, answering 503 while it is
+        loading or if preparing it failed. /health only tells that the process is up.
+    """
+    readiness = ModelWrapper.get_readiness()
+    if readiness["state"] != "ready":
+        response.status_code = 503
+    return dict(readiness, version=ModelWrapper.get_model_version())
+
+
+@app.get("/stats/batching", status_code=200)
+async def get_batching_stats() -> dict:
+    if prediction_batcher is None:
+        return {"enabled": False}
+    return dict(enabled=True, **prediction_batcher.stats())
+
+
+@app.get("/stats/cache", status_code=200)
+async def get_cache_stats() -> dict:
+    if prediction_cache is None:
+        return {"enabled": False}
+    return dict(enabled=True, **prediction_cache.stats())
+
+
+@app.get("/stats/drift", status_code=200)
+async def get_drift_stats() -> dict:
+    """
+        Compares the flights scored over the last DRIFT_WINDOW_SECONDS with the ones the model
+        was fitted on: the share of each operator, flight type and month and their population
+        stability index, the share of values the model has no feature for, and the share of
+        flights predicted delayed.
+    """
+    if drift_monitor is None:
+        return {"enabled": False}
+    return dict(enabled=True, **drift_monitor.report())
+
+
+@app.get("/metrics", status_code=200)
+async def get_metrics() -> fastapi.Response:
+    return fastapi.Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def get_admin_error(request: fastapi.Request) -> tuple:
+    """ Checks the X-Admin-Token header; admin endpoints are disabled unless ADMIN_TOKEN is set
+
+        Returns:
+            tuple: the status code and body to reject the request with, or None when it is allowed.
+    """
+    if not ADMIN_TOKEN:
+        return 404, {"error": "Admin endpoints are disabled; set ADMIN_TOKEN to enable them"}
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", "").encode(), ADMIN_TOKEN.encode()):
+        return 403, {"error": "Invalid admin token"}
+    return None
+
+
+@app.post("/admin/reload", status_code=202)
+async def post_reload(request: fastapi.Request, response: fastapi.Response) -> dict:
+    admin_error = get_admin_error(request)
+    if admin_error is not None:
+        response.status_code, body = admin_error
+        return body
+    if not ModelWrapper.start_reload():
+        response.status_code = 409
+    return ModelWrapper.get_reload_status()
+
+
+@app.get("/admin/reload", status_code=200)
+async def get_reload(request: fastapi.Request, response: fastapi.Response) -> dict:
+    admin_error = get_admin_error(request)
+    if admin_error is not None:
+        response.status_code, body = admin_error
+        return body
+    return ModelWrapper.get_reload_status()
+
+
+@app.post("/predict", status_code=200, response_model=dict,
+          openapi_extra={"requestBody": schema.get_predict_request_schema(DelayModel.Operators, MAX_REQUEST_FLIGHTS)})
+async def post_predict(request: fastapi.Request, response: fastapi.Response,
+                       output: str = fastapi.Query("label", regex="^(label|probability)$")) -> dict:
+    """
+        Predicts whether each flight will be delayed, as 0 or 1 in 'predict'. With
+        output=probability, the probability of each delay is returned in 'probability' too;
+        flights are predicted delayed when it is above DECISION_THRESHOLD.
+
+        Requests sent as msgpack or Arrow (see schema.get_flight_columns) are answered in the
+        same format, and with 415 when its library is not installed.
+    """
+    with_probabilities = output == "probability"
+    request_format = schema.get_format(request.headers.get("content-type"))
+    predict = predict_flights if request_format == schema.JSON_FORMAT else predict_flight_columns
+    if not profiling.should_profile(request):
+        return await predict(request, response, with_probabilities)
+    with profiling.RequestProfiler("predict") as profiler:
+        result = await predict(request, response, with_probabilities)
+    if profiler.profile_id is not None:
+        # Binary requests answer with a Response of their own, which the injected one does not reach.
+        headers = result.headers if isinstance(result, fastapi.Response) else response.headers
+        headers[profiling.PROFILE_ID_HEADER] = profiler.profile_id
+    return result
+
+
+async def predict_flights(request: fastapi.Request, response: fastapi.Response,
+                          with_probabilities: bool = False) -> dict:
     result = []
+    probabilities = None
+    if ModelWrapper.get_model() is None:
+        logging.error("Received a prediction request before the model is ready; rejecting")
+        response.status_code = 503
+        return {'predict': result}
+    started = time.perf_counter()
     try:
-        request_json = await request.json()
-    except BaseException as be:
-        logging.error("Found error in json input: %s, skipping", str(be))
+        flights = schema.get_flights(await request.body(), MAX_REQUEST_FLIGHTS)
+    except ValueError as error:
+        logging.error("Found error in json input: %s, skipping", str(error))
         response.status_code = 400
-        request_json = None
-    if request_json:
-        dataframe_input = pd.DataFrame(request_json['flights'])
-        is_input_ok = DelayModel.validate_input(dataframe_input)
-        if is_input_ok:
-            features = get_dummy_representation(dataframe_input)
-            processed_input = adjust_dummy_columns(features, DelayModel.Top_10_Features)
-            predicted_target = prediction_model.predict(processed_input)
-            result = [int(x) for x in predicted_target]
-        else:
+        flights = None
+    parsed = time.perf_counter()
+    metrics.PREDICT_STAGE_SECONDS.observe(parsed - started, "parse")
+    if flights:
+        try:
+            features = encode_flights(flights)
+        except ValueError as error:
+            logging.error("Found invalid prediction request: %s; aborting", str(error))
             response.status_code = 400
+        else:
+            encoded = time.perf_counter()
+            metrics.PREDICT_STAGE_SECONDS.observe(encoded - parsed, "encode")
+            probabilities = await score_encoded(features)
+            labels = get_labels(probabilities)
+            record_drift(flights, labels)
+            result = labels.tolist()
+            metrics.PREDICT_STAGE_SECONDS.observe(
+                time.perf_counter() - encoded, "score" if prediction_batcher is None else "batch_and_score")
+    if with_probabilities:
+        if probabilities is None:
+            return {'predict': result, 'probability': []}
+        return {'predict': result,
+                'probability': numpy.round(probabilities.astype(numpy.float64), PROBABILITY_DECIMALS).tolist()}
     return {'predict': result}
+
+
+async def score_encoded(features: numpy.ndarray) -> numpy.ndarray:
+    metrics.PREDICT_BATCH_SIZE.observe(len(features))
+    if prediction_cache is not None:
+        return await predict_features_cached(features)
+    return await predict_features(features)
+
+
+async def predict_flight_columns(request: fastapi.Request, response: fastapi.Response,
+                                 with_probabilities: bool = False):
+    """
+        Predicts the flights of a binary request, decoded into columns and encoded a column at
+        a time. Errors are answered as json, as for json requests.
+    """
+    if ModelWrapper.get_model() is None:
+        logging.error("Received a prediction request before the model is ready; rejecting")
+        response.status_code = 503
+        return {'predict': []}
+    request_format = schema.get_format(request.headers.get("content-type"))
+    started = time.perf_counter()
+    try:
+        operators, flight_types, months = schema.get_flight_columns(await request.body(), request_format,
+                                                                    MAX_REQUEST_FLIGHTS)
+        parsed = time.perf_counter()
+        metrics.PREDICT_STAGE_SECONDS.observe(parsed - started, "parse")
+        features = encode_flight_columns(operators, flight_types, months)
+    except schema.UnsupportedMediaType as error:
+        logging.error("Cannot read prediction request: %s", str(error))
+        response.status_code = 415
+        return {'predict': [], 'error': str(error)}
+    except ValueError as error:
+        logging.error("Found invalid prediction request: %s; aborting", str(error))
+        response.status_code = 400
+        return {'predict': []}
+    encoded = time.perf_counter()
+    metrics.PREDICT_STAGE_SECONDS.observe(encoded - parsed, "encode")
+    probabilities = numpy.zeros(0, dtype=numpy.float32)
+    if len(features):
+        probabilities = await score_encoded(features)
+    labels = get_labels(probabilities)
+    metrics.PREDICT_STAGE_SECONDS.observe(
+        time.perf_counter() - encoded, "score" if prediction_batcher is None else "batch_and_score")
+    record_drift_columns({"OPERA": operators, "TIPOVUELO": flight_types, "MES": months}, labels)
+    return fastapi.Response(
+        schema.encode_predictions(request_format, labels, probabilities if with_probabilities else None),
+        media_type=schema.MEDIA_TYPES[request_format])
+
+
+class BodyStreamingResponse(fastapi.responses.StreamingResponse):
+    """
+        A streaming response for endpoints that keep reading the request body while they answer.
+
+        StreamingResponse listens for the client disconnecting on the same channel the body
+        arrives on, which would swallow the body; this one only streams.
+    """
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
+
+async def read_lines(request: fastapi.Request):
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+async def score_block(flights) -> bytes:
+    """
+        Encodes and scores a block of bulk flights off the event loop, so a large upload does not
+        hold up other requests. Blocks go through the batcher and the cache when they are enabled,
+        as /predict requests do, and are scored on the default executor otherwise.
+    """
+    loop = asyncio.get_running_loop()
+    features = await loop.run_in_executor(None, encode_flights, flights)
+    if prediction_batcher is None and prediction_cache is None:
+        probabilities = await loop.run_in_executor(None, score_features, features)
+    else:
+        probabilities = await score_encoded(features)
+    labels = get_labels(probabilities)
+    record_drift(flights, labels)
+    return b"".join(PREDICTION_LINES[label] for label in labels.tolist())
+
+
+async def stream_predictions(request: fastapi.Request):
+    block = []
+    line_number = 0
+    try:
+        async for line in read_lines(request):
+            line_number += 1
+            if not line.strip():
+                continue
+            block.append(schema.decode_json(line))
+            if len(block) >= BULK_BLOCK_SIZE:
+                yield await score_block(block)
+                block = []
+        if block:
+            yield await score_block(block)
+    except ValueError as error:
+        logging.error("Found invalid bulk prediction request near line %d: %s; aborting", line_number, str(error))
+        yield json.dumps({"error": str(error), "line": line_number}).encode() + b"\n"
+
+
+@app.post("/predict/bulk", status_code=200)
+async def post_predict_bulk(request: fastapi.Request) -> fastapi.Response:
+    """
+        Scores flights sent as newline delimited json, one flight per line, in blocks of
+        BULK_BLOCK_SIZE. Predictions are streamed back as they are produced, one line per
+        flight and in the same order. An invalid line ends the stream with an error line.
+    """
+    if ModelWrapper.get_model() is None:
+        return fastapi.responses.JSONResponse({"error": "The model is not ready"}, status_code=503)
+    return BodyStreamingResponse(stream_predictions(request), media_type="application/x-ndjson")
+
+
+app.add_middleware(metrics.MetricsMiddleware, paths=[route.path for route in app.routes])
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+
+import numpy
+
+
+class MicroBatcher:
+    """
+        Coalesces concurrent prediction requests into batches that are scored in a single call.
+
+        Requests wait on a queue until either max_batch_size flights are pending or the oldest
+        one has waited max_wait_seconds. The batch is then scored on a worker thread, so the
+        event loop keeps accepting requests, and every request gets back its own slice.
+    """
+
+    def __init__(
+        self,
+        score_function,
+        max_batch_size: int = 256,
+        max_wait_seconds: float = 0.002
+    ):
+        """
+            Args:
+                score_function (callable): scores encoded features, returning one prediction per row.
+                max_batch_size (int): amount of flights that closes a batch.
+                max_wait_seconds (float): longest a request waits for a batch to fill up.
+        """
+        self._score_function = score_function
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._loop = None
+        self._queue = None
+        self._worker = None
+        self._batches = 0
+        self._flights = 0
+        self._largest_batch = 0
+        self._wait_seconds = 0.0
+        self._longest_wait_seconds = 0.0
+
+    async def submit(
+        self,
+        features: numpy.ndarray
+    ) -> numpy.ndarray:
+        """
+            Queue encoded flights and wait for their predictions.
+
+            Args:
+                features (numpy.ndarray): encoded flights, one per row.
+
+            Returns:
+                numpy.ndarray: the predictions for those flights.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._start(loop)
+        future = loop.create_future()
+        self._queue.put_nowait((features, future, time.perf_counter()))
+        return await future
+
+    def stats(
+        self
+    ) -> dict:
+        """
+            Returns:
+                dict: queue depth, batch sizes and waiting times observed so far.
+        """
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self._batches,
+            "flights": self._flights,
+            "mean_batch_size": self._flights / self._batches if self._batches else 0.0,
+            "max_batch_size": self._largest_batch,
+            "mean_wait_ms": 1000.0 * self._wait_seconds / self._batches if self._batches else 0.0,
+            "max_wait_ms": 1000.0 * self._longest_wait_seconds
+        }
+
+    def _start(
+        self,
+        loop
+    ) -> None:
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._worker = loop.create_task(self._run())
+
+    async def _run(
+        self
+    ) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            pending_flights = len(batch[0][0])
+            deadline = self._loop.time() + self.max_wait_seconds
+            while pending_flights < self.max_batch_size:
+                if self._queue.empty():
+                    timeout = deadline - self._loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+                batch.append(item)
+                pending_flights += len(item[0])
+            await self._score(batch, pending_flights)
+
+    async def _score(
+        self,
+        batch: list,
+        flights: int
+    ) -> None:
+        started = time.perf_counter()
+        wait_seconds = started - batch[0][2]
+        self._batches += 1
+        self._flights += flights
+        self._largest_batch = max(self._largest_batch, flights)
+        self._wait_seconds += wait_seconds
+        self._longest_wait_seconds = max(self._longest_wait_seconds, wait_seconds)
+
+        try:
+            features = numpy.concatenate([item[0] for item in batch])
+            predictions = await self._loop.run_in_executor(None, self._score_function, features)
+        except Exception as error:
+            logging.error("Failed to score a batch of %d flights: %s", flights, str(error))
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        offset = 0
+        for item_features, future, _ in batch:
+            size = len(item_features)
+            if not future.done():
+                future.set_result(predictions[offset:offset + size])
+            offset += size
+        logging.debug("Scored a batch of %d flights from %d requests in %f seconds",
+                      flights, len(batch), time.perf_counter() - started)
@@ -0,0 +1,102 @@
+import collections
+import threading
+import time
+
+
+class PredictionCache:
+    """
+        Bounded LRU cache of predictions, with entries that expire after a while.
+
+        Entries belong to a model version: invalidate drops them all when the model is
+        replaced, and put_many ignores predictions made by any other version, so a request
+        that was scoring while the model was swapped cannot store stale predictions.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        version: int = 0,
+        clock=time.monotonic
+    ):
+        """
+            Args:
+                max_size (int): most entries kept; the least recently used go first.
+                ttl_seconds (float): seconds an entry stays valid.
+                version (int): model version the cache starts with.
+                clock (callable): returns the current time in seconds.
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._version = version
+        self._hits = 0
+        self._misses = 0
+
+    def get_many(
+        self,
+        keys
+    ) -> list:
+        """
+            Args:
+                keys (list): the keys to look up.
+
+            Returns:
+                list: the prediction of every key, or None when it is not cached.
+        """
+        now = self._clock()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or entry[1] <= now:
+                    if entry is not None:
+                        del self._entries[key]
+                    self._misses += 1
+                    values.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    values.append(entry[0])
+        return values
+
+    def put_many(
+        self,
+        keys,
+        values,
+        version: int
+    ) -> None:
+        """
+            Args:
+                keys (list): the keys to store.
+                values (list): the prediction of every key.
+                version (int): version of the model that made the predictions.
+        """
+        expires = self._clock() + self.ttl_seconds
+        with self._lock:
+            if version != self._version:
+                return
+            for key, value in zip(keys, values):
+                self._entries[key] = (value, expires)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(
+        self,
+        version: int
+    ) -> None:
+        """
+            Drops every entry, and from now on only accepts predictions of the given model version.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._version = version
+
+    def stats(
+        self
+    ) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self._hits, "misses": self._misses}
@@ -0,0 +1,297 @@
+import logging
+import math
+
+import numpy
+
+from challenge.model import DelayModel
+
+
+class TreeEnsemble:
+    """
+        A boosted tree ensemble flattened into node tables, evaluated with NumPy alone.
+
+        Every node of every tree is a row of the tables: the feature it splits on, its split
+        condition, its left child (XGBoost always puts the right child next to it) and, for
+        leaves, its value. Leaves have an infinite condition and default to the left, so a walk
+        that reached them stays there: all flights are walked down every tree at once for as
+        many steps as the deepest tree has levels.
+    """
+    Block_Elements = 1 << 16
+    Min_Distinct_Rows = 32
+
+    def __init__(
+        self,
+        split_indices: numpy.ndarray,
+        split_conditions: numpy.ndarray,
+        left_children: numpy.ndarray,
+        default_left: numpy.ndarray,
+        leaf_values: numpy.ndarray,
+        roots: numpy.ndarray,
+        depth: int,
+        base_margin: float
+    ):
+        self.split_indices = split_indices
+        self.split_conditions = split_conditions
+        self.left_children = left_children
+        self.default_left = default_left
+        self.leaf_values = leaf_values
+        self.roots = roots
+        self.depth = depth
+        self.base_margin = numpy.float32(base_margin)
+
+    @staticmethod
+    def from_booster_json(
+        booster: dict
+    ) -> "TreeEnsemble":
+        """
+            Builds the node tables from a booster saved as json, as save_raw(raw_format="json")
+            writes it and model artifacts hold it, without xgboost.
+
+            Only the trees up to the best iteration are kept when the booster stopped early.
+
+            Args:
+                booster (dict): the parsed json booster of a binary:logistic gbtree model.
+
+            Returns:
+                TreeEnsemble: the compiled trees.
+
+            Raises:
+                ValueError: if the booster uses something this evaluator does not implement.
+        """
+        learner = booster["learner"]
+        if learner["objective"]["name"] != "binary:logistic":
+            raise ValueError("Unsupported objective {}".format(learner["objective"]["name"]))
+        if learner["gradient_booster"]["name"] != "gbtree":
+            raise ValueError("Unsupported booster {}".format(learner["gradient_booster"]["name"]))
+        model = learner["gradient_booster"]["model"]
+        trees = model["trees"]
+        best_iteration = learner.get("attributes", {}).get("best_iteration")
+        if best_iteration is not None:
+            trees = trees[:model["iteration_indptr"][int(best_iteration) + 1]]
+
+        tables = {"split_indices": [], "split_conditions": [], "left_children": [], "default_left": [],
+                  "leaf_values": []}
+        roots = []
+        depth = 0
+        offset = 0
+        for tree in trees:
+            if any(tree["split_type"]):
+                raise ValueError("Categorical splits are not supported")
+            left = numpy.asarray(tree["left_children"], dtype=numpy.int64)
+            right = numpy.asarray(tree["right_children"], dtype=numpy.int64)
+            is_leaf = left == -1
+            if not numpy.array_equal(right[~is_leaf], left[~is_leaf] + 1):
+                raise ValueError("Tree {} has right children apart from their siblings".format(tree["id"]))
+            conditions = numpy.asarray(tree["split_conditions"], dtype=numpy.float32)
+            tables["split_indices"].append(numpy.where(is_leaf, 0, tree["split_indices"]))
+            tables["split_conditions"].append(numpy.where(is_leaf, numpy.inf, conditions))
+            tables["left_children"].append(numpy.where(is_leaf, numpy.arange(len(left)), left) + offset)
+            tables["default_left"].append(numpy.asarray(tree["default_left"], dtype=bool) | is_leaf)
+            tables["leaf_values"].append(numpy.where(is_leaf, conditions, 0))
+            roots.append(offset)
+            depth = max(depth, TreeEnsemble.get_depth(left, right))
+            offset += len(left)
+
+        dtypes = {"split_indices": numpy.intp, "split_conditions": numpy.float32, "left_children": numpy.intp,
+                  "default_left": bool, "leaf_values": numpy.float32}
+        arrays = {name: numpy.concatenate(values).astype(dtypes[name]) if values else numpy.zeros(0, dtypes[name])
+                  for name, values in tables.items()}
+        base_score = float(learner["learner_model_param"]["base_score"])
+        return TreeEnsemble(roots=numpy.asarray(roots, dtype=numpy.intp), depth=depth,
+                            base_margin=math.log(base_score / (1.0 - base_score)), **arrays)
+
+    @staticmethod
+    def get_depth(
+        left_children: numpy.ndarray,
+        right_children: numpy.ndarray
+    ) -> int:
+        """
+            Returns:
+                int: amount of splits on the longest path from the root to a leaf.
+        """
+        depth = 0
+        level = [0]
+        while True:
+            level = [child for node in level for child in (left_children[node], right_children[node]) if child != -1]
+            if not level:
+                return depth
+            depth += 1
+
+    def predict_margin(
+        self,
+        features: numpy.ndarray
+    ) -> numpy.ndarray:
+        """
+            Adds up the leaves every flight lands on, plus the base margin.
+
+            Identical rows land on the same leaves, and flights only encode into a few
+            distinct rows, so batches of more than Min_Distinct_Rows are deduplicated and
+            only their distinct rows are walked.
+
+            Args:
+                features (numpy.ndarray): matrix with one column per model feature.
+
+            Returns:
+                numpy.ndarray: the raw score of each flight, as float32.
+        """
+        features = numpy.ascontiguousarray(features, dtype=numpy.float32)
+        if len(features) <= TreeEnsemble.Min_Distinct_Rows or not features.shape[1]:
+            return self.walk(features)
+        rows = features.view(numpy.dtype((numpy.void, features.dtype.itemsize * features.shape[1]))).ravel()
+        _, first_rows, inverse = numpy.unique(rows, return_index=True, return_inverse=True)
+        return self.walk(features[first_rows])[inverse.ravel()]
+
+    def walk(
+        self,
+        features: numpy.ndarray
+    ) -> numpy.ndarray:
+        """
+            Walks every row down every tree, in blocks of about Block_Elements (row, tree)
+            pairs so that memory stays bounded.
+
+            Args:
+                features (numpy.ndarray): contiguous float32 matrix.
+
+            Returns:
+                numpy.ndarray: the raw score of each row, as float32.
+        """
+        margins = numpy.full(len(features), self.base_margin, dtype=numpy.float32)
+        if not len(self.roots):
+            return margins
+        has_missing = bool(numpy.isnan(features).any())
+        columns = features.shape[1]
+        block_rows = max(1, TreeEnsemble.Block_Elements // len(self.roots))
+        for start in range(0, len(features), block_rows):
+            block = features[start:start + block_rows].ravel()
+            row_offsets = numpy.arange(0, len(block), columns, dtype=numpy.intp)[:, None]
+            nodes = numpy.broadcast_to(self.roots, (len(row_offsets), len(self.roots)))
+            for _ in range(self.depth):
+                values = block.take(row_offsets + self.split_indices.take(nodes))
+                go_right = values >= self.split_conditions.take(nodes)
+                if has_missing:
+                    go_right = numpy.where(numpy.isnan(values), ~self.default_left.take(nodes), go_right)
+                nodes = self.left_children.take(nodes) + go_right
+            margins[start:start + block_rows] += self.leaf_values.take(nodes).sum(axis=1, dtype=numpy.float32)
+        return margins
+
+    def predict_proba(
+        self,
+        features: numpy.ndarray
+    ) -> numpy.ndarray:
+        """
+            Returns:
+                numpy.ndarray: probability of each flight being delayed, as float32.
+        """
+        margins = self.predict_margin(features)
+        return (1.0 / (1.0 + numpy.exp(-margins))).astype(numpy.float32)
+
+
+class CompiledDelayModel(DelayModel):
+    """
+        A DelayModel that predicts from a TreeEnsemble, so it never imports xgboost or sklearn.
+
+        It serves as DelayModel does (predict, predict_proba, predict_booster, evaluate and the
+        lookup table), but cannot be fitted or saved: build it with DelayModel.compile or load
+        it from an artifact written by DelayModel.save. The methods that need the booster raise
+        TypeError.
+    """
+
+    def __init__(
+        self,
+        ensemble: TreeEnsemble,
+        reference: dict = None,
+        class_counts: numpy.ndarray = None
+    ):
+        self._model = None
+        self._ensemble = ensemble
+        self._lookup_table = None
+        self._booster = None
+        self._reference = reference
+        self._class_counts = class_counts
+
+    def predict(
+        self,
+        features
+    ) -> list:
+        """
+        Predict delays for new flights, as XGBClassifier.predict does.
+
+        Returns:
+            (List[int]): predicted targets.
+        """
+        if hasattr(features, "to_numpy"):
+            features = features.to_numpy(dtype=numpy.float32)
+        return [int(label) for label in self.predict_booster(features)]
+
+    def predict_proba(
+        self,
+        features
+    ) -> numpy.ndarray:
+        """
+        Predict the probability of a delay with the compiled trees.
+
+        Returns:
+            (numpy.ndarray): probability of each flight being delayed.
+        """
+        if hasattr(features, "to_numpy"):
+            features = features.to_numpy(dtype=numpy.float32)
+        return self._ensemble.predict_proba(features)
+
+    def get_best_iteration(
+        self
+    ) -> None:
+        return None
+
+    def fit(self, *args, **kwargs):
+        raise CompiledDelayModel._get_unsupported_error("fit")
+
+    def fit_from_file(self, *args, **kwargs):
+        raise CompiledDelayModel._get_unsupported_error("fit_from_file")
+
+    def fit_incremental(self, *args, **kwargs):
+        raise CompiledDelayModel._get_unsupported_error("fit_incremental")
+
+    def get_params(self):
+        raise CompiledDelayModel._get_unsupported_error("get_params")
+
+    def save(self, *args, **kwargs):
+        raise CompiledDelayModel._get_unsupported_error("save")
+
+    def compile(self) -> "CompiledDelayModel":
+        return self
+
+    @staticmethod
+    def _get_unsupported_error(method: str) -> TypeError:
+        return TypeError("CompiledDelayModel.{} needs the booster, which a compiled model does not have; "
+                         "use DelayModel.load (MODEL_RUNTIME=xgboost) instead".format(method))
+
+    @staticmethod
+    def load(
+        artifact_location: str,
+        data_fingerprint: str = None,
+        data_location: str = None
+    ) -> "CompiledDelayModel":
+        """
+        Compile the booster of an artifact written by DelayModel.save.
+
+        Args:
+            artifact_location (str): path of the artifact file.
+            data_fingerprint (str, optional): if set, the artifact must have been
+                trained on data with this fingerprint.
+            data_location (str, optional): if set, and data_fingerprint is not, the artifact
+                must have been trained on this file, as DelayModel.read_artifact checks it.
+
+        Returns:
+            CompiledDelayModel: a model ready to predict.
+
+        Raises:
+            ValueError: if the artifact does not match the model definition or the data.
+        """
+        artifact = DelayModel.read_artifact(artifact_location, data_fingerprint, data_location)
+        class_counts = artifact.get("class_counts")
+        model = CompiledDelayModel(TreeEnsemble.from_booster_json(artifact["booster"]), artifact.get("reference"),
+                                   None if class_counts is None else numpy.array(class_counts, dtype=numpy.int64))
+        model.build_lookup_table()
+        logging.info("Compiled model artifact from %s into %d nodes", artifact_location,
+                     len(model._ensemble.left_children))
+        return model
@@ -0,0 +1,250 @@
+import collections
+import operator
+import threading
+import time
+
+import numpy
+
+from challenge.encoder import FeatureEncoder
+
+FLIGHT_COLUMNS = ("OPERA", "TIPOVUELO", "MES")
+OTHER_VALUE = "other"
+PSI_EPSILON = 1e-4
+
+
+def count_values(flights, column: str) -> dict:
+    """ Counts the values of one column of a list of flights, in a single pass in C """
+    return collections.Counter(map(operator.itemgetter(column), flights))
+
+
+def get_psi(current: numpy.ndarray, reference: numpy.ndarray) -> float:
+    """ Population stability index between two count vectors over the same values
+
+        Shares are floored at PSI_EPSILON so that values missing on one side count as
+        a large shift instead of an infinite one.
+    """
+    current_shares = numpy.maximum(current / max(current.sum(), 1), PSI_EPSILON)
+    reference_shares = numpy.maximum(reference / max(reference.sum(), 1), PSI_EPSILON)
+    return float(numpy.sum((current_shares - reference_shares) * numpy.log(current_shares / reference_shares)))
+
+
+class DriftMonitor:
+    """
+        Counts the flights /predict scores over a sliding window, in constant memory, and
+        compares them with the flights the model was fitted on.
+
+        The window is a ring of buckets of window_seconds / buckets seconds, each a fixed
+        list of counts: flights by operator, flight type and month (values outside the
+        known ones share an 'other' slot), flights predicted delayed and flights. Counts
+        are plain ints, which are cheaper to add to one at a time than an array. Recording
+        a request counts each column once and adds the result to the current bucket, which
+        is reset when the ring comes back to it. Values that have no column among the model
+        features, and so are encoded as zeros, are worked out from the counts when reporting.
+    """
+
+    def __init__(
+        self,
+        operators,
+        feature_names,
+        window_seconds: float,
+        buckets: int,
+        psi_threshold: float,
+        clock=time.monotonic
+    ):
+        """
+            Args:
+                operators (list[str]): the known operators, such as DelayModel.Operators.
+                feature_names (list[str]): the model columns, such as DelayModel.Top_10_Features.
+                window_seconds (float): length of the sliding window.
+                buckets (int): amount of buckets the window is split into.
+                psi_threshold (float): population stability index above which a column drifted.
+                clock (callable): returns the current time in seconds.
+        """
+        self.window_seconds = window_seconds
+        self.psi_threshold = psi_threshold
+        self._bucket_seconds = window_seconds / buckets
+        self._clock = clock
+        self._values = {
+            "OPERA": list(operators),
+            "TIPOVUELO": list(FeatureEncoder.Flight_Types),
+            "MES": list(range(FeatureEncoder.Min_Month, FeatureEncoder.Max_Month + 1))
+        }
+        self._slots = {}
+        self._column_slots = {}
+        size = 0
+        for column in FLIGHT_COLUMNS:
+            values = self._values[column] + [OTHER_VALUE]
+            self._slots[column] = {value: size + index for index, value in enumerate(values)}
+            self._column_slots[column] = slice(size, size + len(values))
+            size += len(values)
+        self._delayed_slot = size
+        self._flights_slot = size + 1
+        self._covered = {column: numpy.zeros(len(self._values[column]) + 1, dtype=bool) for column in FLIGHT_COLUMNS}
+        for name in feature_names:
+            column, value = name.split("_", 1)
+            values = [str(known) for known in self._values[column]]
+            if value in values:
+                self._covered[column][values.index(value)] = True
+
+        self._size = size + 2
+        self._counts = [[0] * self._size for _ in range(buckets)]
+        self._bucket_ids = [-1] * buckets
+        self._reference = None
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        flights,
+        labels: numpy.ndarray
+    ) -> None:
+        """
+            Counts a batch of valid flights and their predicted labels.
+
+            Args:
+                flights (list[dict]): flights with 'OPERA', 'TIPOVUELO' and 'MES' keys.
+                labels (numpy.ndarray): predicted delay of each flight, as 0 or 1.
+        """
+        self.record_counts({column: count_values(flights, column) for column in FLIGHT_COLUMNS}, labels)
+
+    def record_columns(
+        self,
+        columns: dict,
+        labels: numpy.ndarray
+    ) -> None:
+        """
+            Counts a batch of valid flights given as columns, such as binary requests decode into.
+
+            Args:
+                columns (dict): array of 'OPERA', 'TIPOVUELO' and 'MES' values.
+                labels (numpy.ndarray): predicted delay of each flight, as 0 or 1.
+        """
+        self.record_counts({column: collections.Counter(columns[column].tolist()) for column in FLIGHT_COLUMNS},
+                           labels)
+
+    def record_counts(
+        self,
+        value_counts: dict,
+        labels: numpy.ndarray
+    ) -> None:
+        counts = {self._delayed_slot: int(numpy.count_nonzero(labels)), self._flights_slot: len(labels)}
+        for column in FLIGHT_COLUMNS:
+            slots = self._slots[column]
+            other = slots[OTHER_VALUE]
+            for value, amount in value_counts[column].items():
+                slot = slots.get(value, other)
+                counts[slot] = counts.get(slot, 0) + amount
+        self.add_counts(list(counts), list(counts.values()))
+
+    def add_counts(
+        self,
+        slots: list,
+        amounts: list
+    ) -> None:
+        """
+            Adds amounts to distinct slots of the current bucket, starting it over when it is
+            left from a previous turn of the ring.
+        """
+        bucket_id = int(self._clock() // self._bucket_seconds)
+        index = bucket_id % len(self._bucket_ids)
+        with self._lock:
+            if self._bucket_ids[index] != bucket_id:
+                self._counts[index] = [0] * self._size
+                self._bucket_ids[index] = bucket_id
+            bucket = self._counts[index]
+            for slot, amount in zip(slots, amounts):
+                bucket[slot] += amount
+
+    def set_reference(
+        self,
+        reference: dict
+    ) -> None:
+        """
+            Args:
+                reference (dict): counts of the flights the model was fitted on, as
+                    DelayModel.get_reference returns them, or None when unknown.
+        """
+        if reference is None:
+            self._reference = None
+            return
+        counts = numpy.zeros(self._size, dtype=numpy.int64)
+        for column in FLIGHT_COLUMNS:
+            slots = {str(value): slot for value, slot in self._slots[column].items()}
+            other = slots[OTHER_VALUE]
+            for value, amount in reference[column].items():
+                counts[slots.get(str(value), other)] += amount
+        counts[self._delayed_slot] = reference["predicted_delayed"]
+        counts[self._flights_slot] = reference["flights"]
+        self._reference = counts
+
+    def get_window_counts(
+        self
+    ) -> numpy.ndarray:
+        """
+            Returns:
+                numpy.ndarray: counts of the buckets still inside the window.
+        """
+        current_id = int(self._clock() // self._bucket_seconds)
+        with self._lock:
+            buckets = [bucket for bucket_id, bucket in zip(self._bucket_ids, self._counts)
+                       if bucket_id > current_id - len(self._bucket_ids)]
+        return numpy.array(buckets, dtype=numpy.int64).reshape(-1, self._size).sum(axis=0)
+
+    def report(
+        self
+    ) -> dict:
+        """
+            Compares the flights in the window with the reference.
+
+            Returns:
+                dict: for every column, the share of each value in the window and in the
+                    reference, their population stability index and whether it is above
+                    psi_threshold; the share of flights whose value has no model feature; and
+                    the share of flights predicted delayed. Reference fields are None when
+                    the model has no reference.
+        """
+        counts = self.get_window_counts()
+        reference = self._reference
+        report = {
+            "window_seconds": self.window_seconds,
+            "flights": int(counts[self._flights_slot]),
+            "reference_flights": None if reference is None else int(reference[self._flights_slot]),
+            "positive_rate": {
+                "current": self._get_share(counts[self._delayed_slot], counts[self._flights_slot]),
+                "reference": None if reference is None else
+                self._get_share(reference[self._delayed_slot], reference[self._flights_slot])
+            },
+            "drifted": False
+        }
+        for column in FLIGHT_COLUMNS:
+            column_counts = counts[self._column_slots[column]]
+            labels = [str(value) for value in self._values[column]] + [OTHER_VALUE]
+            column_report = {
+                "current": self._get_shares(labels, column_counts),
+                "reference": None,
+                "uncovered": {"current": self._get_share(column_counts[~self._covered[column]].sum(),
+                                                         column_counts.sum()),
+                              "reference": None},
+                "psi": None,
+                "drifted": False
+            }
+            if reference is not None:
+                reference_counts = reference[self._column_slots[column]]
+                column_report["reference"] = self._get_shares(labels, reference_counts)
+                column_report["uncovered"]["reference"] = self._get_share(
+                    reference_counts[~self._covered[column]].sum(), reference_counts.sum())
+                if column_counts.sum():
+                    column_report["psi"] = get_psi(column_counts, reference_counts)
+                    column_report["drifted"] = column_report["psi"] > self.psi_threshold
+                    report["drifted"] = report["drifted"] or column_report["drifted"]
+            report[column] = column_report
+        return report
+
+    @staticmethod
+    def _get_share(amount, total):
+        return float(amount) / float(total) if total else None
+
+    @staticmethod
+    def _get_shares(labels, counts):
+        total = counts.sum()
+        return {label: float(amount) / total if total else 0.0
+                for label, amount in zip(labels, counts.tolist()) if amount or label != OTHER_VALUE}
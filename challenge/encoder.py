@@ -0,0 +1,283 @@
+import collections.abc
+import itertools
+import numpy
+
+
+class FeatureEncoder:
+    """
+        Maps raw flights straight into the one-hot features the model uses, without pandas.
+
+        The column each (prefix, value) pair lands on is resolved once, when the encoder
+        is built from the model's feature names. Values that have no column of their own
+        (operators or months outside the top features, national flights) leave the row at 0,
+        which is what get_dummy_representation followed by adjust_dummy_columns produces.
+        When the encoder is given the known operators, any other operator is invalid.
+    """
+    Flight_Types = ("I", "N")
+    Min_Month = 1
+    Max_Month = 12
+
+    def __init__(
+        self,
+        feature_names,
+        dtype=numpy.float32,
+        operators=None
+    ):
+        """
+            Args:
+                feature_names (list[str]): the model columns, such as DelayModel.Top_10_Features.
+                dtype (numpy.dtype): type of the encoded matrix.
+                operators (list[str]): the known operators, such as DelayModel.Operators; any
+                    non empty operator is accepted when None.
+        """
+        self.feature_names = list(feature_names)
+        self.dtype = dtype
+        self.operators = None if operators is None else frozenset(operators)
+        self._operator_columns = {}
+        self._flight_type_columns = {}
+        self._month_columns = {}
+        for index, name in enumerate(self.feature_names):
+            prefix, value = name.split("_", 1)
+            if prefix == "OPERA":
+                self._operator_columns[value] = index
+            elif prefix == "TIPOVUELO":
+                self._flight_type_columns[value] = index
+            elif prefix == "MES":
+                self._month_columns[int(value)] = index
+            else:
+                raise ValueError("Unsupported feature {}".format(name))
+
+    def encode(
+        self,
+        flights
+    ) -> numpy.ndarray:
+        """
+            Validates and encodes flights in a single pass.
+
+            Args:
+                flights (list[dict]): flights with 'OPERA', 'TIPOVUELO' and 'MES' keys.
+
+            Returns:
+                numpy.ndarray: a (len(flights), len(feature_names)) matrix of zeros and ones.
+
+            Raises:
+                ValueError: if any flight is not a reasonable prediction request.
+        """
+        features = numpy.zeros((len(flights), len(self.feature_names)), dtype=self.dtype)
+        for row, flight in enumerate(flights):
+            for column in self.get_columns(flight):
+                features[row, column] = 1
+        return features
+
+    def encode_bitmask(
+        self,
+        flights
+    ) -> numpy.ndarray:
+        """
+            Validates and encodes flights as bitmasks, where bit i is set when feature column i is 1.
+
+            Args:
+                flights (list[dict]): flights with 'OPERA', 'TIPOVUELO' and 'MES' keys.
+
+            Returns:
+                numpy.ndarray: one bitmask per flight.
+
+            Raises:
+                ValueError: if any flight is not a reasonable prediction request.
+        """
+        bitmasks = numpy.zeros(len(flights), dtype=numpy.uint32)
+        for row, flight in enumerate(flights):
+            bitmask = 0
+            for column in self.get_columns(flight):
+                bitmask |= 1 << column
+            bitmasks[row] = bitmask
+        return bitmasks
+
+    def get_valid_rows(
+        self,
+        operators,
+        flight_types,
+        months
+    ) -> numpy.ndarray:
+        """
+            Checks column-wise which flights are reasonable prediction requests.
+
+            Args:
+                operators (array-like): 'OPERA' of each flight.
+                flight_types (array-like): 'TIPOVUELO' of each flight.
+                months (array-like): 'MES' of each flight.
+
+            Returns:
+                numpy.ndarray: True for every valid flight.
+        """
+        operators = numpy.asarray(operators, dtype=object)
+        months = numpy.asarray(months)
+        if self.operators is None:
+            valid_rows = (operators != "") & (operators != None) & (operators == operators)  # noqa: E711
+        else:
+            valid_rows = FeatureEncoder.is_in(operators, self.operators)
+        valid_rows &= FeatureEncoder.is_in(numpy.asarray(flight_types, dtype=object),
+                                           frozenset(FeatureEncoder.Flight_Types))
+        if not numpy.issubdtype(months.dtype, numpy.integer):
+            return valid_rows & False
+        valid_rows &= (months >= FeatureEncoder.Min_Month) & (months <= FeatureEncoder.Max_Month)
+        return valid_rows
+
+    @staticmethod
+    def is_in(
+        values: numpy.ndarray,
+        known: frozenset
+    ) -> numpy.ndarray:
+        """
+            Checks which values are known, hashing them rather than sorting them as numpy.isin
+            does with object arrays (several times faster for columns of strings).
+
+            Returns:
+                numpy.ndarray: True for every known value.
+        """
+        try:
+            return numpy.fromiter(map(known.__contains__, values), dtype=bool, count=len(values))
+        except TypeError:
+            return numpy.array([isinstance(value, collections.abc.Hashable) and value in known for value in values],
+                               dtype=bool)
+
+    def encode_bitmask_columns(
+        self,
+        operators,
+        flight_types,
+        months,
+        validate: bool = True
+    ) -> numpy.ndarray:
+        """
+            Encodes flights given as columns into bitmasks, with one array operation per feature.
+
+            Args:
+                operators (array-like): 'OPERA' of each flight.
+                flight_types (array-like): 'TIPOVUELO' of each flight.
+                months (array-like): 'MES' of each flight.
+                validate (bool): whether to check the flights first.
+
+            Returns:
+                numpy.ndarray: one bitmask per flight, as encode_bitmask returns.
+
+            Raises:
+                ValueError: if validating and any flight is not a reasonable prediction request.
+        """
+        operators = numpy.asarray(operators, dtype=object)
+        flight_types = numpy.asarray(flight_types, dtype=object)
+        months = numpy.asarray(months)
+        if validate:
+            valid_rows = self.get_valid_rows(operators, flight_types, months)
+            if not valid_rows.all():
+                raise ValueError("Found {} invalid flights, the first one at row {}".format(
+                    int((~valid_rows).sum()), int(numpy.argmin(valid_rows))))
+
+        bitmasks = numpy.zeros(len(months), dtype=numpy.uint32)
+        for values, group_columns in ((operators, self._operator_columns),
+                                      (flight_types, self._flight_type_columns),
+                                      (months, self._month_columns)):
+            for value, column in group_columns.items():
+                bitmasks[values == value] |= numpy.uint32(1 << column)
+        return bitmasks
+
+    def decode_bitmasks(
+        self,
+        bitmasks: numpy.ndarray
+    ) -> numpy.ndarray:
+        """
+            Expands bitmasks back into the feature matrix encode would produce.
+
+            Args:
+                bitmasks (numpy.ndarray): encoded flights.
+
+            Returns:
+                numpy.ndarray: matrix of zeros and ones, one row per bitmask.
+        """
+        columns = numpy.arange(len(self.feature_names), dtype=numpy.uint32)
+        return ((numpy.asarray(bitmasks, dtype=numpy.uint32)[:, None] >> columns) & 1).astype(self.dtype)
+
+    @staticmethod
+    def get_bitmasks(
+        features: numpy.ndarray
+    ) -> numpy.ndarray:
+        """
+            Converts an encoded feature matrix into the bitmasks encode_bitmask would produce.
+
+            Args:
+                features (numpy.ndarray): matrix of zeros and ones.
+
+            Returns:
+                numpy.ndarray: one bitmask per row.
+        """
+        weights = numpy.left_shift(1, numpy.arange(features.shape[1], dtype=numpy.uint32))
+        return (features != 0).astype(numpy.uint32) @ weights
+
+    def get_reachable_features(
+        self
+    ) -> numpy.ndarray:
+        """
+            Enumerates every feature vector a valid flight can be encoded into.
+
+            Each flight sets at most one operator, one flight type and one month column,
+            and sets none of a group when its value has no column of its own.
+
+            Returns:
+                numpy.ndarray: one row per distinct reachable vector.
+        """
+        groups = []
+        for group_columns, valid_values in ((self._operator_columns, None),
+                                            (self._flight_type_columns, FeatureEncoder.Flight_Types),
+                                            (self._month_columns, range(FeatureEncoder.Min_Month,
+                                                                        FeatureEncoder.Max_Month + 1))):
+            options = list(group_columns.values())
+            if valid_values is None or any(value not in group_columns for value in valid_values):
+                options.append(None)
+            groups.append(options)
+
+        combinations = list(itertools.product(*groups))
+        features = numpy.zeros((len(combinations), len(self.feature_names)), dtype=self.dtype)
+        for row, combination in enumerate(combinations):
+            for column in combination:
+                if column is not None:
+                    features[row, column] = 1
+        return features
+
+    def get_columns(
+        self,
+        flight
+    ) -> list:
+        """
+            Validates a single flight and finds the feature columns it sets.
+
+            Args:
+                flight (dict): flight with 'OPERA', 'TIPOVUELO' and 'MES' keys.
+
+            Returns:
+                list[int]: indexes of the columns that are 1 for this flight.
+
+            Raises:
+                ValueError: if the flight is not a reasonable prediction request.
+        """
+        try:
+            operator = flight["OPERA"]
+            flight_type = flight["TIPOVUELO"]
+            month = flight["MES"]
+        except (KeyError, TypeError):
+            raise ValueError("Found incomplete flight: {}".format(flight))
+
+        if not operator or not isinstance(operator, str) \
+                or (self.operators is not None and operator not in self.operators):
+            raise ValueError("Found invalid operator: {}".format(operator))
+        if flight_type not in FeatureEncoder.Flight_Types:
+            raise ValueError("Found invalid flight type: {}".format(flight_type))
+        if isinstance(month, bool) or not isinstance(month, int) \
+                or not FeatureEncoder.Min_Month <= month <= FeatureEncoder.Max_Month:
+            raise ValueError("Found invalid month: {}".format(month))
+
+        columns = []
+        for column in (self._operator_columns.get(operator),
+                       self._flight_type_columns.get(flight_type),
+                       self._month_columns.get(month)):
+            if column is not None:
+                columns.append(column)
+        return columns
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Tuple, Union
+
+import numpy
+
+
+class FeatureStore:
+    """
+        Keeps encoded training features on disk, so raw data is only parsed once.
+
+        Each entry lives in its own directory, named after a hash of the source data
+        fingerprint and of the feature spec, and holds the feature matrix and target as
+        .npy files that are memory-mapped when read. Changing either the data or the
+        spec changes the key, so stale entries are never read, and saving an entry removes
+        all but the Max_Entries most recently used ones.
+    """
+    Max_Entries = 2
+    Features_File = "features.npy"
+    Target_File = "target.npy"
+    Metadata_File = "metadata.json"
+
+    def __init__(
+        self,
+        root: str
+    ):
+        """
+            Args:
+                root (str): directory holding the entries.
+        """
+        self.root = root
+
+    @staticmethod
+    def get_key(
+        data_fingerprint: str,
+        spec: dict
+    ) -> str:
+        """
+            Args:
+                data_fingerprint (str): fingerprint of the raw data.
+                spec (dict): everything the encoded features depend on besides the data.
+
+            Returns:
+                str: the key of the entry for that data and spec.
+        """
+        digest = hashlib.sha256(data_fingerprint.encode())
+        digest.update(json.dumps(spec, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def load(
+        self,
+        key: str
+    ) -> Union[Tuple[numpy.ndarray, numpy.ndarray], None]:
+        """
+            Args:
+                key (str): key of the entry.
+
+            Returns:
+                Tuple[numpy.ndarray, numpy.ndarray]: read-only, memory-mapped features and target,
+                or None if there is no such entry.
+        """
+        entry_dir = os.path.join(self.root, key)
+        if not os.path.exists(os.path.join(entry_dir, FeatureStore.Metadata_File)):
+            return None
+        try:
+            features = numpy.load(os.path.join(entry_dir, FeatureStore.Features_File), mmap_mode="r")
+            target = numpy.load(os.path.join(entry_dir, FeatureStore.Target_File), mmap_mode="r")
+        except (OSError, ValueError) as error:
+            logging.warning("Could not read feature store entry %s: %s", entry_dir, str(error))
+            return None
+        try:
+            os.utime(entry_dir)
+        except OSError:
+            pass
+        logging.info("Loaded %d cached rows from feature store entry %s", len(target), entry_dir)
+        return features, target
+
+    def save(
+        self,
+        key: str,
+        features: numpy.ndarray,
+        target: numpy.ndarray,
+        metadata: dict = None
+    ) -> None:
+        """
+            Writes an entry. It is assembled in a temporary directory and moved in place,
+            so concurrent readers either see the whole entry or none of it.
+
+            Args:
+                key (str): key of the entry.
+                features (numpy.ndarray): encoded feature matrix.
+                target (numpy.ndarray): target of each row.
+                metadata (dict, optional): extra information stored along the arrays.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        entry_dir = os.path.join(self.root, key)
+        temporary_dir = tempfile.mkdtemp(prefix=".{}.".format(key), dir=self.root)
+        try:
+            numpy.save(os.path.join(temporary_dir, FeatureStore.Features_File), features)
+            numpy.save(os.path.join(temporary_dir, FeatureStore.Target_File), target)
+            with open(os.path.join(temporary_dir, FeatureStore.Metadata_File), "w") as metadata_file:
+                json.dump(dict(metadata or {}, rows=len(target)), metadata_file)
+            os.rename(temporary_dir, entry_dir)
+            logging.info("Saved %d rows to feature store entry %s", len(target), entry_dir)
+        except OSError as error:
+            logging.warning("Could not save feature store entry %s: %s", entry_dir, str(error))
+            shutil.rmtree(temporary_dir, ignore_errors=True)
+            return
+        self.prune(FeatureStore.Max_Entries)
+
+    def prune(
+        self,
+        max_entries: int
+    ) -> list:
+        """
+            Removes all but the max_entries most recently saved or loaded entries, such as the
+            ones left by previous versions of the data. Entries still being written are kept.
+
+            Args:
+                max_entries (int): amount of entries to keep.
+
+            Returns:
+                list[str]: keys of the removed entries.
+        """
+        entries = []
+        for key in os.listdir(self.root):
+            entry_dir = os.path.join(self.root, key)
+            if key.startswith(".") or not os.path.isdir(entry_dir):
+                continue
+            try:
+                entries.append((os.path.getmtime(entry_dir), key))
+            except OSError:
+                continue
+        removed = [key for _, key in sorted(entries, reverse=True)[max_entries:]]
+        for key in removed:
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            logging.info("Removed stale feature store entry %s", os.path.join(self.root, key))
+        return removed
@@ -0,0 +1,246 @@
+import bisect
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                           0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(name, str(value).replace('"', '\\"')) for name, value in pairs) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    """
+        Base of the metrics below: a named family of values, one per combination of labels.
+    """
+    Type = None
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names=()
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(
+        self
+    ) -> list:
+        lines = ["# HELP {} {}".format(self.name, self.documentation), "# TYPE {} {}".format(self.name, self.Type)]
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in sorted(values):
+            lines.extend(self._render_value(label_values, value))
+        return lines
+
+    def _render_value(
+        self,
+        label_values,
+        value
+    ) -> list:
+        return ["{}{} {}".format(self.name, format_labels(self.label_names, label_values), format_value(value))]
+
+
+class Counter(Metric):
+    Type = "counter"
+
+    def inc(
+        self,
+        *label_values,
+        amount: float = 1
+    ) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    Type = "gauge"
+
+    def set(
+        self,
+        value: float,
+        *label_values
+    ) -> None:
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(Metric):
+    Type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names=(),
+        buckets=DEFAULT_LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(
+        self,
+        value: float,
+        *label_values
+    ) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(
+        self,
+        *label_values
+    ):
+        return Timer(self, label_values)
+
+    def _render_value(
+        self,
+        label_values,
+        value
+    ) -> list:
+        bucket_counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+            cumulative += bucket_count
+            lines.append("{}_bucket{} {}".format(
+                self.name, format_labels(self.label_names, label_values, ("le", format_value(bound))), cumulative))
+        labels = format_labels(self.label_names, label_values)
+        lines.append("{}_sum{} {}".format(self.name, labels, format_value(total)))
+        lines.append("{}_count{} {}".format(self.name, labels, count))
+        return lines
+
+
+class Timer:
+    """
+        Observes the seconds spent in a with block.
+    """
+
+    def __init__(
+        self,
+        histogram: Histogram,
+        label_values
+    ):
+        self._histogram = histogram
+        self._label_values = label_values
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._histogram.observe(time.perf_counter() - self._start, *self._label_values)
+
+
+class Registry:
+    """
+        Holds metrics and renders them in the Prometheus text format.
+
+        Collectors are called before rendering, to refresh values that are read rather
+        than updated as they change, such as queue depths.
+    """
+
+    def __init__(
+        self
+    ):
+        self._metrics = []
+        self._collectors = []
+
+    def register(
+        self,
+        metric: Metric
+    ) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(
+        self,
+        collector
+    ) -> None:
+        self._collectors.append(collector)
+
+    def render(
+        self
+    ) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by path and status code.", ("path", "status")))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Time to answer HTTP requests, by path.", ("path",)))
+PREDICT_BATCH_SIZE = REGISTRY.register(Histogram(
+    "predict_batch_size", "Flights in each prediction request.", buckets=DEFAULT_SIZE_BUCKETS))
+PREDICT_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "predict_stage_seconds", "Time spent in each stage of a prediction request.", ("stage",)))
+MODEL_BUILD_SECONDS = REGISTRY.register(Gauge(
+    "model_build_seconds", "Time it took to prepare the served model, by how it was prepared.", ("source",)))
+MODEL_VERSION = REGISTRY.register(Gauge(
+    "model_version", "Amount of times the served model was replaced."))
+
+
+class MetricsMiddleware:
+    """
+        ASGI middleware counting requests by path and status code and timing them.
+
+        Paths are labelled by their route, and any path without a route as "other", so
+        that unknown paths cannot grow the amount of series.
+    """
+
+    def __init__(
+        self,
+        app,
+        paths
+    ):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"] if scope["path"] in self.paths else "other"
+        status = [500]
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS.inc(path, status[0])
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, path)
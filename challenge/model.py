@@ -1,12 +1,19 @@
+import json
 import logging
+import math
 import numpy
+import os
 import pandas as pd
-import xgboost as xgb
 
-from sklearn.model_selection import train_test_split
-from typing import Tuple, Union, List
+from typing import TYPE_CHECKING, Tuple, Union, List
 
-from challenge.utils import get_dummy_representation, get_min_diff, reduce_features
+from challenge.encoder import FeatureEncoder
+from challenge.feature_store import FeatureStore
+from challenge.utils import get_dummy_representation, get_file_fingerprint, get_file_stat, get_min_diffs, \
+    read_flight_chunks, reduce_features
+
+if TYPE_CHECKING:
+    from challenge.compiled import CompiledDelayModel
 
 
 class DelayModel:
@@ -22,20 +29,50 @@ class DelayModel:
                         "OPERA_Sky Airline",
                         "OPERA_Copa Air"
                       ]
+    Operators = ("Aerolineas Argentinas", "Aeromexico", "Air Canada", "Air France", "Alitalia",
+                 "American Airlines", "Austral", "Avianca", "British Airways", "Copa Air", "Delta Air",
+                 "Gol Trans", "Grupo LATAM", "Iberia", "JetSmart SPA", "K.L.M.", "Lacsa",
+                 "Latin American Wings", "Oceanair Linhas Aereas", "Plus Ultra Lineas Aereas",
+                 "Qantas Airways", "Sky Airline", "United Airlines")
     Seed = 42
     Percentage_For_Testing = 0.33
+    Artifact_Version = 1
+    Max_Lookup_Features = 20
+    Chunk_Size = 100000
+    Feature_Spec_Version = 1
+    Default_Feature_Store = ".feature_store"
+    Probability_Threshold = 0.5
+    Inference_Threads = 1
+    Incremental_Rounds = 20
+    Runtime_Params = ("n_jobs", "nthread")
 
     def __init__(
-        self
+        self,
+        params: dict = None
     ):
-        random_state = 1
-        learning_rate = 0.01
-        scale_pos_weight = 4.4  # Default value, can be overwritten by fit
-        self._model = xgb.XGBClassifier(random_state=random_state,
-                                        learning_rate=learning_rate,
-                                        scale_pos_weight=scale_pos_weight)
-        logging.info("Set up model with seed %d, learning_rate %f, scale %f",
-                     random_state, learning_rate, scale_pos_weight)
+        """
+            Args:
+                params (dict, optional): XGBClassifier parameters, such as max_depth or
+                    n_estimators, overriding the defaults below.
+        """
+        # Imported here rather than with the module, so the API can start serving while
+        # xgboost loads along with the model.
+        import xgboost as xgb
+
+        model_params = {
+            "random_state": 1,
+            "learning_rate": 0.01,
+            "scale_pos_weight": 4.4  # Default value, can be overwritten by fit
+        }
+        model_params.update(params or {})
+        self._model = xgb.XGBClassifier(**model_params)
+        self._lookup_table = None
+        self._booster = None
+        self._iteration_range = (0, 0)
+        self._class_counts = None
+        self._reference = None
+        logging.info("Set up model with %s", ", ".join("{} {}".format(name, value)
+                                                        for name, value in sorted(model_params.items())))
 
     def preprocess(
         self,
@@ -54,7 +91,7 @@ class DelayModel:
             or
             pd.DataFrame: features.
         """
-        data['min_diff'] = data.apply(get_min_diff, axis=1)
+        data['min_diff'] = get_min_diffs(data)
         data['delay'] = numpy.where(data['min_diff'] > DelayModel.Delay_Threshold, 1, 0)
         logging.info("Processing data with %d rows, %d columns",
                      len(data), len(data.columns))
@@ -66,10 +103,70 @@ class DelayModel:
             return features, target
         return features
 
+    def preprocess_file(
+        self,
+        data_location: str,
+        target_column: str = None,
+        data_fingerprint: str = None
+    ) -> Union[Tuple[pd.DataFrame, pd.DataFrame], pd.DataFrame]:
+        """
+        Prepare the raw data in a csv file, reusing the features encoded on a previous run.
+
+        Encoded features and target are kept in a FeatureStore, located at FEATURE_STORE or
+        next to the data, keyed by the data fingerprint and get_feature_spec. The csv is only
+        parsed when there is no entry for both.
+
+        Args:
+            data_location (str): path to the raw data csv.
+            target_column (str, optional): if set, the target is returned.
+            data_fingerprint (str, optional): fingerprint of the data, if already known.
+
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: features and target.
+            or
+            pd.DataFrame: features.
+        """
+        feature_store = FeatureStore(os.environ.get(
+            "FEATURE_STORE",
+            os.path.join(os.path.dirname(os.path.abspath(data_location)), DelayModel.Default_Feature_Store)))
+        data_fingerprint = data_fingerprint or get_file_fingerprint(data_location)
+        key = FeatureStore.get_key(data_fingerprint, DelayModel.get_feature_spec())
+
+        cached = feature_store.load(key)
+        if cached is None:
+            data = pd.read_csv(filepath_or_buffer=data_location, low_memory=False)
+            features, target = self.preprocess(data=data, target_column="delay")
+            feature_store.save(key,
+                               features.to_numpy(dtype=numpy.uint8),
+                               target['delay'].to_numpy(dtype=numpy.uint8),
+                               metadata={"source": data_location,
+                                         "data_fingerprint": data_fingerprint,
+                                         "spec": DelayModel.get_feature_spec()})
+        else:
+            features = pd.DataFrame(cached[0], columns=DelayModel.Top_10_Features, copy=False)
+            target = pd.DataFrame({"delay": cached[1]})
+
+        if target_column:
+            return features, target
+        return features
+
+    @staticmethod
+    def get_feature_spec() -> dict:
+        """
+        Returns:
+            dict: everything preprocessed features depend on besides the raw data.
+        """
+        return {
+            "version": DelayModel.Feature_Spec_Version,
+            "features": DelayModel.Top_10_Features,
+            "delay_threshold": DelayModel.Delay_Threshold
+        }
+
     def fit(
         self,
         features: pd.DataFrame,
-        target: pd.DataFrame
+        target: pd.DataFrame,
+        early_stopping_rounds: int = None
     ) -> None:
         """
         Fit model with preprocessed data.
@@ -77,30 +174,267 @@ class DelayModel:
         Args:
             features (pd.DataFrame): preprocessed data.
             target (pd.DataFrame): target.
+            early_stopping_rounds (int, optional): stop adding trees once the log loss on the
+                held out split has not improved for this many rounds; predictions then use
+                the trees up to the best round.
         """
-        x_train, x_test, y_train, y_test = train_test_split(features, target,
-                                                            test_size=DelayModel.Percentage_For_Testing,
-                                                            random_state=DelayModel.Seed)
+        x_train, x_test, y_train, y_test = DelayModel.split(features, target)
         logging.info("Split data into %d training entries, %d testing entries",
                      len(y_train), len(y_test))
         normal_amount = len(target[target.delay == 0])
         delayed_amount = len(target[target.delay == 1])
+        self._update_scale_pos_weight(normal_amount, delayed_amount)
+        if early_stopping_rounds:
+            self._model.set_params(early_stopping_rounds=early_stopping_rounds, eval_metric="logloss")
+            self._model.fit(x_train, y_train, eval_set=[(x_test, y_test)], verbose=False)
+            logging.info("Stopped early at round %d", self.get_best_iteration())
+        else:
+            self._model.fit(x_train, y_train)
+        self.build_lookup_table()
+
+    def get_best_iteration(
+        self
+    ) -> Union[int, None]:
+        """
+        Returns:
+            (int): the round early stopping kept the trees up to, or None when fit did not stop early.
+        """
+        best_iteration = self._model.get_booster().attr("best_iteration")
+        return None if best_iteration is None else int(best_iteration)
+
+    @staticmethod
+    def split(
+        features: pd.DataFrame,
+        target: pd.DataFrame
+    ) -> list:
+        """
+        Split preprocessed data into the training and testing sets fit uses.
+
+        Returns:
+            list: training features, testing features, training target and testing target.
+        """
+        from sklearn.model_selection import train_test_split
+
+        return train_test_split(features, target,
+                                test_size=DelayModel.Percentage_For_Testing,
+                                random_state=DelayModel.Seed)
+
+    def fit_from_file(
+        self,
+        data_location: str,
+        chunk_size: int = None
+    ) -> None:
+        """
+        Fit model reading the raw data in chunks, so that memory does not grow with the file.
+
+        Only the columns the features depend on are read. Each chunk is encoded and reduced
+        to counts of (feature vector, delay) pairs; as flights only map to a few distinct
+        vectors, fitting on those vectors weighted by their counts grows the same trees
+        as fitting every row. Rows are held out for testing in the proportion fit uses.
+
+        Args:
+            data_location (str): path to the raw data csv.
+            chunk_size (int, optional): amount of rows read at a time.
+        """
+        encoder = FeatureEncoder(DelayModel.Top_10_Features)
+        generator = numpy.random.default_rng(DelayModel.Seed)
+        training_counts = numpy.zeros(2 << len(DelayModel.Top_10_Features), dtype=numpy.int64)
+        class_counts = numpy.zeros(2, dtype=numpy.int64)
+        for chunk in read_flight_chunks(data_location, chunk_size or DelayModel.Chunk_Size):
+            bitmasks = encoder.encode_bitmask_columns(chunk['OPERA'].to_numpy(),
+                                                      chunk['TIPOVUELO'].to_numpy(),
+                                                      chunk['MES'].to_numpy(),
+                                                      validate=False)
+            delay = (get_min_diffs(chunk).to_numpy() > DelayModel.Delay_Threshold).astype(numpy.int64)
+            class_counts += numpy.bincount(delay, minlength=2)
+            is_training = generator.random(len(chunk)) >= DelayModel.Percentage_For_Testing
+            training_counts += numpy.bincount(bitmasks[is_training].astype(numpy.int64) * 2 + delay[is_training],
+                                              minlength=len(training_counts))
+        logging.info("Read %d rows in chunks of %d from %s",
+                     class_counts.sum(), chunk_size or DelayModel.Chunk_Size, data_location)
+
+        keys = numpy.flatnonzero(training_counts)
+        features = pd.DataFrame(encoder.decode_bitmasks(keys // 2), columns=DelayModel.Top_10_Features)
+        self._update_scale_pos_weight(class_counts[0], class_counts[1])
+        self._model.fit(features, keys % 2, sample_weight=training_counts[keys])
+        self.build_lookup_table()
+
+    def fit_incremental(
+        self,
+        features: pd.DataFrame,
+        target: pd.DataFrame,
+        rounds: int = None
+    ) -> dict:
+        """
+        Continue boosting the fitted model with new flights only.
+
+        The new flights are split as fit splits the whole history, and trees are added on
+        their training part starting from the current booster (cut at its best round if fit
+        stopped early). scale_pos_weight is recomputed from the running class counts, so
+        the older flights are not read again.
+
+        Args:
+            features (pd.DataFrame): preprocessed new flights.
+            target (pd.DataFrame): target of the new flights.
+            rounds (int, optional): amount of trees to add; Incremental_Rounds by default.
+
+        Returns:
+            dict: metrics of the updated model on the held out part of the new flights, as evaluate.
+
+        Raises:
+            ValueError: if the model has no class counts, as models fitted before they were recorded.
+        """
+        if self._class_counts is None:
+            raise ValueError("The model has no class counts to update; fit it from scratch first")
+        x_train, x_test, y_train, y_test = DelayModel.split(features, target)
+        logging.info("Split new data into %d training entries, %d testing entries", len(y_train), len(y_test))
+        booster = self._model.get_booster()
+        best_iteration = self.get_best_iteration()
+        if best_iteration is not None:
+            booster = booster[:best_iteration + 1]
+        class_counts = self._class_counts + numpy.bincount(target["delay"].to_numpy(dtype=numpy.int64), minlength=2)
+        self._update_scale_pos_weight(class_counts[0], class_counts[1])
+        # Only this fit adds the incremental rounds; saved parameters keep the ones the model was tuned with.
+        params = self._model.get_params()
+        previous_params = {name: params[name] for name in ("n_estimators", "early_stopping_rounds")}
+        self._model.set_params(n_estimators=rounds or DelayModel.Incremental_Rounds, early_stopping_rounds=None)
+        try:
+            self._model.fit(x_train, y_train, xgb_model=booster)
+        finally:
+            self._model.set_params(**previous_params)
+        self.build_lookup_table()
+        logging.info("Added %d trees, the model has %d", rounds or DelayModel.Incremental_Rounds,
+                     self._model.get_booster().num_boosted_rounds())
+        return self.evaluate(x_test, y_test)
+
+    def evaluate(
+        self,
+        features: pd.DataFrame,
+        target: pd.DataFrame
+    ) -> dict:
+        """
+        Score the model on preprocessed flights it was not fitted on.
+
+        Returns:
+            dict: precision, recall and f1 of the delayed class, ROC AUC and log loss (negated,
+                so that higher is better for every metric).
+        """
+        from sklearn.metrics import log_loss, precision_recall_fscore_support, roc_auc_score
+
+        target = target["delay"].to_numpy()
+        probabilities = self.predict_proba(features)
+        labels = (probabilities > DelayModel.Probability_Threshold).astype(numpy.uint8)
+        precision, recall, f1, _ = precision_recall_fscore_support(target, labels, labels=[1], zero_division=0)
+        metrics = {
+            "precision_delayed": float(precision[0]),
+            "recall_delayed": float(recall[0]),
+            "f1_delayed": float(f1[0]),
+            "roc_auc": float("nan"),
+            "neg_log_loss": -float(log_loss(target, probabilities, labels=[0, 1]))
+        }
+        if len(numpy.unique(target)) == 2:
+            metrics["roc_auc"] = float(roc_auc_score(target, probabilities))
+        return metrics
+
+    def get_params(
+        self
+    ) -> dict:
+        """
+        Returns:
+            (dict): the XGBClassifier parameters that were set, such as the ones the parameter
+                search picked, leaving out those that cannot be written to json and the ones
+                in Runtime_Params, which depend on the machine rather than the model.
+        """
+        return {name: value for name, value in self._model.get_params().items()
+                if name not in DelayModel.Runtime_Params and (
+                    isinstance(value, (bool, int, str)) or (isinstance(value, float) and math.isfinite(value)))}
+
+    def get_class_counts(
+        self
+    ) -> Union[numpy.ndarray, None]:
+        """
+        Returns:
+            (numpy.ndarray): amount of regular and delayed flights the model was fitted on, so far,
+                or None if unknown.
+        """
+        return self._class_counts
+
+    def build_reference(
+        self,
+        data: pd.DataFrame,
+        update: bool = False
+    ) -> None:
+        """
+        Count the flights the model is fitted on by operator, flight type and month, and how
+        many of them it predicts delayed, as the reference serving traffic is compared with.
+
+        Args:
+            data (pd.DataFrame): raw flights with 'OPERA', 'TIPOVUELO' and 'MES' columns.
+            update (bool): add the flights to the current reference instead of replacing it.
+        """
+        reference = self._reference if update and self._reference is not None else {
+            "flights": 0, "predicted_delayed": 0, "OPERA": {}, "TIPOVUELO": {}, "MES": {}}
+        for column in ("OPERA", "TIPOVUELO", "MES"):
+            counts = reference[column]
+            for value, amount in data[column].value_counts().items():
+                if amount:
+                    counts[str(value)] = counts.get(str(value), 0) + int(amount)
+        bitmasks = FeatureEncoder(DelayModel.Top_10_Features).encode_bitmask_columns(
+            data['OPERA'].to_numpy(), data['TIPOVUELO'].to_numpy(), data['MES'].to_numpy(), validate=False)
+        reference["predicted_delayed"] += int(numpy.count_nonzero(self.predict_lookup(bitmasks)))
+        reference["flights"] += len(data)
+        self._reference = reference
+
+    def build_reference_from_file(
+        self,
+        data_location: str,
+        chunk_size: int = None
+    ) -> None:
+        """
+        Build the reference from a raw data csv, reading only the 'OPERA', 'TIPOVUELO' and 'MES'
+        columns a chunk at a time.
+
+        Args:
+            data_location (str): path to the raw data csv.
+            chunk_size (int, optional): amount of rows read at a time.
+        """
+        self._reference = None
+        for chunk in read_flight_chunks(data_location, chunk_size or DelayModel.Chunk_Size,
+                                        columns=["OPERA", "TIPOVUELO", "MES"]):
+            self.build_reference(chunk, update=True)
+
+    def get_reference(
+        self
+    ) -> Union[dict, None]:
+        """
+        Returns:
+            (dict): amount of flights and of flights predicted delayed, and counts of each operator,
+                flight type and month, of the data the model was fitted on, or None if unknown.
+        """
+        return self._reference
+
+    def _update_scale_pos_weight(
+        self,
+        normal_amount: int,
+        delayed_amount: int
+    ) -> None:
+        self._class_counts = numpy.array([normal_amount, delayed_amount], dtype=numpy.int64)
         scale = normal_amount / delayed_amount
         logging.debug("Amount of regular flights: %d, delayed flights: %d; calculated scale %f",
                       normal_amount, delayed_amount, scale)
         if scale > 1:
             self._model.scale_pos_weight = scale
-        self._model.fit(x_train, y_train)
 
     def predict(
         self,
-        features: pd.DataFrame
+        features: Union[pd.DataFrame, numpy.ndarray]
     ) -> List[int]:
         """
         Predict delays for new flights.
 
         Args:
-            features (pd.DataFrame): preprocessed data.
+            features (pd.DataFrame or numpy.ndarray): preprocessed data, such as the
+                output of FeatureEncoder.encode.
         
         Returns:
             (List[int]): predicted targets.
@@ -112,6 +446,135 @@ class DelayModel:
 
         return result
 
+    def predict_proba(
+        self,
+        features: Union[pd.DataFrame, numpy.ndarray]
+    ) -> numpy.ndarray:
+        """
+        Predict the probability of a delay, calling the booster directly on an encoded feature matrix.
+
+        Skips what XGBClassifier does around the booster (feature name checks, building a
+        DMatrix, converting every prediction): the matrix is handed to inplace_predict as
+        is when it is already contiguous float32, such as the output of FeatureEncoder.encode.
+
+        Args:
+            features (pd.DataFrame or numpy.ndarray): matrix with the Top_10_Features columns, in order.
+
+        Returns:
+            (numpy.ndarray): probability of each flight being delayed.
+        """
+        if self._booster is None:
+            booster = self._model.get_booster()
+            booster.set_param({"nthread": DelayModel.Inference_Threads})
+            best_iteration = self.get_best_iteration()
+            self._iteration_range = (0, 0) if best_iteration is None else (0, best_iteration + 1)
+            self._booster = booster
+        if isinstance(features, pd.DataFrame):
+            features = features.to_numpy(dtype=numpy.float32)
+        features = numpy.ascontiguousarray(features, dtype=numpy.float32)
+        return self._booster.inplace_predict(features, iteration_range=self._iteration_range,
+                                             validate_features=False)
+
+    def predict_booster(
+        self,
+        features: numpy.ndarray,
+        threshold: float = None
+    ) -> numpy.ndarray:
+        """
+        Predict delays with predict_proba, thresholding the probabilities in NumPy.
+
+        Args:
+            features (numpy.ndarray): matrix with the Top_10_Features columns, in order.
+            threshold (float, optional): probability above which a flight is predicted
+                delayed; Probability_Threshold by default.
+
+        Returns:
+            (numpy.ndarray): predicted targets, as 0 or 1.
+        """
+        if threshold is None:
+            threshold = DelayModel.Probability_Threshold
+        return (self.predict_proba(features) > threshold).astype(numpy.uint8)
+
+    def build_lookup_table(
+        self
+    ) -> None:
+        """
+        Score every reachable feature vector once, so that predictions become table lookups.
+
+        Flights only vary in operator, flight type and month, so there are few distinct
+        feature vectors. They are scored in a single batch and stored in a dense table
+        indexed by the bitmask of their features; the table is checked against the
+        booster's own predictions before it is used.
+
+        Raises:
+            RuntimeError: if the table disagrees with the booster.
+        """
+        self._booster = None
+        if len(DelayModel.Top_10_Features) > DelayModel.Max_Lookup_Features:
+            raise ValueError("Too many features for a lookup table: {}".format(len(DelayModel.Top_10_Features)))
+        encoder = FeatureEncoder(DelayModel.Top_10_Features)
+        reachable_features = encoder.get_reachable_features()
+        probabilities = self.predict_proba(reachable_features)
+
+        lookup_table = numpy.full(1 << len(DelayModel.Top_10_Features), numpy.nan, dtype=numpy.float32)
+        lookup_table[FeatureEncoder.get_bitmasks(reachable_features)] = probabilities
+
+        expected = numpy.asarray(self.predict(reachable_features))
+        labels = (probabilities > DelayModel.Probability_Threshold).astype(expected.dtype)
+        if not numpy.array_equal(expected, labels):
+            raise RuntimeError("Lookup table does not match the model predictions")
+        self._lookup_table = lookup_table
+        logging.info("Built lookup table for %d reachable feature vectors", len(reachable_features))
+
+    def predict_lookup(
+        self,
+        bitmasks: numpy.ndarray,
+        threshold: float = None
+    ) -> numpy.ndarray:
+        """
+        Predict delays for flights encoded with FeatureEncoder.encode_bitmask, without calling the booster.
+
+        Args:
+            bitmasks (numpy.ndarray): encoded flights.
+            threshold (float, optional): probability above which a flight is predicted
+                delayed; Probability_Threshold by default.
+
+        Returns:
+            (numpy.ndarray): predicted targets, as 0 or 1.
+        """
+        if threshold is None:
+            threshold = DelayModel.Probability_Threshold
+        return (self.predict_lookup_proba(bitmasks) > threshold).astype(numpy.uint8)
+
+    def predict_lookup_proba(
+        self,
+        bitmasks: numpy.ndarray
+    ) -> numpy.ndarray:
+        """
+        Predict the probability of a delay for flights encoded with FeatureEncoder.encode_bitmask,
+        without calling the booster.
+
+        Args:
+            bitmasks (numpy.ndarray): encoded flights.
+
+        Returns:
+            (numpy.ndarray): probability of each flight being delayed.
+        """
+        return self.get_lookup_table()[bitmasks]
+
+    def get_lookup_table(
+        self
+    ) -> numpy.ndarray:
+        """
+        Returns:
+            (numpy.ndarray): probability of a delay for every bitmask, NaN for bitmasks no flight
+                encodes into. Indexing it is all predict_lookup_proba does, so it can be handed
+                to other processes to score flights without the booster.
+        """
+        if self._lookup_table is None:
+            self.build_lookup_table()
+        return self._lookup_table
+
     @staticmethod
     def validate_input(data):
         """
@@ -146,3 +609,157 @@ class DelayModel:
             return False
 
         return True
+
+    def save(
+        self,
+        artifact_location: str,
+        data_fingerprint: str = None,
+        data_stat: dict = None
+    ) -> None:
+        """
+        Persist the fitted model so that it can be loaded without retraining.
+
+        The artifact is a single json file holding the booster along with the
+        classifier parameters, the feature order, the delay threshold and the
+        fingerprint of the data used to train it, along with the size and modification
+        time of the data file, so that loading can skip hashing it when they did not
+        change. It is written to a temporary file and then moved in place, so readers
+        never see a partially written artifact.
+
+        Args:
+            artifact_location (str): path of the artifact file.
+            data_fingerprint (str, optional): fingerprint of the training data.
+            data_stat (dict, optional): size and modification time of the training data file,
+                as get_file_stat returns them, taken before its fingerprint.
+        """
+        booster = json.loads(bytes(self._model.get_booster().save_raw(raw_format="json")))
+        artifact = {
+            "artifact_version": DelayModel.Artifact_Version,
+            "features": DelayModel.Top_10_Features,
+            "delay_threshold": DelayModel.Delay_Threshold,
+            "data_fingerprint": data_fingerprint,
+            "data_stat": data_stat if data_fingerprint is not None else None,
+            "class_counts": None if self._class_counts is None else self._class_counts.tolist(),
+            "reference": self._reference,
+            "params": self.get_params(),
+            "booster": booster
+        }
+        artifact_dir = os.path.dirname(artifact_location)
+        if artifact_dir:
+            os.makedirs(artifact_dir, exist_ok=True)
+        temporary_location = "{}.{}.tmp".format(artifact_location, os.getpid())
+        with open(temporary_location, "w") as artifact_file:
+            json.dump(artifact, artifact_file)
+        os.replace(temporary_location, artifact_location)
+        logging.info("Saved model artifact to %s", artifact_location)
+
+    @staticmethod
+    def load(
+        artifact_location: str,
+        data_fingerprint: str = None,
+        data_location: str = None
+    ) -> "DelayModel":
+        """
+        Build a model from an artifact written by save.
+
+        Args:
+            artifact_location (str): path of the artifact file.
+            data_fingerprint (str, optional): if set, the artifact must have been
+                trained on data with this fingerprint.
+            data_location (str, optional): if set, and data_fingerprint is not, the artifact
+                must have been trained on this file, as read_artifact checks it.
+
+        Returns:
+            DelayModel: a model ready to predict.
+
+        Raises:
+            ValueError: if the artifact does not match the model definition or the data.
+        """
+        artifact = DelayModel.read_artifact(artifact_location, data_fingerprint, data_location)
+        model = DelayModel(artifact.get("params"))
+        model._model.load_model(bytearray(json.dumps(artifact["booster"]).encode()))
+        if artifact.get("class_counts") is not None:
+            model._class_counts = numpy.array(artifact["class_counts"], dtype=numpy.int64)
+        model._reference = artifact.get("reference")
+        model.build_lookup_table()
+        logging.info("Loaded model artifact from %s", artifact_location)
+        return model
+
+    @staticmethod
+    def read_artifact(
+        artifact_location: str,
+        data_fingerprint: str = None,
+        data_location: str = None
+    ) -> dict:
+        """
+        Read an artifact written by save, checking that it can be served.
+
+        When data_location is given instead of data_fingerprint, the data file is only hashed
+        if its size or modification time differ from the ones recorded in the artifact, so
+        that loading does not take longer as the history grows.
+
+        Raises:
+            ValueError: if the artifact does not match the model definition or the data.
+        """
+        with open(artifact_location) as artifact_file:
+            artifact = json.load(artifact_file)
+        if data_fingerprint is None and data_location is not None:
+            data_stat = get_file_stat(data_location)
+            if artifact.get("data_fingerprint") is not None and artifact.get("data_stat") == data_stat:
+                data_fingerprint = artifact["data_fingerprint"]
+            else:
+                logging.info("%s changed since %s was saved; hashing it", data_location, artifact_location)
+                data_fingerprint = get_file_fingerprint(data_location)
+        if not DelayModel.is_artifact_compatible(artifact, data_fingerprint):
+            raise ValueError("Artifact {} does not match the current model definition".format(
+                artifact_location))
+        return artifact
+
+    def compile(
+        self
+    ) -> "CompiledDelayModel":
+        """
+        Export the fitted trees into NumPy node tables, as a model that predicts without xgboost.
+
+        Returns:
+            CompiledDelayModel: a model with the same predictions, reference and class counts.
+
+        Raises:
+            RuntimeError: if the compiled trees do not reproduce the booster's probabilities.
+        """
+        from challenge.compiled import CompiledDelayModel, TreeEnsemble
+
+        booster = json.loads(bytes(self._model.get_booster().save_raw(raw_format="json")))
+        compiled = CompiledDelayModel(TreeEnsemble.from_booster_json(booster), self._reference, self._class_counts)
+        reachable_features = FeatureEncoder(DelayModel.Top_10_Features).get_reachable_features()
+        if not numpy.allclose(compiled.predict_proba(reachable_features), self.predict_proba(reachable_features),
+                              rtol=0, atol=1e-6):
+            raise RuntimeError("Compiled trees do not match the booster")
+        compiled.build_lookup_table()
+        return compiled
+
+    @staticmethod
+    def is_artifact_compatible(
+        metadata: dict,
+        data_fingerprint: str = None
+    ) -> bool:
+        """
+        Checks that an artifact was produced for the current model definition.
+
+        Args:
+            metadata (dict): the artifact metadata.
+            data_fingerprint (str, optional): if set, the artifact must have been
+                trained on data with this fingerprint.
+
+        Returns:
+            bool: True if the artifact can be served, False otherwise
+        """
+        if metadata.get("artifact_version") != DelayModel.Artifact_Version:
+            return False
+        if metadata.get("features") != DelayModel.Top_10_Features:
+            return False
+        if metadata.get("delay_threshold") != DelayModel.Delay_Threshold:
+            return False
+        if data_fingerprint is not None and metadata.get("data_fingerprint") != data_fingerprint:
+            return False
+        return True
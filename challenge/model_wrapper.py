@@ -1,13 +1,30 @@
+import logging
 import os
-import pandas as pd
+import threading
+import time
 
+import numpy
+
+from challenge.compiled import CompiledDelayModel
+from challenge.encoder import FeatureEncoder
+from challenge.metrics import MODEL_BUILD_SECONDS, MODEL_VERSION
 from challenge.model import DelayModel
+from challenge.utils import get_file_fingerprint, get_file_stat
 
 
 class ModelWrapper:
     DEFAULT_REPO_ROOT = "/home/pablo/Documents/latamLab/mllabpabloliva/"
+    DEFAULT_ARTIFACT = "artifacts/delay_model.json"
+    RUNTIMES = ("xgboost", "compiled")
 
     __shared_model = None
+    __model_version = 0
+    __reload_lock = threading.Lock()
+    __reload_status = {"state": "idle", "error": None}
+    __swap_listeners = []
+    __initialize_lock = threading.Lock()
+    __initialize_started = False
+    __readiness = {"state": "loading", "error": None}
 
     def __init__(self):
         if ModelWrapper.__shared_model is None:
@@ -15,22 +32,206 @@ class ModelWrapper:
 
     @staticmethod
     def initialize_model():
-        ModelWrapper.__shared_model = DelayModel()
+        """
+            Prepares the shared model, unless it is already prepared. When another thread is
+            preparing it, waits for that thread instead.
+        """
+        ModelWrapper.__initialize_started = True
+        with ModelWrapper.__initialize_lock:
+            if ModelWrapper.__shared_model is not None:
+                return
+            ModelWrapper.__readiness = {"state": "loading", "error": None}
+            try:
+                model = ModelWrapper.build_model()
+            except Exception as error:
+                logging.error("Failed to prepare the model: %s", str(error))
+                ModelWrapper.__readiness = {"state": "failed", "error": str(error)}
+                raise
+            ModelWrapper.__swap_model(model)
+            ModelWrapper.__readiness = {"state": "ready", "error": None}
+
+    @staticmethod
+    def start_initialize():
+        """
+            Prepares the shared model on a background thread, so the caller (the API startup)
+            does not wait for it. get_readiness tells when it is done.
+        """
+        if ModelWrapper.__shared_model is not None:
+            return
+        ModelWrapper.__initialize_started = True
+
+        def initialize():
+            try:
+                ModelWrapper.initialize_model()
+            except Exception:
+                pass
+
+        threading.Thread(target=initialize, name="model-initialize", daemon=True).start()
+
+    @staticmethod
+    def build_model() -> DelayModel:
+        """
+            Loads the model artifact, or trains a model and saves it when there is no artifact
+            for the current data. The data is only hashed to check the artifact when its size
+            or modification time changed since the artifact was saved. With
+            MODEL_RUNTIME=compiled, the model predicts from its trees compiled into NumPy node
+            tables, and loading an artifact does not import xgboost.
+
+            Returns:
+                DelayModel: a model ready to predict.
+        """
+        started = time.perf_counter()
         root_path = os.environ.get("REPO_ROOT", ModelWrapper.DEFAULT_REPO_ROOT)
         data_location = os.path.join(root_path, "data/data.csv")
-        assert os.path.exists(data_location)
-        data = pd.read_csv(filepath_or_buffer=data_location, low_memory=False)
+        artifact_location = os.environ.get("MODEL_ARTIFACT",
+                                           os.path.join(root_path, ModelWrapper.DEFAULT_ARTIFACT))
+        runtime = os.environ.get("MODEL_RUNTIME", "xgboost")
+        if runtime not in ModelWrapper.RUNTIMES:
+            raise ValueError("MODEL_RUNTIME must be one of {}, got {}".format(
+                ", ".join(ModelWrapper.RUNTIMES), runtime))
+        has_data = os.path.exists(data_location)
+
+        if os.path.exists(artifact_location):
+            checked_data = data_location if has_data else None
+            try:
+                if runtime == "compiled":
+                    model = CompiledDelayModel.load(artifact_location, data_location=checked_data)
+                else:
+                    model = DelayModel.load(artifact_location, data_location=checked_data)
+                MODEL_BUILD_SECONDS.set(time.perf_counter() - started, "artifact")
+                return model
+            except (OSError, ValueError) as error:
+                logging.warning("Discarding model artifact %s: %s", artifact_location, str(error))
+
+        model = DelayModel()
+        assert has_data
+        data_stat = get_file_stat(data_location)
+        data_fingerprint = get_file_fingerprint(data_location)
+        chunk_size = int(os.environ.get("TRAINING_CHUNK_SIZE", "0"))
+        if chunk_size > 0:
+            model.fit_from_file(data_location, chunk_size)
+        else:
+            features, target = model.preprocess_file(
+                data_location=data_location,
+                target_column="delay",
+                data_fingerprint=data_fingerprint
+            )
+
+            model.fit(
+                features=features,
+                target=target
+            )
+        model.build_reference_from_file(data_location, chunk_size or None)
+
+        try:
+            model.save(artifact_location, data_fingerprint, data_stat)
+        except OSError as error:
+            logging.warning("Could not save model artifact %s: %s", artifact_location, str(error))
+        if runtime == "compiled":
+            model = model.compile()
+        MODEL_BUILD_SECONDS.set(time.perf_counter() - started, "training")
+        return model
+
+    @staticmethod
+    def reload_model():
+        """
+            Builds a new model, warms it up and only then replaces the shared one.
+
+            Requests that already got hold of the previous model finish with it.
+        """
+        with ModelWrapper.__reload_lock:
+            ModelWrapper.__reload()
+
+    @staticmethod
+    def start_reload() -> bool:
+        """
+            Reloads the model on a background thread.
 
-        features, target = ModelWrapper.__shared_model.preprocess(
-            data=data,
-            target_column="delay"
-        )
+            Returns:
+                bool: False if a reload was already in progress, True otherwise.
+        """
+        if not ModelWrapper.__reload_lock.acquire(blocking=False):
+            return False
 
-        ModelWrapper.__shared_model.fit(
-            features=features,
-            target=target
-        )
+        def reload():
+            try:
+                ModelWrapper.__reload()
+            except Exception:
+                pass
+            finally:
+                ModelWrapper.__reload_lock.release()
+
+        threading.Thread(target=reload, name="model-reload", daemon=True).start()
+        return True
+
+    @staticmethod
+    def warm_up(model: DelayModel):
+        """
+            Scores a canary batch with every reachable flight through both prediction paths.
+
+            Raises:
+                RuntimeError: if the paths disagree.
+        """
+        reachable_features = FeatureEncoder(DelayModel.Top_10_Features).get_reachable_features()
+        booster_prediction = numpy.asarray(model.predict(reachable_features))
+        lookup_prediction = model.predict_lookup(FeatureEncoder.get_bitmasks(reachable_features))
+        native_prediction = model.predict_booster(reachable_features)
+        if not numpy.array_equal(booster_prediction, lookup_prediction) \
+                or not numpy.array_equal(booster_prediction, native_prediction):
+            raise RuntimeError("Canary predictions of the new model are inconsistent")
+
+    @staticmethod
+    def add_swap_listener(listener):
+        """
+            Registers a function called with the new model version every time the model is replaced.
+        """
+        ModelWrapper.__swap_listeners.append(listener)
+
+    @staticmethod
+    def get_readiness() -> dict:
+        """
+            Returns:
+                dict: state of the first model preparation, loading, ready or failed, and its error.
+        """
+        return dict(ModelWrapper.__readiness)
+
+    @staticmethod
+    def get_reload_status() -> dict:
+        return dict(ModelWrapper.__reload_status, version=ModelWrapper.__model_version)
+
+    @staticmethod
+    def get_model_version() -> int:
+        return ModelWrapper.__model_version
 
     @staticmethod
     def get_model():
+        """
+            Returns:
+                DelayModel: the shared model. It is prepared on the spot when nobody started
+                preparing it; while it is being prepared in the background, this is None.
+        """
+        if ModelWrapper.__shared_model is None and not ModelWrapper.__initialize_started:
+            ModelWrapper.initialize_model()
         return ModelWrapper.__shared_model
+
+    @staticmethod
+    def __reload():
+        ModelWrapper.__reload_status = {"state": "reloading", "error": None}
+        try:
+            model = ModelWrapper.build_model()
+            ModelWrapper.warm_up(model)
+        except Exception as error:
+            logging.error("Failed to reload the model, keeping the current one: %s", str(error))
+            ModelWrapper.__reload_status = {"state": "failed", "error": str(error)}
+            raise
+        ModelWrapper.__swap_model(model)
+        ModelWrapper.__reload_status = {"state": "idle", "error": None}
+
+    @staticmethod
+    def __swap_model(model: DelayModel):
+        ModelWrapper.__shared_model = model
+        ModelWrapper.__model_version += 1
+        MODEL_VERSION.set(ModelWrapper.__model_version)
+        for listener in ModelWrapper.__swap_listeners:
+            listener(ModelWrapper.__model_version)
+        logging.info("Serving model version %d", ModelWrapper.__model_version)
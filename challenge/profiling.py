@@ -0,0 +1,113 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+
+PROFILING_ENABLED = os.environ.get("PROFILING", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "reports/profiles")
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY = "profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 20
+
+_profile_lock = threading.Lock()
+
+
+def should_profile(request) -> bool:
+    """
+        Decides whether to profile a request. Requests are only profiled when PROFILING is 1,
+        either because they ask for it with the X-Profile header or the profile query
+        parameter, or because they are sampled at PROFILE_SAMPLE_RATE.
+
+        Args:
+            request (fastapi.Request): the incoming request.
+
+        Returns:
+            bool: True if the request should be profiled.
+    """
+    if not PROFILING_ENABLED:
+        return False
+    if request.headers.get(PROFILE_HEADER) == "1" or request.query_params.get(PROFILE_QUERY) in ("1", "true"):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+class RequestProfiler:
+    """
+        Captures a CPU profile and the allocations of the code run inside a with block.
+
+        On exit the profile is written to PROFILE_DIR as <id>.prof, readable with pstats or
+        snakeviz, along with <id>.txt, a summary of the slowest functions and the lines
+        that allocated the most memory. Only one block is profiled at a time: a second one
+        entered meanwhile is not profiled itself and its profile_id stays None.
+
+        cProfile only sees the thread that entered the block, and both it and tracemalloc
+        stay on across awaits, so when the block awaits, other requests run on the event loop
+        in the meantime show up in the profile, while work handed to other threads, such as
+        the batcher's executor, does not.
+    """
+
+    def __init__(
+        self,
+        name: str
+    ):
+        self.name = name
+        self.profile_id = None
+        self.summary = None
+        self._profiler = None
+        self._started = None
+
+    def __enter__(self):
+        if not _profile_lock.acquire(blocking=False):
+            return self
+        self.profile_id = "{}-{}-{}".format(self.name, time.strftime("%Y%m%d-%H%M%S"), uuid.uuid4().hex[:8])
+        tracemalloc.start()
+        self._profiler = cProfile.Profile()
+        self._started = time.perf_counter()
+        self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.profile_id is None:
+            return
+        try:
+            self._profiler.disable()
+            elapsed = time.perf_counter() - self._started
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.summary = self._write(elapsed, snapshot, peak)
+        except OSError as error:
+            logging.error("Could not write profile %s: %s", self.profile_id, str(error))
+        finally:
+            _profile_lock.release()
+
+    def _write(
+        self,
+        elapsed: float,
+        snapshot,
+        peak: int
+    ) -> str:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base_location = os.path.join(PROFILE_DIR, self.profile_id)
+        self._profiler.dump_stats(base_location + ".prof")
+
+        functions = io.StringIO()
+        pstats.Stats(self._profiler, stream=functions).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        allocations = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)]) \
+            .statistics("lineno")[:TOP_ALLOCATIONS]
+        summary = "{} took {:.6f} seconds, peak traced memory {:.3f} MB\n\n{}\nTop allocations:\n{}\n".format(
+            self.profile_id, elapsed, peak / (1 << 20), functions.getvalue(),
+            "\n".join(str(statistic) for statistic in allocations))
+        with open(base_location + ".txt", "w") as summary_file:
+            summary_file.write(summary)
+        logging.info("Wrote profile %s", base_location)
+        return summary
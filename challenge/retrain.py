@@ -0,0 +1,237 @@
+import argparse
+import concurrent.futures
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+from challenge.model import DelayModel
+from challenge.model_wrapper import ModelWrapper
+from challenge.utils import get_file_fingerprint, get_file_stat
+
+PARAMETER_GRID = {
+    "max_depth": [3, 4, 6],
+    "learning_rate": [0.01, 0.05, 0.1],
+    "min_child_weight": [1, 5],
+    "subsample": [0.8, 1.0]
+}
+MAX_ESTIMATORS = 1000
+EARLY_STOPPING_ROUNDS = 50
+SELECTION_METRICS = ("f1_delayed", "recall_delayed", "roc_auc", "neg_log_loss")
+
+# Preprocessed data of each worker process, loaded once by load_worker_data.
+_worker_data = {}
+
+
+def get_candidates(grid: dict, search: str, trials: int, seed: int) -> list:
+    """ Lists the parameter sets to try: every combination of the grid, or a sample of them
+
+        Args:
+            grid (dict): values to try for each parameter.
+            search (str): 'grid' or 'random'.
+            trials (int): amount of combinations sampled by the random search.
+            seed (int): seed of the random search.
+
+        Returns:
+            list[dict]: parameter sets.
+    """
+    names = sorted(grid)
+    candidates = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    if search == "random" and trials < len(candidates):
+        candidates = random.Random(seed).sample(candidates, trials)
+    return candidates
+
+
+def load_worker_data(data_location: str, data_fingerprint: str) -> None:
+    """ Loads the preprocessed data of a worker from the feature store, memory-mapped, so
+        every worker reads the same pages and nothing is preprocessed again
+    """
+    features, target = DelayModel().preprocess_file(data_location, target_column="delay",
+                                                    data_fingerprint=data_fingerprint)
+    _worker_data["features"] = features
+    _worker_data["target"] = target
+
+
+def evaluate(model: DelayModel, features, target) -> dict:
+    """ Scores a fitted model on the split fit held out, as DelayModel.evaluate """
+    _, x_test, _, y_test = DelayModel.split(features, target)
+    return model.evaluate(x_test, y_test)
+
+
+def get_model_params(params: dict, threads: int) -> dict:
+    return dict(params, n_estimators=MAX_ESTIMATORS, n_jobs=threads)
+
+
+def run_trial(params: dict, early_stopping_rounds: int) -> dict:
+    """ Fits and scores a model with one parameter set, on the data of the worker """
+    started = time.perf_counter()
+    model = DelayModel(get_model_params(params, threads=1))
+    model.fit(_worker_data["features"], _worker_data["target"], early_stopping_rounds=early_stopping_rounds)
+    return {
+        "params": params,
+        "metrics": evaluate(model, _worker_data["features"], _worker_data["target"]),
+        "best_iteration": model.get_best_iteration(),
+        "seconds": time.perf_counter() - started
+    }
+
+
+def search(data_location: str, candidates: list, workers: int, early_stopping_rounds: int) -> list:
+    """ Runs every trial across a pool of processes
+
+        The data is preprocessed into the feature store before the pool starts, so each
+        worker only memory-maps it; every worker fits with a single thread, so the search
+        takes less time the more cores there are.
+
+        Returns:
+            list[dict]: params, metrics, best iteration and seconds of every trial.
+    """
+    data_fingerprint = get_file_fingerprint(data_location)
+    DelayModel().preprocess_file(data_location, target_column="delay", data_fingerprint=data_fingerprint)
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                                initializer=load_worker_data,
+                                                initargs=(data_location, data_fingerprint)) as executor:
+        futures = [executor.submit(run_trial, params, early_stopping_rounds) for params in candidates]
+        results = []
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            logging.info("Trial %s: %s in %.1fs", result["params"], result["metrics"], result["seconds"])
+            results.append(result)
+    return results
+
+
+def get_best(results: list, metric: str) -> dict:
+    """ Picks the trial with the highest metric, leaving out trials whose metric is not finite
+
+        A metric can be NaN, as roc_auc is when the held out split has a single class, and
+        max would then pick an arbitrary trial.
+
+        Raises:
+            ValueError: if no trial has a finite metric.
+    """
+    scored = [result for result in results if math.isfinite(result["metrics"][metric])]
+    if not scored:
+        raise ValueError("No trial has a finite {}; check that the held out data has both classes".format(metric))
+    if len(scored) < len(results):
+        logging.warning("Left out %d trials whose %s is not finite", len(results) - len(scored), metric)
+    return max(scored, key=lambda result: result["metrics"][metric])
+
+
+def retrain_incremental(data_location: str, artifact_location: str, rounds: int) -> dict:
+    """ Continues the saved model with the rows appended to the data since it was fitted
+
+        The data is expected to only grow at its end: the model's class counts tell how many
+        rows it has seen, and only the rows after them are read and preprocessed. The
+        artifact is replaced only when there are new rows.
+
+        Returns:
+            dict: amount of rows seen before and added, and the metrics on the held out part
+                of the new rows, or None for the metrics when there was nothing to add.
+
+        Raises:
+            ValueError: if the data has fewer rows than the model has seen.
+    """
+    model = DelayModel.load(artifact_location)
+    class_counts = model.get_class_counts()
+    if class_counts is None:
+        raise ValueError("Artifact {} has no class counts; retrain it from scratch".format(artifact_location))
+    seen_rows = int(class_counts.sum())
+    data = pd.read_csv(data_location, skiprows=range(1, seen_rows + 1), low_memory=False)
+    summary = {"seen_rows": seen_rows, "new_rows": len(data), "rounds": rounds, "metrics": None}
+    if data.empty:
+        with open(data_location) as data_file:
+            total_rows = sum(1 for _ in data_file) - 1
+        if total_rows < seen_rows:
+            raise ValueError("{} has {} rows, fewer than the {} the model has seen".format(
+                data_location, total_rows, seen_rows))
+        logging.info("No new rows in %s since the model was fitted", data_location)
+        return summary
+    features, target = model.preprocess(data, target_column="delay")
+    summary["metrics"] = model.fit_incremental(features, target, rounds=rounds)
+    if model.get_reference() is not None:
+        model.build_reference(data, update=True)
+    data_stat = get_file_stat(data_location)
+    model.save(artifact_location, get_file_fingerprint(data_location), data_stat)
+    return summary
+
+
+def write_report(report: dict, report_location: str) -> None:
+    report_dir = os.path.dirname(report_location)
+    if report_dir:
+        os.makedirs(report_dir, exist_ok=True)
+    with open(report_location, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+
+
+def main():
+    root_path = os.environ.get("REPO_ROOT", ModelWrapper.DEFAULT_REPO_ROOT)
+    parser = argparse.ArgumentParser(description="Search XGBoost parameters and save the best model as an artifact")
+    parser.add_argument("--data", default=os.path.join(root_path, "data/data.csv"))
+    parser.add_argument("--output", default=os.environ.get("MODEL_ARTIFACT",
+                                                           os.path.join(root_path, ModelWrapper.DEFAULT_ARTIFACT)))
+    parser.add_argument("--report", default="reports/retrain.json")
+    parser.add_argument("--search", choices=("grid", "random"), default="grid")
+    parser.add_argument("--trials", type=int, default=10, help="parameter sets tried by the random search")
+    parser.add_argument("--grid", type=json.loads, default=PARAMETER_GRID,
+                        help="json object with the values to try for each XGBClassifier parameter")
+    parser.add_argument("--metric", choices=SELECTION_METRICS, default="f1_delayed",
+                        help="held out metric the best model is chosen by")
+    parser.add_argument("--early-stopping-rounds", type=int, default=EARLY_STOPPING_ROUNDS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=DelayModel.Seed)
+    parser.add_argument("--incremental", action="store_true",
+                        help="add trees to the --output model for the rows appended to --data, without a search")
+    parser.add_argument("--rounds", type=int, default=DelayModel.Incremental_Rounds,
+                        help="trees added by an --incremental run")
+    arguments = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if arguments.incremental:
+        started = time.perf_counter()
+        summary = retrain_incremental(arguments.data, arguments.output, arguments.rounds)
+        summary.update(data=arguments.data, artifact=arguments.output, seconds=time.perf_counter() - started)
+        write_report(summary, arguments.report)
+        logging.info("Added %d rows to %d in %.1fs with %s; saved %s", summary["new_rows"], summary["seen_rows"],
+                     summary["seconds"], summary["metrics"], arguments.output)
+        return 0
+
+    started = time.perf_counter()
+    candidates = get_candidates(arguments.grid, arguments.search, arguments.trials, arguments.seed)
+    logging.info("Trying %d parameter sets on %d workers", len(candidates), arguments.workers)
+    results = search(arguments.data, candidates, arguments.workers, arguments.early_stopping_rounds)
+    search_seconds = time.perf_counter() - started
+    best = get_best(results, arguments.metric)
+
+    # The best model is fitted again here, deterministically and with the trial's exact parameters (one
+    # thread included), rather than shipped back from its worker.
+    model = DelayModel(get_model_params(best["params"], threads=1))
+    features, target = model.preprocess_file(arguments.data, target_column="delay")
+    model.fit(features, target, early_stopping_rounds=arguments.early_stopping_rounds)
+    model.build_reference_from_file(arguments.data)
+    data_stat = get_file_stat(arguments.data)
+    model.save(arguments.output, get_file_fingerprint(arguments.data), data_stat)
+
+    report = {
+        "data": arguments.data,
+        "artifact": arguments.output,
+        "metric": arguments.metric,
+        "workers": arguments.workers,
+        "search_seconds": search_seconds,
+        "best": best,
+        "trials": sorted(results, key=lambda result: result["metrics"][arguments.metric], reverse=True)
+    }
+    write_report(report, arguments.report)
+    logging.info("Best parameters %s with %s %.4f; saved %s and %s", best["params"], arguments.metric,
+                 best["metrics"][arguments.metric], arguments.output, arguments.report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+import json
+
+import numpy
+
+from challenge.encoder import FeatureEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_FORMAT = "json"
+MSGPACK_FORMAT = "msgpack"
+ARROW_FORMAT = "arrow"
+CONTENT_TYPES = {
+    "application/msgpack": MSGPACK_FORMAT,
+    "application/x-msgpack": MSGPACK_FORMAT,
+    "application/vnd.msgpack": MSGPACK_FORMAT,
+    "application/vnd.apache.arrow.stream": ARROW_FORMAT
+}
+MEDIA_TYPES = {
+    MSGPACK_FORMAT: "application/msgpack",
+    ARROW_FORMAT: "application/vnd.apache.arrow.stream"
+}
+FLIGHT_COLUMNS = ("OPERA", "TIPOVUELO", "MES")
+
+
+class UnsupportedMediaType(Exception):
+    """
+        The request is in a binary format whose library is not installed.
+    """
+
+
+def decode_json(
+    body: bytes
+):
+    """
+        Decodes a json document with orjson when it is installed, or with the standard library.
+
+        Args:
+            body (bytes): the document.
+
+        Returns:
+            the decoded document.
+
+        Raises:
+            ValueError: if the body is not valid json.
+    """
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def get_flights(
+    body: bytes,
+    max_flights: int
+) -> list:
+    """
+        Decodes a prediction request and checks its shape; the flights themselves are checked
+        by the FeatureEncoder while they are encoded.
+
+        Args:
+            body (bytes): the request body.
+            max_flights (int): most flights a request may have.
+
+        Returns:
+            list[dict]: the flights to predict.
+
+        Raises:
+            ValueError: if the body is not a prediction request.
+    """
+    request_json = decode_json(body)
+    if not isinstance(request_json, dict) or not isinstance(request_json.get("flights"), list):
+        raise ValueError("Expected an object with a list of flights")
+    flights = request_json["flights"]
+    if len(flights) > max_flights:
+        raise ValueError("Found {} flights, at most {} are allowed".format(len(flights), max_flights))
+    return flights
+
+
+def get_format(
+    content_type: str
+) -> str:
+    """
+        Tells the format of a request from its Content-Type; anything that is not a binary
+        format is read as json, as it always was.
+
+        Returns:
+            str: JSON_FORMAT, MSGPACK_FORMAT or ARROW_FORMAT.
+    """
+    media_type = (content_type or "").split(";", 1)[0].strip().lower()
+    return CONTENT_TYPES.get(media_type, JSON_FORMAT)
+
+
+def get_flight_columns(
+    body: bytes,
+    request_format: str,
+    max_flights: int
+) -> tuple:
+    """
+        Decodes a binary prediction request into one array per flight column, without
+        building a dict per flight; the flights are checked by FeatureEncoder.encode_bitmask_columns.
+
+        A msgpack request is a map from 'OPERA', 'TIPOVUELO' and 'MES' to arrays of equal
+        length. An Arrow request is an IPC stream of record batches with those columns;
+        string columns may be dictionary encoded. 'MES' is only read without copying when
+        the stream has a single record batch and no nulls; otherwise it is copied.
+
+        Args:
+            body (bytes): the request body.
+            request_format (str): MSGPACK_FORMAT or ARROW_FORMAT.
+            max_flights (int): most flights a request may have.
+
+        Returns:
+            tuple[numpy.ndarray]: operators, flight types and months.
+
+        Raises:
+            ValueError: if the body is not a prediction request.
+            UnsupportedMediaType: if the library of the format is not installed.
+    """
+    if request_format == ARROW_FORMAT:
+        columns = decode_arrow_columns(body)
+    else:
+        columns = decode_msgpack_columns(body)
+    lengths = {len(column) for column in columns}
+    if len(lengths) > 1:
+        raise ValueError("Found columns of different lengths: {}".format(sorted(lengths)))
+    if lengths and lengths.pop() > max_flights:
+        raise ValueError("Found {} flights, at most {} are allowed".format(len(columns[0]), max_flights))
+    return columns
+
+
+def decode_msgpack_columns(
+    body: bytes
+) -> tuple:
+    if msgpack is None:
+        raise UnsupportedMediaType("msgpack requests need the msgpack package")
+    try:
+        request = msgpack.unpackb(body, raw=False)
+    except Exception as error:
+        raise ValueError("Could not decode msgpack: {}".format(error))
+    if not isinstance(request, dict) or not all(isinstance(request.get(column), list) for column in FLIGHT_COLUMNS):
+        raise ValueError("Expected a map with an array for each of {}".format(", ".join(FLIGHT_COLUMNS)))
+    months = request["MES"]
+    # Only plain ints are months; numpy would read True as 1.
+    months_type = numpy.int64 if set(map(type, months)) <= {int} else object
+    try:
+        months = numpy.asarray(months, dtype=months_type)
+    except OverflowError:
+        months = numpy.asarray(months, dtype=object)
+    return (numpy.asarray(request["OPERA"], dtype=object), numpy.asarray(request["TIPOVUELO"], dtype=object),
+            months)
+
+
+def decode_arrow_columns(
+    body: bytes
+) -> tuple:
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        raise UnsupportedMediaType("Arrow requests need the pyarrow package")
+    try:
+        table = pyarrow.ipc.open_stream(pyarrow.py_buffer(body)).read_all()
+        columns = []
+        for name in FLIGHT_COLUMNS:
+            column = table.column(name)
+            if pyarrow.types.is_dictionary(column.type):
+                column = column.cast(column.type.value_type)
+            columns.append(column.to_numpy())
+    except (KeyError, pyarrow.ArrowException) as error:
+        raise ValueError("Could not decode Arrow stream: {}".format(error))
+    operators, flight_types, months = columns
+    return operators.astype(object, copy=False), flight_types.astype(object, copy=False), months
+
+
+def encode_predictions(
+    response_format: str,
+    labels: numpy.ndarray,
+    probabilities: numpy.ndarray = None
+) -> bytes:
+    """
+        Encodes the predictions of a binary request in its format: a msgpack map, or an Arrow
+        IPC stream with one record batch, with a 'predict' column and, when given, a
+        'probability' column.
+
+        Args:
+            response_format (str): MSGPACK_FORMAT or ARROW_FORMAT.
+            labels (numpy.ndarray): predicted delays, as 0 or 1.
+            probabilities (numpy.ndarray, optional): probability of each delay.
+
+        Returns:
+            bytes: the response body.
+    """
+    columns = {"predict": numpy.asarray(labels, dtype=numpy.uint8)}
+    if probabilities is not None:
+        columns["probability"] = numpy.asarray(probabilities, dtype=numpy.float32)
+    if response_format == MSGPACK_FORMAT:
+        return msgpack.packb({name: column.tolist() for name, column in columns.items()})
+
+    import pyarrow
+    import pyarrow.ipc
+
+    batch = pyarrow.record_batch([pyarrow.array(column) for column in columns.values()], names=list(columns))
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def get_predict_request_schema(
+    operators,
+    max_flights: int
+) -> dict:
+    """
+        Builds the OpenAPI description of the /predict request body, from the same constants
+        the FeatureEncoder validates against.
+
+        Args:
+            operators (list[str]): the known operators.
+            max_flights (int): most flights a request may have.
+
+        Returns:
+            dict: the requestBody entry of the operation.
+    """
+    flight = {
+        "type": "object",
+        "required": ["OPERA", "TIPOVUELO", "MES"],
+        "properties": {
+            "OPERA": {"type": "string", "enum": sorted(operators)},
+            "TIPOVUELO": {"type": "string", "enum": list(FeatureEncoder.Flight_Types)},
+            "MES": {"type": "integer", "minimum": FeatureEncoder.Min_Month, "maximum": FeatureEncoder.Max_Month}
+        }
+    }
+    columns = {name: {"type": "array", "items": flight["properties"][name], "maxItems": max_flights}
+               for name in FLIGHT_COLUMNS}
+    return {
+        "required": True,
+        "content": {
+            "application/json": {
+                "schema": {
+                    "type": "object",
+                    "required": ["flights"],
+                    "properties": {"flights": {"type": "array", "items": flight, "maxItems": max_flights}}
+                }
+            },
+            MEDIA_TYPES[MSGPACK_FORMAT]: {
+                "schema": {"type": "object", "required": list(FLIGHT_COLUMNS), "properties": columns}
+            },
+            MEDIA_TYPES[ARROW_FORMAT]: {
+                "schema": {"type": "string", "format": "binary",
+                           "description": "Arrow IPC stream with {} columns".format(", ".join(FLIGHT_COLUMNS))}
+            }
+        }
+    }
@@ -0,0 +1,183 @@
+import argparse
+import concurrent.futures
+import io
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy
+import pandas as pd
+
+from challenge.encoder import FeatureEncoder
+from challenge.model import DelayModel
+from challenge.model_wrapper import ModelWrapper
+
+FLIGHT_COLUMNS = ["OPERA", "TIPOVUELO", "MES"]
+PARTITION_BYTES = 16 << 20
+PROBABILITY_FORMAT = "%.4f"
+INVALID_LINE = ","
+
+# Model of each worker process, set once by load_worker_model.
+_worker_model = {}
+
+
+def get_csv_partitions(data_location: str, partition_bytes: int) -> list:
+    """ Splits a csv file into byte ranges of about partition_bytes that end at line ends
+
+        Rows must not span lines, as is the case for flight files.
+
+        Returns:
+            list[tuple]: start and end offset of every partition, after the header.
+    """
+    file_size = os.path.getsize(data_location)
+    partitions = []
+    with open(data_location, "rb") as data_file:
+        start = len(data_file.readline())
+        while start < file_size:
+            data_file.seek(min(start + partition_bytes, file_size))
+            data_file.readline()
+            end = min(data_file.tell(), file_size)
+            partitions.append((start, end))
+            start = end
+    return partitions
+
+
+def read_csv_partition(data_location: str, start: int, end: int) -> pd.DataFrame:
+    """ Reads the flights of a byte range of a csv file, keeping blank lines as empty flights
+
+        Blank lines are kept so that they are reported as invalid rows and output rows stay
+        aligned with input lines.
+    """
+    with open(data_location, "rb") as data_file:
+        header = data_file.readline()
+        data_file.seek(start)
+        content = data_file.read(end - start)
+    flights = pd.read_csv(io.BytesIO(header + content), usecols=FLIGHT_COLUMNS, dtype=str, keep_default_na=False,
+                          skip_blank_lines=False)
+    return flights[FLIGHT_COLUMNS]
+
+
+def read_parquet_partition(data_location: str, row_group: int) -> pd.DataFrame:
+    import pyarrow.parquet
+
+    table = pyarrow.parquet.ParquetFile(data_location).read_row_group(row_group, columns=FLIGHT_COLUMNS)
+    return table.to_pandas()
+
+
+def load_worker_model(lookup_table: numpy.ndarray, threshold: float) -> None:
+    """ Prepares the output line of every bitmask, as flights only encode into a few of them """
+    labels = (lookup_table > threshold).astype(numpy.uint8)
+    _worker_model["lines"] = numpy.array([
+        "{},{}".format(label, PROBABILITY_FORMAT % probability) if probability == probability else INVALID_LINE
+        for label, probability in zip(labels.tolist(), lookup_table.tolist())], dtype=object)
+    _worker_model["encoder"] = FeatureEncoder(DelayModel.Top_10_Features, operators=DelayModel.Operators)
+
+
+def score_flights(flights: pd.DataFrame) -> tuple:
+    """ Validates, encodes and scores a partition of flights, a column at a time
+
+        Args:
+            flights (pd.DataFrame): flights with 'OPERA', 'TIPOVUELO' and 'MES' columns.
+
+        Returns:
+            tuple: the output lines of the partition, with empty fields for invalid flights,
+                and the invalid flights, indexed by their row in the partition.
+    """
+    encoder = _worker_model["encoder"]
+    months = pd.to_numeric(flights["MES"], errors="coerce")
+    integer_months = numpy.isfinite(months.to_numpy(dtype=numpy.float64)) & (months == months.round()).to_numpy()
+    months = months.where(integer_months, 0).astype(numpy.int64).to_numpy()
+    operators = flights["OPERA"].to_numpy(dtype=object)
+    flight_types = flights["TIPOVUELO"].to_numpy(dtype=object)
+    valid_rows = encoder.get_valid_rows(operators, flight_types, months) & integer_months
+
+    bitmasks = encoder.encode_bitmask_columns(operators, flight_types, months, validate=False)
+    lines = numpy.where(valid_rows, _worker_model["lines"][bitmasks], INVALID_LINE)
+    output = "\n".join(lines.tolist()) + "\n" if len(lines) else ""
+    return output.encode(), flights[~valid_rows]
+
+
+def score_csv_partition(data_location: str, start: int, end: int) -> tuple:
+    return score_flights(read_csv_partition(data_location, start, end))
+
+
+def score_parquet_partition(data_location: str, row_group: int) -> tuple:
+    return score_flights(read_parquet_partition(data_location, row_group))
+
+
+def score_file(data_location: str, output_location: str, invalid_location: str, model: DelayModel,
+               workers: int, threshold: float = DelayModel.Probability_Threshold,
+               partition_bytes: int = PARTITION_BYTES) -> dict:
+    """ Scores every flight of a csv or parquet file across a pool of processes
+
+        The file is split into partitions (byte ranges of a csv, row groups of a parquet
+        file) that the workers read and score on their own; the model is handed to them
+        as its lookup table, so they do not load the booster. Predictions and probabilities
+        are written in the order of the input rows, one line per row, with empty fields for
+        invalid rows; invalid rows are also written, with their row number, to invalid_location.
+
+        Returns:
+            dict: amount of rows, invalid rows and partitions, and seconds it took.
+    """
+    started = time.perf_counter()
+    if data_location.endswith(".parquet"):
+        import pyarrow.parquet
+
+        row_groups = pyarrow.parquet.ParquetFile(data_location).num_row_groups
+        tasks = [(score_parquet_partition, (data_location, row_group))
+                 for row_group in range(row_groups)]
+    else:
+        tasks = [(score_csv_partition, (data_location, start, end))
+                 for start, end in get_csv_partitions(data_location, partition_bytes)]
+
+    rows = 0
+    invalid_rows = 0
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                                initializer=load_worker_model,
+                                                initargs=(model.get_lookup_table(), threshold)) as executor, \
+            open(output_location, "wb") as output_file, open(invalid_location, "w") as invalid_file:
+        output_file.write(b"prediction,probability\n")
+        invalid_file.write("row,{}\n".format(",".join(FLIGHT_COLUMNS)))
+        futures = [executor.submit(function, *arguments) for function, arguments in tasks]
+        for future in futures:
+            output, invalid_flights = future.result()
+            output_file.write(output)
+            if len(invalid_flights):
+                invalid_flights.set_axis(invalid_flights.index + rows).to_csv(invalid_file, header=False)
+            invalid_rows += len(invalid_flights)
+            rows += output.count(b"\n")
+    summary = {"rows": rows, "invalid_rows": invalid_rows, "partitions": len(tasks),
+               "seconds": time.perf_counter() - started}
+    if invalid_rows:
+        logging.warning("Found %d invalid rows out of %d; see %s", invalid_rows, rows, invalid_location)
+    return summary
+
+
+def main():
+    root_path = os.environ.get("REPO_ROOT", ModelWrapper.DEFAULT_REPO_ROOT)
+    parser = argparse.ArgumentParser(description="Score every flight of a csv or parquet file")
+    parser.add_argument("data", help="csv or .parquet file with OPERA, TIPOVUELO and MES columns")
+    parser.add_argument("output", help="csv file to write one prediction per input row to")
+    parser.add_argument("--invalid-output", help="csv file listing the invalid rows; <output>.invalid.csv by default")
+    parser.add_argument("--model", default=os.environ.get("MODEL_ARTIFACT",
+                                                          os.path.join(root_path, ModelWrapper.DEFAULT_ARTIFACT)))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threshold", type=float, default=DelayModel.Probability_Threshold)
+    parser.add_argument("--partition-mb", type=float, default=PARTITION_BYTES / (1 << 20))
+    arguments = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    model = DelayModel.load(arguments.model)
+    summary = score_file(arguments.data, arguments.output,
+                         arguments.invalid_output or arguments.output + ".invalid.csv", model,
+                         arguments.workers, arguments.threshold, int(arguments.partition_mb * (1 << 20)))
+    logging.info("Scored %d rows (%d invalid) in %d partitions in %.2f seconds", summary["rows"],
+                 summary["invalid_rows"], summary["partitions"], summary["seconds"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
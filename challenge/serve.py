@@ -0,0 +1,137 @@
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+from challenge.model_wrapper import ModelWrapper
+
+
+class PreforkServer:
+    """
+        Serves the API from several worker processes that share one model.
+
+        The parent loads (or trains) the model once, binds the listening socket and then
+        forks the workers, so they inherit the model copy-on-write instead of building
+        their own, and start in the time a fork takes. Workers that die are replaced,
+        and SIGHUP makes every worker reload the model.
+    """
+    Restart_Delay_Seconds = 1.0
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        workers: int,
+        log_level: str = "info"
+    ):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.log_level = log_level
+        self._socket = None
+        self._children = set()
+        self._stopping = False
+
+    def run(
+        self
+    ) -> None:
+        started = time.perf_counter()
+        ModelWrapper()
+        from challenge.api import app
+        # Objects created so far are never collected; keeping the collector away from
+        # them keeps their pages shared with the workers.
+        gc.freeze()
+        logging.info("Prepared the model in %f seconds", time.perf_counter() - started)
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen(2048)
+        self._socket.set_inheritable(True)
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGHUP, self._reload)
+        for _ in range(self.workers):
+            self._spawn(app)
+        logging.info("Serving on %s:%d with %d workers", self.host, self.port, self.workers)
+
+        while self._children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            self._children.discard(pid)
+            if not self._stopping:
+                logging.error("Worker %d exited with status %d; replacing it", pid, status)
+                time.sleep(PreforkServer.Restart_Delay_Seconds)
+                self._spawn(app)
+        self._socket.close()
+
+    def _spawn(
+        self,
+        app
+    ) -> None:
+        pid = os.fork()
+        if pid:
+            self._children.add(pid)
+            return
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, lambda signal_number, frame: ModelWrapper.start_reload())
+        config = uvicorn.Config(app, log_level=self.log_level)
+        server = uvicorn.Server(config)
+        try:
+            server.run(sockets=[self._socket])
+        finally:
+            os._exit(0)
+
+    def _stop(
+        self,
+        signal_number,
+        frame
+    ) -> None:
+        self._stopping = True
+        self._signal_children(signal.SIGTERM)
+
+    def _reload(
+        self,
+        signal_number,
+        frame
+    ) -> None:
+        logging.info("Reloading the model in every worker")
+        self._signal_children(signal.SIGHUP)
+
+    def _signal_children(
+        self,
+        signal_number
+    ) -> None:
+        for pid in self._children:
+            try:
+                os.kill(pid, signal_number)
+            except ProcessLookupError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API from workers forked after loading the model")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--log-level", default="info")
+    arguments = parser.parse_args()
+    logging.basicConfig(level=arguments.log_level.upper())
+
+    PreforkServer(arguments.host, arguments.port, arguments.workers, arguments.log_level).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,18 @@
 from datetime import datetime
+import hashlib
 import logging
+import os
 import pandas as pd
 
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+LEAVING_IN_ADVANCE_TOLERANCE = 3600.0  # seconds, an hour
+EARLY_DEPARTURE_SAMPLE_SIZE = 5
+TRAINING_COLUMNS_DTYPES = {'Fecha-I': 'object',
+                           'Fecha-O': 'object',
+                           'OPERA': 'category',
+                           'TIPOVUELO': 'category',
+                           'MES': 'int8'}
+
 
 def adjust_dummy_columns(features, intended_columns):
     """ Adds and removes columns to a dataframe so that it fits the prediction model
@@ -38,6 +49,38 @@ def get_dummy_representation(data):
     return features
 
 
+def get_file_fingerprint(file_location, chunk_size=1 << 20):
+    """
+        Calculates a content hash of a file, used to tell whether a trained model matches its data
+
+        Args:
+            file_location (str): path to the file.
+            chunk_size (int): amount of bytes read at a time.
+
+        Returns:
+            str: the sha256 hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(file_location, "rb") as data_file:
+        for chunk in iter(lambda: data_file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_file_stat(file_location):
+    """
+        Returns the size and modification time of a file, which are cheap to compare before hashing it
+
+        Args:
+            file_location (str): path to the file.
+
+        Returns:
+            dict: 'size' in bytes and 'mtime_ns'.
+    """
+    file_stat = os.stat(file_location)
+    return {"size": file_stat.st_size, "mtime_ns": file_stat.st_mtime_ns}
+
+
 def get_min_diff(data):
     """
         Calculates the difference in minutes between the intended departure date and the actual departure date
@@ -49,10 +92,9 @@ def get_min_diff(data):
             float: the amount of minutes elapsed between the intended departure date
                    and the actual departure date (can be negative).
     """
-    leaving_in_advance_tolerance = 3600.0  # seconds, an hour
-    fecha_o = datetime.strptime(data['Fecha-O'], '%Y-%m-%d %H:%M:%S')
-    fecha_i = datetime.strptime(data['Fecha-I'], '%Y-%m-%d %H:%M:%S')
-    if (fecha_i - fecha_o).total_seconds() > leaving_in_advance_tolerance:
+    fecha_o = datetime.strptime(data['Fecha-O'], DATE_FORMAT)
+    fecha_i = datetime.strptime(data['Fecha-I'], DATE_FORMAT)
+    if (fecha_i - fecha_o).total_seconds() > LEAVING_IN_ADVANCE_TOLERANCE:
         message = ("Found flight leaving way before departure time: "
                    "flew at {}, intended time {}".format(fecha_o, fecha_i))
         logging.warning(message)
@@ -60,6 +102,59 @@ def get_min_diff(data):
     return minutes_difference
 
 
+def get_min_diffs(data):
+    """
+        Calculates get_min_diff for every row of a dataframe at once
+
+        Dates are parsed column-wise and the differences are computed as a single array operation.
+        Flights leaving way before their departure time are reported in one warning with their
+        count and a few examples, instead of one warning per flight.
+
+        Args:
+            data (pd.DataFrame): flight data, with 'Fecha-I' and 'Fecha-O' columns.
+
+        Returns:
+            pd.Series: the amount of minutes elapsed between the intended departure date
+                       and the actual departure date (can be negative), aligned with data's index.
+    """
+    fecha_o = pd.to_datetime(data['Fecha-O'], format=DATE_FORMAT)
+    fecha_i = pd.to_datetime(data['Fecha-I'], format=DATE_FORMAT)
+    seconds_difference = (fecha_o - fecha_i).dt.total_seconds()
+
+    leaving_in_advance = seconds_difference < -LEAVING_IN_ADVANCE_TOLERANCE
+    early_amount = int(leaving_in_advance.sum())
+    if early_amount:
+        sample = ["flew at {}, intended time {}".format(flown, intended)
+                  for flown, intended in zip(fecha_o[leaving_in_advance].head(EARLY_DEPARTURE_SAMPLE_SIZE),
+                                             fecha_i[leaving_in_advance].head(EARLY_DEPARTURE_SAMPLE_SIZE))]
+        logging.warning("Found %d flights leaving way before departure time, e.g. %s",
+                        early_amount, "; ".join(sample))
+
+    minutes_difference = seconds_difference / 60.0
+    return minutes_difference
+
+
+def read_flight_chunks(data_location, chunk_size, columns=None):
+    """
+        Reads the columns needed for training from a flight history, a chunk at a time
+
+        Args:
+            data_location (str): path to the csv file.
+            chunk_size (int): amount of rows in each chunk.
+            columns (list[str], optional): the columns to read, among the training ones; all of them
+                by default.
+
+        Returns:
+            Iterator[pd.DataFrame]: chunks with 'Fecha-I', 'Fecha-O', 'OPERA', 'TIPOVUELO' and 'MES' columns,
+                or only the given columns.
+    """
+    columns = list(columns or TRAINING_COLUMNS_DTYPES.keys())
+    return pd.read_csv(filepath_or_buffer=data_location,
+                       usecols=columns,
+                       dtype={column: TRAINING_COLUMNS_DTYPES[column] for column in columns},
+                       chunksize=chunk_size)
+
+
 def reduce_features(features, columns_to_keep):
     """
         Reduces the dataframe features to the columns in columns_to_keep
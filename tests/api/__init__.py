@@ -0,0 +1,23 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+from challenge.model_wrapper import ModelWrapper
+
+_model_dir = None
+
+
+def prepare_model():
+    """ Builds the shared model before any test mocks it
+
+        Its artifact and feature store are kept in a temporary directory, so that the tests
+        never write next to the data in REPO_ROOT, where a later run of the API would load them.
+    """
+    global _model_dir
+    if _model_dir is None:
+        _model_dir = tempfile.mkdtemp(prefix="api-tests-")
+        atexit.register(shutil.rmtree, _model_dir, True)
+        os.environ["MODEL_ARTIFACT"] = os.path.join(_model_dir, "delay_model.json")
+        os.environ["FEATURE_STORE"] = os.path.join(_model_dir, "feature_store")
+    ModelWrapper.initialize_model()
@@ -1,14 +1,25 @@
+import asyncio
+import json
+import time
 import unittest
-from mockito import ANY, when
+from mockito import ANY, unstub, when
 
 import numpy as np
 from fastapi.testclient import TestClient
+from challenge import api
 from challenge.api import app
+from challenge.model import DelayModel
+from challenge.model_wrapper import ModelWrapper
+from tests.api import prepare_model
 
 
 class TestBatchPipeline(unittest.TestCase):
     def setUp(self):
+        prepare_model()
         self.client = TestClient(app)
+
+    def tearDown(self):
+        unstub()
         
     def test_should_get_predict(self):
         data = {
@@ -20,7 +31,7 @@ class TestBatchPipeline(unittest.TestCase):
                 }
             ]
         }
-        when("xgboost.XGBClassifier").predict(ANY).thenReturn(np.array([0]))
+        when(DelayModel).predict_lookup_proba(ANY).thenReturn(np.array([0.25], dtype=np.float32))
         response = self.client.post("/predict", json=data)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json(), {"predict": [0]})
@@ -35,7 +46,7 @@ class TestBatchPipeline(unittest.TestCase):
                 }
             ]
         }
-        when("xgboost.XGBClassifier").predict(ANY).thenReturn(np.array([0]))
+        when(DelayModel).predict_lookup_proba(ANY).thenReturn(np.array([0.25], dtype=np.float32))
         response = self.client.post("/predict", json=data)
         self.assertEqual(response.status_code, 400)
 
@@ -49,7 +60,7 @@ class TestBatchPipeline(unittest.TestCase):
                 }
             ]
         }
-        when("xgboost.XGBClassifier").predict(ANY).thenReturn(np.array([0]))
+        when(DelayModel).predict_lookup_proba(ANY).thenReturn(np.array([0.25], dtype=np.float32))
         response = self.client.post("/predict", json=data)
         self.assertEqual(response.status_code, 400)
     
@@ -63,6 +74,155 @@ class TestBatchPipeline(unittest.TestCase):
                 }
             ]
         }
-        when("xgboost.XGBClassifier").predict(ANY).thenReturn(np.array([0]))
+        when(DelayModel).predict_lookup_proba(ANY).thenReturn(np.array([0.25], dtype=np.float32))
+        response = self.client.post("/predict", json=data)
+        self.assertEqual(response.status_code, 400)
+
+    def test_should_get_predict_probabilities(self):
+        data = {"flights": [{"OPERA": "Grupo LATAM", "TIPOVUELO": "I", "MES": 7},
+                            {"OPERA": "Copa Air", "TIPOVUELO": "N", "MES": 3}]}
+        when(DelayModel).predict_lookup_proba(ANY).thenReturn(np.array([0.25, 0.75], dtype=np.float32))
+        response = self.client.post("/predict?output=probability", json=data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"predict": [0, 1], "probability": [0.25, 0.75]})
+        self.assertEqual(self.client.post("/predict?output=odds", json=data).status_code, 422)
+
+    def test_should_apply_decision_threshold(self):
+        data = {"flights": [{"OPERA": "Grupo LATAM", "TIPOVUELO": "I", "MES": 7}] * 2}
+        when(DelayModel).predict_lookup_proba(ANY).thenReturn(np.array([0.25, 0.75], dtype=np.float32))
+        previous_threshold = api.DECISION_THRESHOLD
+        api.DECISION_THRESHOLD = 0.2
+        try:
+            response = self.client.post("/predict", json=data)
+        finally:
+            api.DECISION_THRESHOLD = previous_threshold
+        self.assertEqual(response.json(), {"predict": [1, 1]})
+
+    def test_should_failed_unknown_operator(self):
+        data = {"flights": [{"OPERA": "Argentinas", "TIPOVUELO": "I", "MES": 3}]}
         response = self.client.post("/predict", json=data)
         self.assertEqual(response.status_code, 400)
+
+    def test_should_failed_malformed_request(self):
+        for body in ('[]', '{"flights": {"OPERA": "Grupo LATAM"}}', '{"flights": [', '{"flight": []}'):
+            response = self.client.post("/predict", data=body)
+            self.assertEqual(response.status_code, 400)
+
+    def test_should_failed_too_many_flights(self):
+        data = {"flights": [{"OPERA": "Grupo LATAM", "TIPOVUELO": "I", "MES": 7}] * (api.MAX_REQUEST_FLIGHTS + 1)}
+        response = self.client.post("/predict", json=data)
+        self.assertEqual(response.status_code, 400)
+
+    def test_should_describe_predict_request(self):
+        request_body = self.client.get("/openapi.json").json()["paths"]["/predict"]["post"]["requestBody"]
+        flight = request_body["content"]["application/json"]["schema"]["properties"]["flights"]["items"]
+        self.assertEqual(sorted(DelayModel.Operators), flight["properties"]["OPERA"]["enum"])
+        self.assertEqual(["I", "N"], flight["properties"]["TIPOVUELO"]["enum"])
+        self.assertEqual(12, flight["properties"]["MES"]["maximum"])
+
+    def test_should_get_metrics(self):
+        data = {"flights": [{"OPERA": "Grupo LATAM", "TIPOVUELO": "I", "MES": 7}] * 2}
+        self.client.post("/predict", json=data)
+        self.client.post("/predict", json={"flights": [{"OPERA": "Grupo LATAM"}]})
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('http_requests_total{path="/predict",status="200"}', response.text)
+        self.assertIn('http_requests_total{path="/predict",status="400"}', response.text)
+        self.assertIn('predict_stage_seconds_count{stage="encode"}', response.text)
+        self.assertIn('predict_batch_size_bucket{le="2.0"}', response.text)
+        self.assertIn("model_version", response.text)
+
+    def test_should_stream_bulk_predictions(self):
+        flights = [
+            {"OPERA": "Aerolineas Argentinas", "TIPOVUELO": "N", "MES": 3},
+            {"OPERA": "Grupo LATAM", "TIPOVUELO": "I", "MES": 7}
+        ] * 3
+        body = "\n".join(json.dumps(flight) for flight in flights) + "\n"
+        when(DelayModel).predict_lookup_proba(ANY).thenReturn(
+            np.array([0.25, 0.75, 0.25, 0.75, 0.25, 0.75], dtype=np.float32))
+        response = self.client.post("/predict/bulk", data=body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([json.loads(line) for line in response.text.splitlines()],
+                         [{"predict": prediction} for prediction in [0, 1, 0, 1, 0, 1]])
+
+    def test_should_score_bulk_blocks_off_the_event_loop(self):
+        scoring_loops = []
+
+        def score_features(features):
+            try:
+                scoring_loops.append(asyncio.get_running_loop())
+            except RuntimeError:
+                scoring_loops.append(None)
+            return np.full(len(features), 0.75, dtype=np.float32)
+
+        when(api).score_features(ANY).thenAnswer(score_features)
+        body = json.dumps({"OPERA": "Grupo LATAM", "TIPOVUELO": "I", "MES": 7}) + "\n"
+        response = self.client.post("/predict/bulk", data=body * 3)
+        self.assertEqual([{"predict": 1}] * 3, [json.loads(line) for line in response.text.splitlines()])
+        self.assertEqual([None], scoring_loops)
+
+    def test_should_stop_bulk_predictions_on_invalid_line(self):
+        body = '{"OPERA": "Grupo LATAM", "TIPOVUELO": "I", "MES": 7}\n{"OPERA": "Grupo LATAM"'
+        response = self.client.post("/predict/bulk", data=body)
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(1, len(lines))
+        self.assertEqual(2, lines[0]["line"])
+
+    def test_should_report_readiness(self):
+        with TestClient(app) as client:
+            for _ in range(100):
+                response = client.get("/ready")
+                if response.status_code == 200:
+                    break
+                time.sleep(0.05)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual("ready", response.json()["state"])
+
+    def test_should_reject_predictions_until_ready(self):
+        when(ModelWrapper).get_model().thenReturn(None)
+        data = {"flights": [{"OPERA": "Grupo LATAM", "TIPOVUELO": "I", "MES": 7}]}
+        self.assertEqual(503, self.client.post("/predict", json=data).status_code)
+        self.assertEqual(503, self.client.post("/predict/bulk", data=json.dumps(data["flights"][0])).status_code)
+
+    def test_should_reject_admin_requests(self):
+        previous_token = api.ADMIN_TOKEN
+        try:
+            api.ADMIN_TOKEN = None
+            self.assertEqual(404, self.client.post("/admin/reload").status_code)
+            self.assertEqual(404, self.client.get("/admin/reload", headers={"X-Admin-Token": ""}).status_code)
+            api.ADMIN_TOKEN = "secret"
+            self.assertEqual(403, self.client.post("/admin/reload").status_code)
+            self.assertEqual(403, self.client.get("/admin/reload", headers={"X-Admin-Token": "other"}).status_code)
+        finally:
+            api.ADMIN_TOKEN = previous_token
+
+    def test_should_reload_model(self):
+        previous_model = ModelWrapper.get_model()
+        previous_version = ModelWrapper.get_model_version()
+        previous_token = api.ADMIN_TOKEN
+        api.ADMIN_TOKEN = "secret"
+        headers = {"X-Admin-Token": "secret"}
+        try:
+            response = self.client.post("/admin/reload", headers=headers)
+            self.assertEqual(response.status_code, 202)
+            for _ in range(100):
+                status = self.client.get("/admin/reload", headers=headers).json()
+                if status["state"] == "idle" and status["version"] > previous_version:
+                    break
+                time.sleep(0.05)
+        finally:
+            api.ADMIN_TOKEN = previous_token
+        self.assertEqual(status, {"state": "idle", "error": None, "version": previous_version + 1})
+        self.assertIsNot(previous_model, ModelWrapper.get_model())
+
+    def test_should_keep_model_when_reload_fails(self):
+        previous_model = ModelWrapper.get_model()
+        when(ModelWrapper).build_model().thenRaise(RuntimeError("no artifact"))
+        try:
+            with self.assertRaises(RuntimeError):
+                ModelWrapper.reload_model()
+        finally:
+            unstub(ModelWrapper)
+        self.assertIs(previous_model, ModelWrapper.get_model())
+        self.assertEqual("failed", ModelWrapper.get_reload_status()["state"])
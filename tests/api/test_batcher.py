@@ -0,0 +1,49 @@
+import asyncio
+import unittest
+
+import numpy as np
+
+from challenge.batcher import MicroBatcher
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def setUp(self):
+        self.scored_batches = []
+
+    def score(self, features):
+        self.scored_batches.append(len(features))
+        return features * 2
+
+    def test_should_coalesce_concurrent_requests(self):
+        batcher = MicroBatcher(self.score, max_batch_size=100, max_wait_seconds=0.05)
+
+        async def submit_all():
+            requests = [np.arange(size) for size in (1, 2, 3)]
+            return await asyncio.gather(*[batcher.submit(request) for request in requests])
+
+        results = asyncio.run(submit_all())
+        self.assertEqual([[0], [0, 2], [0, 2, 4]], [result.tolist() for result in results])
+        self.assertEqual([6], self.scored_batches)
+        stats = batcher.stats()
+        self.assertEqual(1, stats["batches"])
+        self.assertEqual(6, stats["flights"])
+        self.assertEqual(0, stats["queue_depth"])
+
+    def test_should_close_full_batches(self):
+        batcher = MicroBatcher(self.score, max_batch_size=2, max_wait_seconds=0.05)
+
+        async def submit_all():
+            return await asyncio.gather(*[batcher.submit(np.array([value])) for value in range(5)])
+
+        results = asyncio.run(submit_all())
+        self.assertEqual([[0], [2], [4], [6], [8]], [result.tolist() for result in results])
+        self.assertEqual([2, 2, 1], self.scored_batches)
+        self.assertEqual(2, batcher.stats()["max_batch_size"])
+
+    def test_should_propagate_errors(self):
+        def fail(features):
+            raise RuntimeError("model unavailable")
+
+        batcher = MicroBatcher(fail, max_batch_size=10, max_wait_seconds=0.001)
+        with self.assertRaises(RuntimeError):
+            asyncio.run(batcher.submit(np.array([1])))
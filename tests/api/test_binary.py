@@ -0,0 +1,101 @@
+import importlib.util
+import sys
+import unittest
+from unittest import mock
+from mockito import ANY, unstub, when
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from challenge import schema
+from challenge.api import app
+from challenge.model import DelayModel
+from tests.api import prepare_model
+
+HAS_MSGPACK = schema.msgpack is not None
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+COLUMNS = {"OPERA": ["Aerolineas Argentinas", "Grupo LATAM"], "TIPOVUELO": ["N", "I"], "MES": [3, 12]}
+
+
+def to_arrow(columns):
+    import pyarrow
+    import pyarrow.ipc
+
+    batch = pyarrow.record_batch([pyarrow.array(values) for values in columns.values()], names=list(columns))
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+class TestBinaryRequests(unittest.TestCase):
+    def setUp(self):
+        prepare_model()
+        self.client = TestClient(app)
+        when(DelayModel).predict_lookup_proba(ANY).thenReturn(np.array([0.25, 0.75], dtype=np.float32))
+
+    def tearDown(self):
+        unstub()
+
+    def post(self, body, content_type, output="label"):
+        return self.client.post("/predict", params={"output": output}, data=body,
+                                headers={"Content-Type": content_type})
+
+    def test_get_format(self):
+        self.assertEqual(schema.MSGPACK_FORMAT, schema.get_format("application/x-msgpack"))
+        self.assertEqual(schema.ARROW_FORMAT, schema.get_format("application/vnd.apache.arrow.stream; charset=x"))
+        self.assertEqual(schema.JSON_FORMAT, schema.get_format(None))
+        self.assertEqual(schema.JSON_FORMAT, schema.get_format("text/plain"))
+
+    @unittest.skipUnless(HAS_MSGPACK, "msgpack is not installed")
+    def test_should_predict_msgpack(self):
+        response = self.post(schema.msgpack.packb(COLUMNS), "application/msgpack", output="probability")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("application/msgpack", response.headers["content-type"])
+        self.assertEqual({"predict": [0, 1], "probability": [0.25, 0.75]}, schema.msgpack.unpackb(response.content))
+
+    @unittest.skipUnless(HAS_MSGPACK, "msgpack is not installed")
+    def test_should_reject_invalid_msgpack(self):
+        for columns in (dict(COLUMNS, OPERA=["Aerolineas Argentinas", "Unknown Air"]),
+                        dict(COLUMNS, MES=[3, True]),
+                        dict(COLUMNS, MES=[3]),
+                        {"flights": []}):
+            self.assertEqual(400, self.post(schema.msgpack.packb(columns), "application/msgpack").status_code)
+        self.assertEqual(400, self.post(b"\xc1", "application/msgpack").status_code)
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_should_predict_arrow(self):
+        import pyarrow.ipc
+
+        response = self.post(to_arrow(COLUMNS), "application/vnd.apache.arrow.stream", output="probability")
+        self.assertEqual(200, response.status_code)
+        table = pyarrow.ipc.open_stream(response.content).read_all()
+        self.assertEqual([0, 1], table.column("predict").to_pylist())
+        self.assertEqual([0.25, 0.75], table.column("probability").to_pylist())
+
+        response = self.post(to_arrow(dict(COLUMNS, MES=[3.0, 12.0])), "application/vnd.apache.arrow.stream")
+        self.assertEqual(400, response.status_code)
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_should_decode_arrow_batches(self):
+        import pyarrow
+        import pyarrow.ipc
+
+        batches = [pyarrow.record_batch([pyarrow.array([values[index]]) for values in COLUMNS.values()],
+                                        names=list(COLUMNS)) for index in range(2)]
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, batches[0].schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+        operators, flight_types, months = schema.get_flight_columns(
+            sink.getvalue().to_pybytes(), schema.ARROW_FORMAT, max_flights=10)
+        self.assertEqual(COLUMNS["OPERA"], operators.tolist())
+        self.assertEqual(COLUMNS["MES"], months.tolist())
+
+    def test_should_answer_415_without_msgpack(self):
+        with mock.patch.object(schema, "msgpack", None):
+            self.assertEqual(415, self.post(b"\x80", "application/msgpack").status_code)
+
+    def test_should_answer_415_without_pyarrow(self):
+        with mock.patch.dict(sys.modules, {"pyarrow": None, "pyarrow.ipc": None}):
+            self.assertEqual(415, self.post(b"", "application/vnd.apache.arrow.stream").status_code)
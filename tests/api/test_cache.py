@@ -0,0 +1,57 @@
+import asyncio
+import unittest
+from mockito import ANY, unstub, verify, when
+
+import numpy as np
+
+from challenge import api
+from challenge.cache import PredictionCache
+from challenge.model import DelayModel
+
+
+class TestPredictionCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.cache = PredictionCache(max_size=2, ttl_seconds=10, version=1, clock=lambda: self.now)
+
+    def tearDown(self):
+        unstub()
+
+    def test_should_evict_least_recently_used(self):
+        self.cache.put_many([1, 2], [0, 1], version=1)
+        self.assertEqual([0], self.cache.get_many([1]))
+        self.cache.put_many([3], [1], version=1)
+        self.assertEqual([0, None, 1], self.cache.get_many([1, 2, 3]))
+        self.assertEqual({"size": 2, "hits": 3, "misses": 1}, self.cache.stats())
+
+    def test_should_expire_entries(self):
+        self.cache.put_many([1], [1], version=1)
+        self.now = 9.0
+        self.assertEqual([1], self.cache.get_many([1]))
+        self.now = 10.0
+        self.assertEqual([None], self.cache.get_many([1]))
+        self.assertEqual(0, self.cache.stats()["size"])
+
+    def test_should_drop_predictions_of_other_versions(self):
+        self.cache.put_many([1], [1], version=1)
+        self.cache.invalidate(2)
+        self.assertEqual([None], self.cache.get_many([1]))
+        self.cache.put_many([1], [1], version=1)
+        self.assertEqual([None], self.cache.get_many([1]))
+        self.cache.put_many([1], [0], version=2)
+        self.assertEqual([0], self.cache.get_many([1]))
+
+    def test_should_score_only_cache_misses(self):
+        previous_cache = api.prediction_cache
+        api.prediction_cache = PredictionCache(max_size=100, ttl_seconds=60,
+                                               version=api.ModelWrapper.get_model_version())
+        try:
+            when(DelayModel).predict_lookup_proba(ANY).thenReturn(np.array([0.75, 0.25], dtype=np.float32))
+            first = asyncio.run(api.predict_features_cached(np.array([5, 3, 5], dtype=np.uint32)))
+            when(DelayModel).predict_lookup_proba(ANY).thenReturn(np.array([0.75], dtype=np.float32))
+            second = asyncio.run(api.predict_features_cached(np.array([3, 9, 5], dtype=np.uint32)))
+        finally:
+            api.prediction_cache = previous_cache
+        self.assertEqual([0.25, 0.75, 0.25], first.tolist())
+        self.assertEqual([0.75, 0.75, 0.25], second.tolist())
+        verify(DelayModel, times=2).predict_lookup_proba(ANY)
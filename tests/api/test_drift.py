@@ -0,0 +1,107 @@
+import unittest
+from mockito import ANY, unstub, when
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from challenge import api
+from challenge.api import app
+from challenge.drift import DriftMonitor, get_psi
+from challenge.model import DelayModel
+from tests.api import prepare_model
+
+
+class TestDriftMonitor(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.monitor = DriftMonitor(DelayModel.Operators, DelayModel.Top_10_Features, window_seconds=60,
+                                    buckets=6, psi_threshold=0.2, clock=lambda: self.now)
+        self.reference = {"flights": 4, "predicted_delayed": 1,
+                          "OPERA": {"Grupo LATAM": 2, "Sky Airline": 2},
+                          "TIPOVUELO": {"N": 3, "I": 1},
+                          "MES": {"7": 2, "1": 2}}
+
+    def test_should_compare_window_with_reference(self):
+        self.monitor.set_reference(self.reference)
+        flights = [{"OPERA": "Grupo LATAM", "TIPOVUELO": "N", "MES": 7},
+                   {"OPERA": "Sky Airline", "TIPOVUELO": "I", "MES": 1}]
+        self.monitor.record(flights * 2, np.array([0, 1, 0, 0], dtype=np.uint8))
+        report = self.monitor.report()
+
+        self.assertEqual(4, report["flights"])
+        self.assertEqual({"current": 0.25, "reference": 0.25}, report["positive_rate"])
+        self.assertEqual({"Grupo LATAM": 0.5, "Sky Airline": 0.5}, {
+            operator: share for operator, share in report["OPERA"]["current"].items() if share})
+        self.assertAlmostEqual(0.0, report["OPERA"]["psi"])
+        self.assertEqual({"current": 0.5, "reference": 0.5}, report["MES"]["uncovered"])
+        self.assertEqual({"current": 0.5, "reference": 0.75}, report["TIPOVUELO"]["uncovered"])
+        self.assertFalse(report["OPERA"]["drifted"])
+        self.assertTrue(report["TIPOVUELO"]["drifted"])
+        self.assertTrue(report["drifted"])
+
+    def test_should_count_columns_as_flights(self):
+        flights = [{"OPERA": "Grupo LATAM", "TIPOVUELO": "N", "MES": 7},
+                   {"OPERA": "Unknown Air", "TIPOVUELO": "I", "MES": 1}]
+        labels = np.array([1, 0], dtype=np.uint8)
+        self.monitor.record(flights, labels)
+        by_flights = self.monitor.report()
+        self.monitor.record_columns({column: np.array([flight[column] for flight in flights], dtype=object)
+                                     for column in ("OPERA", "TIPOVUELO", "MES")}, labels)
+        by_columns = self.monitor.report()
+        self.assertEqual(2 * by_flights["flights"], by_columns["flights"])
+        self.assertEqual(by_flights["OPERA"], by_columns["OPERA"])
+        self.assertEqual(0.5, by_columns["OPERA"]["current"]["other"])
+
+    def test_should_flag_new_operators(self):
+        self.monitor.set_reference(self.reference)
+        self.monitor.record([{"OPERA": "Qantas Airways", "TIPOVUELO": "I", "MES": 7}] * 10,
+                            np.zeros(10, dtype=np.uint8))
+        report = self.monitor.report()
+        self.assertTrue(report["OPERA"]["drifted"])
+        self.assertTrue(report["drifted"])
+        self.assertEqual(1.0, report["OPERA"]["uncovered"]["current"])
+
+    def test_should_forget_flights_out_of_the_window(self):
+        flights = [{"OPERA": "Grupo LATAM", "TIPOVUELO": "N", "MES": 7}]
+        self.monitor.record(flights, np.ones(1, dtype=np.uint8))
+        self.now = 30.0
+        self.monitor.record(flights * 2, np.zeros(2, dtype=np.uint8))
+        self.assertEqual(3, self.monitor.report()["flights"])
+        self.now = 61.0
+        report = self.monitor.report()
+        self.assertEqual(2, report["flights"])
+        self.assertEqual({"current": 0.0, "reference": None}, report["positive_rate"])
+        self.assertIsNone(report["OPERA"]["psi"])
+
+    def test_get_psi(self):
+        self.assertAlmostEqual(0.0, get_psi(np.array([1, 3]), np.array([10, 30])))
+        self.assertGreater(get_psi(np.array([3, 1]), np.array([1, 3])), 0.2)
+
+
+class TestDriftEndpoint(unittest.TestCase):
+    def setUp(self):
+        prepare_model()
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        unstub()
+        api.set_drift_reference(0)
+
+    def test_should_report_predicted_flights(self):
+        flights = [{"OPERA": "Grupo LATAM", "TIPOVUELO": "I", "MES": 12}] * 3
+        before = self.client.get("/stats/drift").json()
+        when(DelayModel).get_reference().thenReturn({"flights": 10, "predicted_delayed": 2,
+                                                     "OPERA": {"Grupo LATAM": 10}, "TIPOVUELO": {"I": 10},
+                                                     "MES": {"12": 10}})
+        api.set_drift_reference(0)
+        when(DelayModel).predict_lookup_proba(ANY).thenReturn(np.array([0.75, 0.25, 0.25], dtype=np.float32))
+        self.client.post("/predict", json={"flights": flights})
+        after = self.client.get("/stats/drift").json()
+
+        self.assertTrue(after["enabled"])
+        self.assertEqual(before["flights"] + 3, after["flights"])
+        self.assertEqual(10, after["reference_flights"])
+        self.assertEqual(1.0, after["OPERA"]["reference"]["Grupo LATAM"])
+        self.assertEqual(0.2, after["positive_rate"]["reference"])
+        self.assertIn('input_drift{stat="positive_rate",window="reference"}', self.client.get("/metrics").text)
+        self.assertIs(api.drift_monitor.report()["drifted"], after["drifted"])
@@ -0,0 +1,34 @@
+import unittest
+
+from challenge.metrics import Counter, Gauge, Histogram, Registry
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_should_render_counter(self):
+        counter = self.registry.register(Counter("requests_total", "Requests.", ("path", "status")))
+        counter.inc("/predict", 200)
+        counter.inc("/predict", 200)
+        counter.inc("/predict", 400)
+        rendered = self.registry.render()
+        self.assertIn("# TYPE requests_total counter", rendered)
+        self.assertIn('requests_total{path="/predict",status="200"} 2.0', rendered)
+        self.assertIn('requests_total{path="/predict",status="400"} 1.0', rendered)
+
+    def test_should_render_histogram(self):
+        histogram = self.registry.register(Histogram("size", "Sizes.", buckets=(1, 10)))
+        for value in (1, 5, 50):
+            histogram.observe(value)
+        rendered = self.registry.render()
+        self.assertIn('size_bucket{le="1.0"} 1', rendered)
+        self.assertIn('size_bucket{le="10.0"} 2', rendered)
+        self.assertIn('size_bucket{le="+Inf"} 3', rendered)
+        self.assertIn("size_sum 56.0", rendered)
+        self.assertIn("size_count 3", rendered)
+
+    def test_should_run_collectors(self):
+        gauge = self.registry.register(Gauge("depth", "Depth."))
+        self.registry.add_collector(lambda: gauge.set(7))
+        self.assertIn("depth 7.0", self.registry.render())
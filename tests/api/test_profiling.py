@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from fastapi.testclient import TestClient
+from challenge import profiling, schema
+from challenge.api import app
+from tests.api import prepare_model
+
+
+class TestProfiling(unittest.TestCase):
+    data = {
+        "flights": [
+            {
+                "OPERA": "Aerolineas Argentinas",
+                "TIPOVUELO": "N",
+                "MES": 3
+            }
+        ]
+    }
+
+    def setUp(self):
+        prepare_model()
+        self.client = TestClient(app)
+        self.profile_dir = tempfile.mkdtemp()
+        self.previous = (profiling.PROFILING_ENABLED, profiling.PROFILE_DIR, profiling.PROFILE_SAMPLE_RATE)
+        profiling.PROFILE_DIR = self.profile_dir
+
+    def tearDown(self):
+        profiling.PROFILING_ENABLED, profiling.PROFILE_DIR, profiling.PROFILE_SAMPLE_RATE = self.previous
+        shutil.rmtree(self.profile_dir)
+
+    def test_should_ignore_profile_header_when_disabled(self):
+        profiling.PROFILING_ENABLED = False
+        response = self.client.post("/predict", json=self.data, headers={"X-Profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response.headers)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    def test_should_profile_requested_prediction(self):
+        profiling.PROFILING_ENABLED = True
+        response = self.client.post("/predict?profile=1", json=self.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["predict"]), 1)
+        profile_id = response.headers["X-Profile-Id"]
+        self.assertEqual(sorted(os.listdir(self.profile_dir)), [profile_id + ".prof", profile_id + ".txt"])
+        with open(os.path.join(self.profile_dir, profile_id + ".txt")) as summary_file:
+            summary = summary_file.read()
+        self.assertIn("predict_flights", summary)
+        self.assertIn("Top allocations", summary)
+
+    @unittest.skipIf(schema.msgpack is None, "msgpack is not installed")
+    def test_should_profile_msgpack_prediction(self):
+        profiling.PROFILING_ENABLED = True
+        columns = {"OPERA": ["Aerolineas Argentinas"], "TIPOVUELO": ["N"], "MES": [3]}
+        response = self.client.post("/predict?profile=1", data=schema.msgpack.packb(columns),
+                                    headers={"content-type": "application/msgpack"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([0], list(schema.msgpack.unpackb(response.content)["predict"]))
+        profile_id = response.headers["X-Profile-Id"]
+        self.assertIn(profile_id + ".prof", os.listdir(self.profile_dir))
+
+    def test_should_sample_requests(self):
+        profiling.PROFILING_ENABLED = True
+        profiling.PROFILE_SAMPLE_RATE = 1.0
+        response = self.client.post("/predict", json=self.data)
+        self.assertIn("X-Profile-Id", response.headers)
+
+    def test_should_skip_concurrent_profile(self):
+        with profiling.RequestProfiler("outer") as outer:
+            with profiling.RequestProfiler("inner") as inner:
+                pass
+        self.assertIsNotNone(outer.profile_id)
+        self.assertIsNone(inner.profile_id)
@@ -0,0 +1,45 @@
+import argparse
+import logging
+
+import numpy as np
+
+from challenge.encoder import FeatureEncoder
+from challenge.model import DelayModel
+from tests.benchmark.synthetic import generate_flights
+from tests.benchmark.timing import time_per_call
+
+DEFAULT_BATCH_SIZES = [1, 10, 100, 1000, 10_000, 100_000]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare XGBClassifier.predict with the native booster path")
+    parser.add_argument("--training-rows", type=int, default=50_000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--max-flights", type=int, default=1_000_000,
+                        help="flights scored per case; fewer repetitions are run for larger batches")
+    arguments = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    model = DelayModel()
+    features, target = model.preprocess(generate_flights(arguments.training_rows), target_column="delay")
+    model.fit(features, target)
+    encoder = FeatureEncoder(DelayModel.Top_10_Features)
+    flights = generate_flights(max(arguments.batch_sizes), seed=1)[["OPERA", "TIPOVUELO", "MES"]]
+    encoded = encoder.encode_bitmask_columns(flights["OPERA"], flights["TIPOVUELO"], flights["MES"].to_numpy())
+    encoded = encoder.decode_bitmasks(encoded)
+
+    print("{:>7} {:>16} {:>16} {:>16} {:>9}".format(
+        "batch", "classifier (us)", "booster (us)", "booster (fl/s)", "speedup"))
+    for batch_size in arguments.batch_sizes:
+        batch = encoded[:batch_size]
+        assert np.array_equal(model.predict(batch), model.predict_booster(batch))
+        repetitions = max(3, min(1000, arguments.max_flights // batch_size))
+        classifier_time = time_per_call(lambda: model.predict(batch), repetitions)
+        booster_time = time_per_call(lambda: model.predict_booster(batch), repetitions)
+        print("{:>7} {:>16.1f} {:>16.1f} {:>16.0f} {:>8.1f}x".format(
+            batch_size, classifier_time * 1e6, booster_time * 1e6, batch_size / booster_time,
+            classifier_time / booster_time))
+
+
+if __name__ == "__main__":
+    main()
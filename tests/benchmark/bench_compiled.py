@@ -0,0 +1,96 @@
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from challenge.encoder import FeatureEncoder
+from challenge.model import DelayModel
+from tests.benchmark.synthetic import generate_flights
+from tests.benchmark.timing import time_per_call
+
+DEFAULT_BATCH_SIZES = [1, 100, 10_000, 100_000]
+RUNTIMES = ("xgboost", "compiled")
+# Run in a fresh interpreter: imports the app, prepares the model and scores one flight.
+COLD_START = """
+import json, resource, sys, time
+started = time.perf_counter()
+from challenge import api
+from challenge.model_wrapper import ModelWrapper
+ModelWrapper.initialize_model()
+flight = {"OPERA": "Grupo LATAM", "TIPOVUELO": "I", "MES": 7}
+ModelWrapper.get_model().predict_lookup_proba(api.encode_flights([flight]))
+seconds = time.perf_counter() - started
+# ru_maxrss keeps the peak of the parent across fork and exec; VmHWM starts over with the new program.
+max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+try:
+    with open("/proc/self/status") as status:
+        max_rss_kb = next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+except (OSError, StopIteration):
+    pass
+print(json.dumps({"seconds": seconds, "max_rss_mb": max_rss_kb / 1024,
+                  "xgboost": "xgboost" in sys.modules, "sklearn": "sklearn" in sys.modules}))
+"""
+
+
+def measure_cold_start(artifact_location, runtime):
+    """ Serves the artifact from a new process, with the given MODEL_RUNTIME
+
+        Returns:
+            dict: seconds until the first prediction, peak RSS and which libraries got imported.
+    """
+    environment = dict(os.environ, MODEL_RUNTIME=runtime, MODEL_ARTIFACT=artifact_location,
+                       REPO_ROOT=os.path.dirname(artifact_location))
+    output = subprocess.run([sys.executable, "-c", COLD_START], env=environment, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare serving from XGBoost with serving from compiled trees")
+    parser.add_argument("--training-rows", type=int, default=50_000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--max-flights", type=int, default=1_000_000,
+                        help="flights scored per case; fewer repetitions are run for larger batches")
+    arguments = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    model = DelayModel()
+    features, target = model.preprocess(generate_flights(arguments.training_rows), target_column="delay")
+    model.fit(features, target)
+    compiled = model.compile()
+
+    with tempfile.TemporaryDirectory() as artifact_dir:
+        artifact_location = os.path.join(artifact_dir, "delay_model.json")
+        model.save(artifact_location)
+        print("{:>9} {:>14} {:>12} {:>8} {:>8}".format(
+            "runtime", "cold start (s)", "max RSS (MB)", "xgboost", "sklearn"))
+        for runtime in RUNTIMES:
+            result = measure_cold_start(artifact_location, runtime)
+            print("{:>9} {:>14.2f} {:>12.0f} {:>8} {:>8}".format(
+                runtime, result["seconds"], result["max_rss_mb"], str(result["xgboost"]), str(result["sklearn"])))
+
+    encoder = FeatureEncoder(DelayModel.Top_10_Features)
+    flights = generate_flights(max(arguments.batch_sizes), seed=1)[["OPERA", "TIPOVUELO", "MES"]]
+    encoded = encoder.encode_bitmask_columns(flights["OPERA"], flights["TIPOVUELO"], flights["MES"].to_numpy())
+    encoded = encoder.decode_bitmasks(encoded)
+    print()
+    print("{:>7} {:>13} {:>13} {:>15} {:>9}".format("batch", "booster (us)", "compiled (us)", "compiled (fl/s)",
+                                                    "speedup"))
+    for batch_size in arguments.batch_sizes:
+        batch = encoded[:batch_size]
+        assert np.array_equal(model.predict_booster(batch), compiled.predict_booster(batch))
+        repetitions = max(3, min(1000, arguments.max_flights // batch_size))
+        booster_time = time_per_call(lambda: model.predict_proba(batch), repetitions)
+        compiled_time = time_per_call(lambda: compiled.predict_proba(batch), repetitions)
+        print("{:>7} {:>13.1f} {:>13.1f} {:>15.0f} {:>8.1f}x".format(
+            batch_size, booster_time * 1e6, compiled_time * 1e6, batch_size / compiled_time,
+            booster_time / compiled_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from challenge.utils import get_min_diff, get_min_diffs
+from tests.benchmark.synthetic import generate_flights
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def time_call(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare row-wise and columnar min_diff computation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    arguments = parser.parse_args()
+    # The row-wise version logs every early flight; keep the comparison about the computation.
+    logging.disable(logging.WARNING)
+
+    print("{:>10} {:>12} {:>12} {:>8}".format("rows", "apply (s)", "columnar (s)", "speedup"))
+    for size in arguments.sizes:
+        data = generate_flights(size)
+        row_wise, row_wise_time = time_call(data.apply, get_min_diff, axis=1)
+        columnar, columnar_time = time_call(get_min_diffs, data)
+        assert np.allclose(row_wise.to_numpy(), columnar.to_numpy())
+        print("{:>10} {:>12.3f} {:>12.3f} {:>7.1f}x".format(size, row_wise_time, columnar_time,
+                                                          row_wise_time / columnar_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import argparse
+import logging
+
+import numpy as np
+
+from challenge.encoder import FeatureEncoder
+from challenge.model import DelayModel
+from tests.benchmark.synthetic import generate_flights
+from tests.benchmark.timing import time_per_call
+
+DEFAULT_BATCH_SIZES = [1, 10, 100, 1000]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare booster and lookup table prediction latency")
+    parser.add_argument("--training-rows", type=int, default=50_000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--repetitions", type=int, default=200)
+    arguments = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    model = DelayModel()
+    features, target = model.preprocess(generate_flights(arguments.training_rows), target_column="delay")
+    model.fit(features, target)
+    encoder = FeatureEncoder(DelayModel.Top_10_Features)
+    flights = generate_flights(max(arguments.batch_sizes), seed=1)[["OPERA", "TIPOVUELO", "MES"]]
+    flights = [{"OPERA": opera, "TIPOVUELO": flight_type, "MES": int(month)}
+               for opera, flight_type, month in flights.itertuples(index=False)]
+
+    print("{:>6} {:>14} {:>14} {:>16} {:>16}".format(
+        "batch", "booster (us)", "lookup (us)", "booster (fl/s)", "lookup (fl/s)"))
+    for batch_size in arguments.batch_sizes:
+        batch = flights[:batch_size]
+        booster_labels = model.predict(encoder.encode(batch))
+        lookup_labels = model.predict_lookup(encoder.encode_bitmask(batch)).tolist()
+        assert np.array_equal(booster_labels, lookup_labels)
+
+        booster_time = time_per_call(lambda: model.predict(encoder.encode(batch)), arguments.repetitions)
+        lookup_time = time_per_call(lambda: model.predict_lookup(encoder.encode_bitmask(batch)).tolist(),
+                                    arguments.repetitions)
+        print("{:>6} {:>14.1f} {:>14.1f} {:>16.0f} {:>16.0f}".format(
+            batch_size, booster_time * 1e6, lookup_time * 1e6, batch_size / booster_time, batch_size / lookup_time))
+
+
+if __name__ == "__main__":
+    main()
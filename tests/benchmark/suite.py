@@ -0,0 +1,206 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from tests.benchmark.synthetic import generate_flights
+
+DEFAULT_SIZES = [10_000, 100_000]
+DEFAULT_BATCH_SIZES = [1, 100, 10_000]
+DEFAULT_TOLERANCE = 0.25
+# Absolute slack added to the allowed value of each metric, so tiny cases do not flap.
+COMPARED_METRICS = {"min_seconds": 0.0001, "peak_memory_mb": 0.5}
+
+
+def measure(function, repetitions):
+    """ Times function over several runs, then runs it once more tracing allocations
+
+        A first, untimed run absorbs lazy imports and first-call setup, which would otherwise
+        skew the timings when there are few repetitions.
+
+        Args:
+            function (callable): the code to measure, without arguments.
+            repetitions (int): amount of timed runs.
+
+        Returns:
+            dict: median and minimum seconds per run, and peak traced memory in megabytes.
+    """
+    function()
+    timings = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": statistics.median(timings),
+        "min_seconds": min(timings),
+        "peak_memory_mb": peak / (1 << 20)
+    }
+
+
+def call_asgi(app, method, path, body):
+    """ Sends a single request straight to an ASGI app, without any transport in between
+
+        Returns:
+            tuple: status code and response body.
+    """
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+             "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+             "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 80)}
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    response = {"status": None, "body": b""}
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    asyncio.run(app(scope, receive, send))
+    return response["status"], response["body"]
+
+
+def run_suite(sizes, batch_sizes, repetitions):
+    # Imported here, after main sets REPO_ROOT: challenge.api reads its settings on import, and the
+    # model is prepared on the first /predict call, since call_asgi sends no startup event.
+    from challenge.api import app
+    from challenge.encoder import FeatureEncoder
+    from challenge.model import DelayModel
+    from challenge.utils import adjust_dummy_columns, get_dummy_representation, get_min_diff, get_min_diffs
+
+    results = {}
+    for size in sizes:
+        data = generate_flights(size)
+        flights = data[["OPERA", "TIPOVUELO", "MES"]]
+        if size <= 100_000:
+            results["min_diff_apply/{}".format(size)] = measure(
+                lambda: data.apply(get_min_diff, axis=1), max(1, repetitions // 3))
+        results["min_diffs/{}".format(size)] = measure(lambda: get_min_diffs(data), repetitions)
+        results["preprocess/{}".format(size)] = measure(
+            lambda: DelayModel().preprocess(data.copy(), target_column="delay"), repetitions)
+        results["dummies/{}".format(size)] = measure(
+            lambda: adjust_dummy_columns(get_dummy_representation(flights), DelayModel.Top_10_Features),
+            repetitions)
+        features, target = DelayModel().preprocess(data.copy(), target_column="delay")
+        results["fit/{}".format(size)] = measure(lambda: DelayModel().fit(features, target), repetitions)
+
+    model = DelayModel()
+    features, target = model.preprocess(generate_flights(max(sizes)), target_column="delay")
+    model.fit(features, target)
+    compiled_model = model.compile()
+    encoder = FeatureEncoder(DelayModel.Top_10_Features)
+    scoring_data = generate_flights(max(batch_sizes), seed=1)[["OPERA", "TIPOVUELO", "MES"]]
+    scoring_flights = [{"OPERA": opera, "TIPOVUELO": flight_type, "MES": int(month)}
+                       for opera, flight_type, month in scoring_data.itertuples(index=False)]
+    for batch_size in batch_sizes:
+        batch = scoring_flights[:batch_size]
+        batch_features = adjust_dummy_columns(get_dummy_representation(scoring_data.head(batch_size)),
+                                              DelayModel.Top_10_Features)
+        results["predict/{}".format(batch_size)] = measure(lambda: model.predict(batch_features), repetitions)
+        encoded_batch = encoder.encode(batch)
+        results["predict_booster/{}".format(batch_size)] = measure(
+            lambda: model.predict_booster(encoded_batch), repetitions)
+        results["predict_compiled/{}".format(batch_size)] = measure(
+            lambda: compiled_model.predict_booster(encoded_batch), repetitions)
+        results["encode_predict/{}".format(batch_size)] = measure(
+            lambda: model.predict(encoder.encode(batch)), repetitions)
+        results["encode_predict_lookup/{}".format(batch_size)] = measure(
+            lambda: model.predict_lookup(encoder.encode_bitmask(batch)).tolist(), repetitions)
+        body = json.dumps({"flights": batch}).encode()
+        status, _ = call_asgi(app, "POST", "/predict", body)
+        assert status == 200, "/predict answered {}".format(status)
+        results["api_predict/{}".format(batch_size)] = measure(
+            lambda: call_asgi(app, "POST", "/predict", body), repetitions)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """ Finds the cases that got slower, or use more memory, than the baseline allows
+
+        Speed is compared on the fastest run, which is the least affected by noise.
+
+        Args:
+            results (dict): results of this run.
+            baseline (dict): results of a previous run.
+            tolerance (float): allowed relative increase.
+
+        Returns:
+            list[str]: a description of every regression.
+    """
+    regressions = []
+    for case, baseline_result in sorted(baseline.items()):
+        if case not in results:
+            continue
+        for metric, slack in COMPARED_METRICS.items():
+            allowed = baseline_result[metric] * (1 + tolerance) + slack
+            if results[case][metric] > allowed:
+                regressions.append("{} {}: {:.6g} > {:.6g} (baseline {:.6g})".format(
+                    case, metric, results[case][metric], allowed, baseline_result[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark preprocessing, training and serving on synthetic data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="rows of flight history for preprocessing and training")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES,
+                        help="flights per prediction request")
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--output", default="reports/benchmark.json")
+    parser.add_argument("--baseline", help="results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="relative increase over the baseline reported as a regression")
+    arguments = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as root_path:
+        os.makedirs(os.path.join(root_path, "data"))
+        generate_flights(max(arguments.sizes)).to_csv(os.path.join(root_path, "data/data.csv"), index=False)
+        os.environ["REPO_ROOT"] = root_path
+        os.environ.pop("MODEL_ARTIFACT", None)
+        results = run_suite(arguments.sizes, arguments.batch_sizes, arguments.repetitions)
+
+    report = {
+        "environment": {"python": platform.python_version(), "machine": platform.machine(),
+                        "cpus": os.cpu_count()},
+        "results": results
+    }
+    output_dir = os.path.dirname(arguments.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(arguments.output, "w") as output_file:
+        json.dump(report, output_file, indent=2, sort_keys=True)
+
+    print("{:<32} {:>12} {:>12}".format("case", "median (ms)", "peak (MB)"))
+    for case, result in sorted(results.items()):
+        print("{:<32} {:>12.3f} {:>12.2f}".format(case, result["seconds"] * 1000, result["peak_memory_mb"]))
+
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file)["results"], arguments.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
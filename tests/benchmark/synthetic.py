@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+OPERATORS = ["Grupo LATAM", "Sky Airline", "Aerolineas Argentinas", "Copa Air", "Latin American Wings",
+             "Avianca", "JetSmart SPA", "Gol Trans", "American Airlines", "Air Canada", "Iberia",
+             "Delta Air", "Aeromexico", "United Airlines", "Oceanair Linhas Aereas", "Alitalia",
+             "K.L.M.", "British Airways", "Qantas Airways", "Lacsa", "Austral", "Plus Ultra Lineas Aereas",
+             "Air France"]
+FLIGHT_TYPES = ["I", "N"]
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def generate_flights(rows, seed=0):
+    """ Generates a random flight history with the same columns data.csv has
+
+        Delays depend on a few of the features the model keeps, so that a model
+        trained on this data learns something, and some flights leave early.
+
+        Args:
+            rows (int): amount of flights.
+            seed (int): seed of the random generator.
+
+        Returns:
+            pd.DataFrame: raw flight data.
+    """
+    generator = np.random.default_rng(seed)
+    operators = generator.choice(OPERATORS, rows)
+    flight_types = generator.choice(FLIGHT_TYPES, rows)
+    months = generator.integers(1, 13, rows)
+    scheduled = pd.Timestamp("2017-01-01") + pd.to_timedelta(generator.integers(0, 365 * 24 * 60, rows), unit="m")
+    expected_delay = ((operators == "Latin American Wings") * 8 + (operators == "Grupo LATAM") * 4
+                      + np.isin(months, [7, 10, 12]) * 6 + (flight_types == "I") * 5 + 3)
+    delay = generator.normal(expected_delay, 12, rows).round()
+    early = generator.random(rows) < 0.001
+    delay[early] = -generator.integers(61, 180, early.sum())
+    operated = scheduled + pd.to_timedelta(delay, unit="m")
+    return pd.DataFrame({
+        "Fecha-I": scheduled.strftime(DATE_FORMAT),
+        "Vlo-I": "226",
+        "Ori-I": "SCEL",
+        "Des-I": "KMIA",
+        "Emp-I": "AAL",
+        "Fecha-O": operated.strftime(DATE_FORMAT),
+        "Vlo-O": "226",
+        "Ori-O": "SCEL",
+        "Des-O": "KMIA",
+        "Emp-O": "AAL",
+        "DIA": scheduled.day,
+        "MES": months,
+        "AÑO": scheduled.year,
+        "DIANOM": "Lunes",
+        "TIPOVUELO": flight_types,
+        "OPERA": operators,
+        "SIGLAORI": "Santiago",
+        "SIGLADES": "Miami"
+    })
@@ -0,0 +1,13 @@
+import time
+
+
+def time_per_call(function, repetitions):
+    """ Runs function repetitions times in a row
+
+        Returns:
+            float: average seconds per call.
+    """
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        function()
+    return (time.perf_counter() - start) / repetitions
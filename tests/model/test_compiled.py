@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from challenge.compiled import CompiledDelayModel, TreeEnsemble
+from challenge.encoder import FeatureEncoder
+from challenge.model import DelayModel
+from challenge.model_wrapper import ModelWrapper
+from challenge.utils import get_file_fingerprint
+
+
+class TestCompiledModel(unittest.TestCase):
+    DEFAULT_REPO_ROOT = "/home/pablo/Documents/latamLab/mllabpabloliva/"
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.root_path = os.environ.get("REPO_ROOT", TestCompiledModel.DEFAULT_REPO_ROOT)
+        data = pd.read_csv(filepath_or_buffer=os.path.join(self.root_path, "data/data.csv"), low_memory=False)
+        self.model = DelayModel({"n_estimators": 30, "max_depth": 4, "learning_rate": 0.3})
+        self.features, self.target = self.model.preprocess(data=data, target_column="delay")
+
+    def test_compile(
+        self
+    ):
+        self.model.fit(features=self.features, target=self.target)
+        compiled = self.model.compile()
+
+        self.assertIsInstance(compiled, CompiledDelayModel)
+        self.assertEqual(self.model.predict(self.features), compiled.predict(self.features))
+        np.testing.assert_allclose(self.model.predict_proba(self.features), compiled.predict_proba(self.features),
+                                   rtol=0, atol=1e-6)
+        reachable_features = FeatureEncoder(DelayModel.Top_10_Features).get_reachable_features()
+        bitmasks = FeatureEncoder.get_bitmasks(reachable_features)
+        np.testing.assert_array_equal(self.model.predict_lookup(bitmasks), compiled.predict_lookup(bitmasks))
+        ModelWrapper.warm_up(compiled)
+
+    def test_compile_rows_one_by_one_and_missing_values(
+        self
+    ):
+        self.model.fit(features=self.features, target=self.target)
+        ensemble = self.model.compile()._ensemble
+        features = np.random.default_rng(1).normal(size=(200, len(DelayModel.Top_10_Features))).astype(np.float32)
+        features[::3, 5] = np.nan
+        np.testing.assert_allclose(self.model.predict_proba(features), ensemble.predict_proba(features),
+                                   rtol=0, atol=1e-6)
+        np.testing.assert_array_equal(ensemble.walk(features[:40]), ensemble.predict_margin(features[:40]))
+
+    def test_compile_early_stopping(
+        self
+    ):
+        model = DelayModel({"n_estimators": 300, "learning_rate": 0.3, "max_depth": 3})
+        model.fit(features=self.features, target=self.target, early_stopping_rounds=5)
+        compiled = model.compile()
+        self.assertEqual(model.get_best_iteration() + 1, len(compiled._ensemble.roots))
+        self.assertEqual(model.predict(self.features), compiled.predict(self.features))
+
+    def test_load(
+        self
+    ):
+        self.model.fit(features=self.features, target=self.target)
+        data_fingerprint = get_file_fingerprint(os.path.join(self.root_path, "data/data.csv"))
+        with tempfile.TemporaryDirectory() as artifact_dir:
+            artifact_location = os.path.join(artifact_dir, "delay_model.json")
+            self.model.save(artifact_location, data_fingerprint=data_fingerprint)
+            compiled = CompiledDelayModel.load(artifact_location, data_fingerprint=data_fingerprint)
+            with self.assertRaises(ValueError):
+                CompiledDelayModel.load(artifact_location, data_fingerprint="other fingerprint")
+            with mock.patch.dict(os.environ, {"MODEL_RUNTIME": "compiled", "MODEL_ARTIFACT": artifact_location}):
+                served = ModelWrapper.build_model()
+        self.assertEqual(self.model.predict(self.features), compiled.predict(self.features))
+        self.assertIsInstance(served, CompiledDelayModel)
+        self.assertEqual(compiled.predict(self.features), served.predict(self.features))
+
+    def test_reject_training_and_saving(
+        self
+    ):
+        self.model.fit(features=self.features, target=self.target)
+        compiled = self.model.compile()
+        self.assertIs(compiled, compiled.compile())
+        self.assertTrue(0 <= compiled.evaluate(self.features, self.target)["f1_delayed"] <= 1)
+        with self.assertRaises(TypeError):
+            compiled.fit(features=self.features, target=self.target)
+        with self.assertRaises(TypeError):
+            compiled.fit_incremental(self.features, self.target)
+        with self.assertRaises(TypeError):
+            compiled.get_params()
+        with tempfile.TemporaryDirectory() as artifact_dir:
+            with self.assertRaises(TypeError):
+                compiled.save(os.path.join(artifact_dir, "delay_model.json"))
+
+    def test_reject_unsupported_boosters(
+        self
+    ):
+        booster = {"learner": {"objective": {"name": "reg:squarederror"}, "gradient_booster": {"name": "gbtree"}}}
+        with self.assertRaises(ValueError):
+            TreeEnsemble.from_booster_json(booster)
@@ -0,0 +1,100 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from challenge.encoder import FeatureEncoder
+from challenge.model import DelayModel
+from challenge.utils import adjust_dummy_columns, get_dummy_representation
+
+
+class TestFeatureEncoder(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.encoder = FeatureEncoder(DelayModel.Top_10_Features)
+        self.flights = [
+            {"OPERA": "Aerolineas Argentinas", "TIPOVUELO": "N", "MES": 3},
+            {"OPERA": "Grupo LATAM", "TIPOVUELO": "I", "MES": 7},
+            {"OPERA": "Sky Airline", "TIPOVUELO": "N", "MES": 12},
+            {"OPERA": "Latin American Wings", "TIPOVUELO": "I", "MES": 1},
+            {"OPERA": "Copa Air", "TIPOVUELO": "N", "MES": 11}
+        ]
+
+    def test_encode_matches_dummy_representation(
+        self
+    ):
+        features = self.encoder.encode(self.flights)
+        expected = adjust_dummy_columns(get_dummy_representation(pd.DataFrame(self.flights)),
+                                        DelayModel.Top_10_Features)
+
+        self.assertEqual(np.float32, features.dtype)
+        self.assertEqual((len(self.flights), len(DelayModel.Top_10_Features)), features.shape)
+        np.testing.assert_array_equal(expected.to_numpy(dtype=np.float32), features)
+
+    def test_encode_empty(
+        self
+    ):
+        self.assertEqual((0, len(DelayModel.Top_10_Features)), self.encoder.encode([]).shape)
+
+    def test_encode_invalid(
+        self
+    ):
+        invalid_flights = [
+            {"OPERA": "", "TIPOVUELO": "N", "MES": 3},
+            {"OPERA": "Grupo LATAM", "TIPOVUELO": "O", "MES": 3},
+            {"OPERA": "Grupo LATAM", "TIPOVUELO": "N", "MES": 13},
+            {"OPERA": "Grupo LATAM", "TIPOVUELO": "N", "MES": 0},
+            {"OPERA": "Grupo LATAM", "TIPOVUELO": "N", "MES": "3"},
+            {"TIPOVUELO": "N", "MES": 3},
+            "Grupo LATAM"
+        ]
+        for flight in invalid_flights:
+            with self.assertRaises(ValueError):
+                self.encoder.encode(self.flights + [flight])
+
+    def test_encode_bitmask(
+        self
+    ):
+        bitmasks = self.encoder.encode_bitmask(self.flights)
+        np.testing.assert_array_equal(FeatureEncoder.get_bitmasks(self.encoder.encode(self.flights)), bitmasks)
+        self.assertEqual(0, bitmasks[0])
+
+    def test_get_reachable_features(
+        self
+    ):
+        reachable_features = self.encoder.get_reachable_features()
+        # 4 operators or none, international or not, 5 months or none
+        self.assertEqual(5 * 2 * 6, len(reachable_features))
+        self.assertEqual(len(reachable_features), len(set(FeatureEncoder.get_bitmasks(reachable_features))))
+        self.assertTrue(set(self.encoder.encode_bitmask(self.flights))
+                        <= set(FeatureEncoder.get_bitmasks(reachable_features)))
+
+    def test_encode_bitmask_columns(
+        self
+    ):
+        operators = [flight["OPERA"] for flight in self.flights]
+        flight_types = [flight["TIPOVUELO"] for flight in self.flights]
+        months = [flight["MES"] for flight in self.flights]
+        bitmasks = self.encoder.encode_bitmask_columns(operators, flight_types, months)
+        np.testing.assert_array_equal(self.encoder.encode_bitmask(self.flights), bitmasks)
+        np.testing.assert_array_equal(self.encoder.encode(self.flights), self.encoder.decode_bitmasks(bitmasks))
+
+    def test_get_valid_rows(
+        self
+    ):
+        valid_rows = self.encoder.get_valid_rows(["Grupo LATAM", "", None, float("nan"), "Copa Air", "Copa Air"],
+                                                 ["I", "N", "N", "N", "O", "I"],
+                                                 [1, 2, 3, 4, 5, 13])
+        self.assertEqual([True, False, False, False, False, False], valid_rows.tolist())
+        with self.assertRaises(ValueError):
+            self.encoder.encode_bitmask_columns(["Grupo LATAM"], ["I"], [13])
+
+    def test_should_reject_unknown_operators(
+        self
+    ):
+        encoder = FeatureEncoder(DelayModel.Top_10_Features, operators=DelayModel.Operators)
+        self.assertEqual(len(self.flights), len(encoder.encode_bitmask(self.flights)))
+        with self.assertRaises(ValueError):
+            encoder.encode_bitmask(self.flights + [{"OPERA": "Argentinas", "TIPOVUELO": "N", "MES": 3}])
+        valid_rows = encoder.get_valid_rows(["Grupo LATAM", "Argentinas"], ["I", "I"], [1, 1])
+        self.assertEqual([True, False], valid_rows.tolist())
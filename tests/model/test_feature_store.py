@@ -0,0 +1,60 @@
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from challenge.feature_store import FeatureStore
+
+
+class TestFeatureStore(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.store_dir = tempfile.TemporaryDirectory()
+        self.feature_store = FeatureStore(self.store_dir.name)
+        self.spec = {"version": 1, "features": ["MES_7", "TIPOVUELO_I"], "delay_threshold": 15}
+
+    def tearDown(self) -> None:
+        self.store_dir.cleanup()
+        super().tearDown()
+
+    def test_get_key(
+        self
+    ):
+        key = FeatureStore.get_key("fingerprint", self.spec)
+        self.assertEqual(key, FeatureStore.get_key("fingerprint", dict(self.spec)))
+        self.assertNotEqual(key, FeatureStore.get_key("other fingerprint", self.spec))
+        self.assertNotEqual(key, FeatureStore.get_key("fingerprint", dict(self.spec, delay_threshold=30)))
+
+    def test_save_and_load(
+        self
+    ):
+        key = FeatureStore.get_key("fingerprint", self.spec)
+        self.assertIsNone(self.feature_store.load(key))
+
+        features = np.array([[0, 1], [1, 0], [1, 1]], dtype=np.uint8)
+        target = np.array([0, 1, 1], dtype=np.uint8)
+        self.feature_store.save(key, features, target, metadata={"spec": self.spec})
+        cached_features, cached_target = self.feature_store.load(key)
+
+        np.testing.assert_array_equal(features, cached_features)
+        np.testing.assert_array_equal(target, cached_target)
+        self.assertEqual([key], os.listdir(self.store_dir.name))
+
+    def test_save_prunes_stale_entries(
+        self
+    ):
+        features = np.array([[0, 1], [1, 0]], dtype=np.uint8)
+        target = np.array([0, 1], dtype=np.uint8)
+        keys = [FeatureStore.get_key("fingerprint {}".format(version), self.spec) for version in range(4)]
+        for key in keys[:3]:
+            self.feature_store.save(key, features, target)
+            time.sleep(0.01)
+        self.assertEqual(sorted(keys[1:3]), sorted(os.listdir(self.store_dir.name)))
+
+        self.assertIsNotNone(self.feature_store.load(keys[1]))
+        time.sleep(0.01)
+        self.feature_store.save(keys[3], features, target)
+        self.assertEqual(sorted([keys[1], keys[3]]), sorted(os.listdir(self.store_dir.name)))
+        self.assertIsNone(self.feature_store.load(keys[0]))
@@ -1,11 +1,18 @@
 import unittest
 import logging
 import os
+import tempfile
+import numpy as np
 import pandas as pd
 
+from mockito import ANY, unstub, when
+
 from sklearn.metrics import classification_report
 from sklearn.model_selection import train_test_split
+from challenge import model as model_module
+from challenge.encoder import FeatureEncoder
 from challenge.model import DelayModel
+from challenge.utils import get_file_fingerprint, get_file_stat
 
 class TestModel(unittest.TestCase):
 
@@ -117,6 +124,230 @@ class TestModel(unittest.TestCase):
         assert len(predicted_targets) == features_validation.shape[0]
         assert all(isinstance(predicted_target, int) for predicted_target in predicted_targets)
 
+    def test_model_predict_lookup(
+        self
+    ):
+        features, target = self.model.preprocess(
+            data=self.data,
+            target_column="delay"
+        )
+        self.model.fit(
+            features=features,
+            target=target
+        )
+
+        encoded_features = features.to_numpy(dtype=np.float32)
+        predicted_targets = self.model.predict_lookup(FeatureEncoder.get_bitmasks(encoded_features))
+        self.assertEqual(self.model.predict(features), predicted_targets.tolist())
+
+    def test_model_predict_booster(
+        self
+    ):
+        features, target = self.model.preprocess(
+            data=self.data,
+            target_column="delay"
+        )
+        self.model.fit(
+            features=features,
+            target=target
+        )
+
+        predicted_targets = self.model.predict_booster(features.to_numpy(dtype=np.float32))
+        self.assertEqual(np.uint8, predicted_targets.dtype)
+        self.assertEqual(self.model.predict(features), predicted_targets.tolist())
+        self.assertEqual(predicted_targets.tolist(), self.model.predict_booster(features.to_numpy()).tolist())
+
+    def test_model_predict_proba(
+        self
+    ):
+        features, target = self.model.preprocess(
+            data=self.data,
+            target_column="delay"
+        )
+        self.model.fit(
+            features=features,
+            target=target
+        )
+
+        probabilities = self.model.predict_proba(features)
+        self.assertEqual(len(features), len(probabilities))
+        self.assertEqual(self.model.predict(features), (probabilities > 0.5).astype(int).tolist())
+        bitmasks = FeatureEncoder.get_bitmasks(features.to_numpy())
+        np.testing.assert_allclose(probabilities, self.model.predict_lookup_proba(bitmasks), rtol=1e-6)
+        self.assertEqual((probabilities > 0.3).tolist(),
+                         self.model.predict_lookup(bitmasks, threshold=0.3).astype(bool).tolist())
+
+    def test_model_fit_from_file(
+        self
+    ):
+        with tempfile.TemporaryDirectory() as data_dir:
+            data_location = os.path.join(data_dir, "data.csv")
+            self.data.to_csv(data_location, index=False)
+            self.model.fit_from_file(data_location, chunk_size=1000)
+            single_chunk_model = DelayModel()
+            single_chunk_model.fit_from_file(data_location, chunk_size=len(self.data))
+
+        features = self.model.preprocess(data=self.data)
+        predicted_targets = self.model.predict(features)
+        self.assertEqual(single_chunk_model.predict(features), predicted_targets)
+        self.assertEqual(predicted_targets,
+                         self.model.predict_lookup(FeatureEncoder.get_bitmasks(features.to_numpy())).tolist())
+
+    def test_model_preprocess_file(
+        self
+    ):
+        with tempfile.TemporaryDirectory() as data_dir:
+            data_location = os.path.join(data_dir, "data.csv")
+            self.data.to_csv(data_location, index=False)
+            features, target = self.model.preprocess_file(data_location, target_column="delay")
+
+            when(DelayModel).preprocess(...).thenRaise(AssertionError("the feature store was not used"))
+            try:
+                cached_features, cached_target = self.model.preprocess_file(data_location, target_column="delay")
+            finally:
+                unstub()
+
+            self.data.head(1000).to_csv(data_location, index=False)
+            self.assertEqual(1000, len(self.model.preprocess_file(data_location)))
+
+        np.testing.assert_array_equal(features.to_numpy(dtype=np.uint8), cached_features.to_numpy())
+        np.testing.assert_array_equal(target.to_numpy(dtype=np.uint8), cached_target.to_numpy())
+        self.assertEqual(list(features.columns), list(cached_features.columns))
+
+    def test_model_fit_early_stopping(
+        self
+    ):
+        features, target = self.model.preprocess(
+            data=self.data,
+            target_column="delay"
+        )
+        model = DelayModel({"n_estimators": 500, "learning_rate": 0.3, "max_depth": 3})
+        model.fit(features=features, target=target, early_stopping_rounds=5)
+
+        best_iteration = model.get_best_iteration()
+        self.assertIsNotNone(best_iteration)
+        self.assertLess(best_iteration, 499)
+        self.assertEqual(model.predict(features), model.predict_booster(features.to_numpy()).tolist())
+        with tempfile.TemporaryDirectory() as artifact_dir:
+            artifact_location = os.path.join(artifact_dir, "model.json")
+            model.save(artifact_location)
+            loaded_model = DelayModel.load(artifact_location)
+        self.assertEqual(best_iteration, loaded_model.get_best_iteration())
+        np.testing.assert_array_equal(model.predict_proba(features), loaded_model.predict_proba(features))
+
+    def test_model_fit_incremental(
+        self
+    ):
+        model = DelayModel({"n_estimators": 20, "learning_rate": 0.3, "max_depth": 3})
+        history_rows = len(self.data) * 2 // 3
+        history = self.data.head(history_rows).copy()
+        features, target = model.preprocess(data=history, target_column="delay")
+        model.fit(features=features, target=target)
+        new_features, new_target = model.preprocess(data=self.data.iloc[history_rows:].copy(), target_column="delay")
+
+        metrics = model.fit_incremental(new_features, new_target, rounds=5)
+
+        self.assertEqual(25, model._model.get_booster().num_boosted_rounds())
+        self.assertEqual(len(self.data), model.get_class_counts().sum())
+        all_target = pd.concat([target, new_target])
+        self.assertAlmostEqual((all_target.delay == 0).sum() / (all_target.delay == 1).sum(),
+                               model._model.scale_pos_weight)
+        self.assertTrue(0 <= metrics["f1_delayed"] <= 1)
+        self.assertEqual(model.predict(new_features), model.predict_booster(new_features.to_numpy()).tolist())
+        with self.assertRaises(ValueError):
+            DelayModel().fit_incremental(new_features, new_target)
+
+    def test_model_fit_incremental_after_load(
+        self
+    ):
+        model = DelayModel({"n_estimators": 10, "learning_rate": 0.5, "max_depth": 8, "n_jobs": 2})
+        history_rows = len(self.data) * 2 // 3
+        features, target = model.preprocess(data=self.data.head(history_rows).copy(), target_column="delay")
+        model.fit(features=features, target=target)
+        new_features, new_target = model.preprocess(data=self.data.iloc[history_rows:].copy(), target_column="delay")
+
+        with tempfile.TemporaryDirectory() as artifact_dir:
+            artifact_location = os.path.join(artifact_dir, "delay_model.json")
+            model.save(artifact_location)
+            loaded_model = DelayModel.load(artifact_location)
+        self.assertEqual(0.5, loaded_model._model.learning_rate)
+        self.assertEqual(8, loaded_model._model.max_depth)
+        self.assertNotIn("n_jobs", model.get_params())
+        self.assertEqual(model._model.scale_pos_weight, loaded_model._model.scale_pos_weight)
+
+        loaded_model.fit_incremental(new_features, new_target, rounds=5)
+        model.fit_incremental(new_features, new_target, rounds=5)
+        self.assertEqual(0.5, loaded_model._model.learning_rate)
+        self.assertEqual(10, loaded_model.get_params()["n_estimators"])
+        self.assertEqual(15, loaded_model._model.get_booster().num_boosted_rounds())
+        np.testing.assert_allclose(model.predict_proba(new_features), loaded_model.predict_proba(new_features),
+                                   atol=1e-6)
+
+    def test_model_build_reference(
+        self
+    ):
+        features, target = self.model.preprocess(data=self.data, target_column="delay")
+        self.model.fit(features=features, target=target)
+        with tempfile.TemporaryDirectory() as data_dir:
+            data_location = os.path.join(data_dir, "data.csv")
+            self.data.to_csv(data_location, index=False)
+            self.model.build_reference_from_file(data_location, chunk_size=5000)
+        reference = self.model.get_reference()
+
+        self.assertEqual(len(self.data), reference["flights"])
+        self.assertEqual(sum(self.model.predict(features)), reference["predicted_delayed"])
+        self.assertEqual(self.data["OPERA"].value_counts().to_dict(), reference["OPERA"])
+        self.assertEqual(len(self.data), sum(reference["MES"].values()))
+        self.model.build_reference(self.data.head(10), update=True)
+        self.assertEqual(len(self.data) + 10, self.model.get_reference()["flights"])
+
+    def test_model_save_and_load(
+        self
+    ):
+        features, target = self.model.preprocess(
+            data=self.data,
+            target_column="delay"
+        )
+        self.model.fit(
+            features=features,
+            target=target
+        )
+        self.model.build_reference(self.data)
+
+        with tempfile.TemporaryDirectory() as artifact_dir:
+            artifact_location = os.path.join(artifact_dir, "delay_model.json")
+            self.model.save(artifact_location, data_fingerprint="fingerprint")
+            loaded_model = DelayModel.load(artifact_location, data_fingerprint="fingerprint")
+            self.assertEqual(self.model.predict(features), loaded_model.predict(features))
+            self.assertEqual(self.model.get_reference(), loaded_model.get_reference())
+
+            with self.assertRaises(ValueError):
+                DelayModel.load(artifact_location, data_fingerprint="other fingerprint")
+
+    def test_model_load_checks_data_stat(
+        self
+    ):
+        model = DelayModel({"n_estimators": 5})
+        features, target = model.preprocess(data=self.data.head(1000).copy(), target_column="delay")
+        model.fit(features=features, target=target)
+
+        with tempfile.TemporaryDirectory() as artifact_dir:
+            artifact_location = os.path.join(artifact_dir, "delay_model.json")
+            data_location = os.path.join(artifact_dir, "data.csv")
+            self.data.head(1000).to_csv(data_location, index=False)
+            model.save(artifact_location, get_file_fingerprint(data_location), get_file_stat(data_location))
+
+            when(model_module).get_file_fingerprint(ANY).thenRaise(AssertionError("hashed unchanged data"))
+            try:
+                DelayModel.load(artifact_location, data_location=data_location)
+            finally:
+                unstub(model_module)
+
+            with open(data_location, "a") as data_file:
+                data_file.write(self.data.head(1).to_csv(index=False, header=False))
+            with self.assertRaises(ValueError):
+                DelayModel.load(artifact_location, data_location=data_location)
+
     def test_model_constructor(
         self
     ):
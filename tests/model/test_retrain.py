@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from challenge import retrain
+from challenge.model import DelayModel
+
+
+class TestRetrain(unittest.TestCase):
+    DEFAULT_REPO_ROOT = "/home/pablo/Documents/latamLab/mllabpabloliva/"
+
+    def setUp(self) -> None:
+        super().setUp()
+        root_path = os.environ.get("REPO_ROOT", TestRetrain.DEFAULT_REPO_ROOT)
+        self.data = pd.read_csv(filepath_or_buffer=os.path.join(root_path, "data/data.csv"), low_memory=False)
+
+    def test_get_candidates(
+        self
+    ):
+        grid = {"max_depth": [3, 4, 6], "learning_rate": [0.01, 0.1]}
+        candidates = retrain.get_candidates(grid, "grid", trials=2, seed=1)
+        self.assertEqual(6, len(candidates))
+        self.assertIn({"learning_rate": 0.1, "max_depth": 4}, candidates)
+        sampled = retrain.get_candidates(grid, "random", trials=2, seed=1)
+        self.assertEqual(2, len(sampled))
+        self.assertEqual(sampled, retrain.get_candidates(grid, "random", trials=2, seed=1))
+        self.assertTrue(all(candidate in candidates for candidate in sampled))
+
+    def test_get_best(
+        self
+    ):
+        results = [{"params": {"max_depth": depth}, "metrics": {"roc_auc": score}}
+                   for depth, score in ((3, float("nan")), (4, 0.7), (6, 0.6))]
+        self.assertEqual({"max_depth": 4}, retrain.get_best(results, "roc_auc")["params"])
+        self.assertEqual({"max_depth": 4}, retrain.get_best(results[::-1], "roc_auc")["params"])
+        with self.assertRaises(ValueError):
+            retrain.get_best(results[:1], "roc_auc")
+
+    def test_search(
+        self
+    ):
+        candidates = [{"max_depth": 3, "learning_rate": 0.3}, {"max_depth": 2, "learning_rate": 0.3}]
+        with tempfile.TemporaryDirectory() as data_dir:
+            data_location = os.path.join(data_dir, "data.csv")
+            self.data.head(5000).to_csv(data_location, index=False)
+            results = retrain.search(data_location, candidates, workers=2, early_stopping_rounds=5)
+
+        self.assertEqual(sorted(json.dumps(candidate, sort_keys=True) for candidate in candidates),
+                         sorted(json.dumps(result["params"], sort_keys=True) for result in results))
+        for result in results:
+            self.assertLess(result["best_iteration"], retrain.MAX_ESTIMATORS)
+            self.assertTrue(0 <= result["metrics"]["f1_delayed"] <= 1)
+            self.assertTrue(0 <= result["metrics"]["roc_auc"] <= 1)
+
+    def test_retrain_incremental(
+        self
+    ):
+        with tempfile.TemporaryDirectory() as data_dir:
+            data_location = os.path.join(data_dir, "data.csv")
+            artifact_location = os.path.join(data_dir, "model.json")
+            self.data.head(5000).to_csv(data_location, index=False)
+            model = DelayModel({"n_estimators": 10})
+            model.fit(*model.preprocess(self.data.head(5000).copy(), target_column="delay"))
+            model.save(artifact_location)
+
+            unchanged = retrain.retrain_incremental(data_location, artifact_location, rounds=3)
+            self.data.head(8000).to_csv(data_location, index=False)
+            summary = retrain.retrain_incremental(data_location, artifact_location, rounds=3)
+            updated = DelayModel.load(artifact_location)
+            self.data.head(100).to_csv(data_location, index=False)
+            with self.assertRaises(ValueError):
+                retrain.retrain_incremental(data_location, artifact_location, rounds=3)
+
+        self.assertEqual({"seen_rows": 5000, "new_rows": 0, "rounds": 3, "metrics": None}, unchanged)
+        self.assertEqual(3000, summary["new_rows"])
+        self.assertIn("roc_auc", summary["metrics"])
+        self.assertEqual(8000, updated.get_class_counts().sum())
+        self.assertEqual(13, updated._model.get_booster().num_boosted_rounds())
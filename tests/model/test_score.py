@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from challenge import score
+from challenge.encoder import FeatureEncoder
+from challenge.model import DelayModel
+
+
+class TestScore(unittest.TestCase):
+    DEFAULT_REPO_ROOT = "/home/pablo/Documents/latamLab/mllabpabloliva/"
+
+    def setUp(self) -> None:
+        super().setUp()
+        root_path = os.environ.get("REPO_ROOT", TestScore.DEFAULT_REPO_ROOT)
+        self.data = pd.read_csv(filepath_or_buffer=os.path.join(root_path, "data/data.csv"), low_memory=False)
+        self.model = DelayModel()
+        features, target = self.model.preprocess(data=self.data.copy(), target_column="delay")
+        self.model.fit(features=features, target=target)
+
+    def test_get_csv_partitions(
+        self
+    ):
+        with tempfile.TemporaryDirectory() as data_dir:
+            data_location = os.path.join(data_dir, "flights.csv")
+            with open(data_location, "w") as data_file:
+                data_file.write("OPERA,TIPOVUELO,MES\n" + "Grupo LATAM,I,7\n" * 100)
+            partitions = score.get_csv_partitions(data_location, partition_bytes=100)
+            rows = [len(score.read_csv_partition(data_location, start, end)) for start, end in partitions]
+
+        self.assertGreater(len(partitions), 1)
+        self.assertEqual(100, sum(rows))
+        self.assertEqual(len("OPERA,TIPOVUELO,MES\n"), partitions[0][0])
+        self.assertTrue(all(end == start for (_, end), (start, _) in zip(partitions, partitions[1:])))
+
+    def test_score_file_blank_and_infinite(
+        self
+    ):
+        with tempfile.TemporaryDirectory() as data_dir:
+            data_location = os.path.join(data_dir, "flights.csv")
+            output_location = os.path.join(data_dir, "predictions.csv")
+            invalid_location = os.path.join(data_dir, "invalid.csv")
+            with open(data_location, "w") as data_file:
+                data_file.write("OPERA,TIPOVUELO,MES\nGrupo LATAM,I,7\nGrupo LATAM,I,inf\n\nSky Airline,N,-inf\n"
+                                "Grupo LATAM,N,3\n")
+            summary = score.score_file(data_location, output_location, invalid_location, self.model, workers=1)
+            predictions = pd.read_csv(output_location, skip_blank_lines=False)
+            invalid_flights = pd.read_csv(invalid_location, keep_default_na=False)
+
+        self.assertEqual(5, summary["rows"])
+        self.assertEqual(3, summary["invalid_rows"])
+        self.assertEqual([1, 2, 3], invalid_flights["row"].tolist())
+        self.assertEqual([0, 4], np.flatnonzero(predictions["prediction"].notna().to_numpy()).tolist())
+
+    def test_score_file(
+        self
+    ):
+        flights = self.data[["OPERA", "TIPOVUELO", "MES"]].head(2000).copy()
+        flights.loc[3, "OPERA"] = ""
+        flights.loc[1500, "MES"] = 13
+        flights.loc[1999, "TIPOVUELO"] = "X"
+        with tempfile.TemporaryDirectory() as data_dir:
+            data_location = os.path.join(data_dir, "flights.csv")
+            output_location = os.path.join(data_dir, "predictions.csv")
+            invalid_location = os.path.join(data_dir, "invalid.csv")
+            flights.to_csv(data_location, index=False)
+            summary = score.score_file(data_location, output_location, invalid_location, self.model,
+                                       workers=2, partition_bytes=4096)
+            predictions = pd.read_csv(output_location)
+            invalid_flights = pd.read_csv(invalid_location, keep_default_na=False)
+
+        self.assertEqual(2000, summary["rows"])
+        self.assertEqual(3, summary["invalid_rows"])
+        self.assertGreater(summary["partitions"], 2)
+        self.assertEqual(2000, len(predictions))
+        self.assertEqual([3, 1500, 1999], invalid_flights["row"].tolist())
+        self.assertEqual(["", "X"], [invalid_flights["OPERA"][0], invalid_flights["TIPOVUELO"][2]])
+        valid_rows = predictions["prediction"].notna().to_numpy()
+        self.assertEqual([3, 1500, 1999], np.flatnonzero(~valid_rows).tolist())
+        encoder = FeatureEncoder(DelayModel.Top_10_Features)
+        bitmasks = encoder.encode_bitmask_columns(flights["OPERA"][valid_rows], flights["TIPOVUELO"][valid_rows],
+                                                  flights["MES"][valid_rows].to_numpy(), validate=False)
+        self.assertEqual(self.model.predict_lookup(bitmasks).tolist(),
+                         predictions["prediction"][valid_rows].astype(int).tolist())
+        np.testing.assert_allclose(self.model.predict_lookup_proba(bitmasks),
+                                   predictions["probability"][valid_rows], atol=1e-4)
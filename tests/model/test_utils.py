@@ -1,9 +1,12 @@
 import unittest
 
 from datetime import datetime
+import os
+import tempfile
 import pandas as pd
 
-from challenge.utils import adjust_dummy_columns, get_dummy_representation, get_min_diff, reduce_features
+from challenge.utils import adjust_dummy_columns, get_dummy_representation, get_file_fingerprint, get_min_diff, \
+    get_min_diffs, reduce_features
 
 class TestModel(unittest.TestCase):
     def setUp(self) -> None:
@@ -126,3 +129,26 @@ class TestModel(unittest.TestCase):
         test_raw_data_after = {'Fecha-I': '2017-01-01 7:30:00', 'Fecha-O': '2017-01-01 5:15:00'}
         min_diff_after = get_min_diff(test_raw_data_after)
         self.assertEqual(min_diff_after, -135.0)
+
+    def test_get_min_diffs(
+        self
+    ):
+        self.data.loc[4, 'Fecha-O'] = '2017-01-05 21:15:00'
+        expected = self.data.apply(get_min_diff, axis=1)
+        with self.assertLogs(level='WARNING') as logs:
+            min_diffs = get_min_diffs(self.data)
+        self.assertEqual(expected.tolist(), min_diffs.tolist())
+        self.assertEqual(-135.0, min_diffs[4])
+        self.assertEqual(1, len(logs.records))
+
+    def test_get_file_fingerprint(
+        self
+    ):
+        with tempfile.TemporaryDirectory() as data_dir:
+            data_location = os.path.join(data_dir, "data.csv")
+            self.data.to_csv(data_location, index=False)
+            fingerprint = get_file_fingerprint(data_location)
+            self.assertEqual(fingerprint, get_file_fingerprint(data_location, chunk_size=7))
+
+            self.data.head(3).to_csv(data_location, index=False)
+            self.assertNotEqual(fingerprint, get_file_fingerprint(data_location))
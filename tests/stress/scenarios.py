@@ -0,0 +1,122 @@
+import logging
+import random
+
+from locust import HttpUser, events, task
+
+# Share of flights per operator, roughly as in the flight history.
+OPERATOR_WEIGHTS = {
+    "Grupo LATAM": 40.9, "Sky Airline": 20.9, "Aerolineas Argentinas": 2.8, "Copa Air": 2.8,
+    "Latin American Wings": 5.8, "Avianca": 1.7, "JetSmart SPA": 2.6, "Gol Trans": 1.2,
+    "American Airlines": 1.1, "Air Canada": 0.8, "Iberia": 0.5, "Delta Air": 0.5, "Aeromexico": 0.5,
+    "United Airlines": 0.5, "Oceanair Linhas Aereas": 0.4, "Alitalia": 0.4, "K.L.M.": 0.4,
+    "British Airways": 0.3, "Qantas Airways": 0.3, "Lacsa": 0.1, "Austral": 0.1,
+    "Plus Ultra Lineas Aereas": 0.1, "Air France": 0.5
+}
+FLIGHT_TYPE_WEIGHTS = {"N": 54.0, "I": 46.0}
+MONTH_WEIGHTS = {1: 9.1, 2: 8.1, 3: 8.3, 4: 7.3, 5: 7.4, 6: 7.3, 7: 9.4, 8: 7.6, 9: 7.8, 10: 8.4, 11: 8.7, 12: 9.4}
+INVALID_FLIGHTS = [
+    {"OPERA": "", "TIPOVUELO": "N", "MES": 3},
+    {"OPERA": "Grupo LATAM", "TIPOVUELO": "O", "MES": 3},
+    {"OPERA": "Grupo LATAM", "TIPOVUELO": "N", "MES": 13},
+    {"OPERA": "Grupo LATAM", "TIPOVUELO": "N"}
+]
+
+
+def sample_flights(amount):
+    operators = random.choices(list(OPERATOR_WEIGHTS), weights=list(OPERATOR_WEIGHTS.values()), k=amount)
+    flight_types = random.choices(list(FLIGHT_TYPE_WEIGHTS), weights=list(FLIGHT_TYPE_WEIGHTS.values()), k=amount)
+    months = random.choices(list(MONTH_WEIGHTS), weights=list(MONTH_WEIGHTS.values()), k=amount)
+    return [{"OPERA": operator, "TIPOVUELO": flight_type, "MES": month}
+            for operator, flight_type, month in zip(operators, flight_types, months)]
+
+
+def bursty_wait(user):
+    """ Sends requests back to back in bursts of a random length, with idle gaps between bursts """
+    if user.burst_left > 0:
+        user.burst_left -= 1
+        return random.uniform(0.0, 0.02)
+    user.burst_left = random.randint(1, user.environment.parsed_options.max_burst)
+    return random.expovariate(1.0 / user.environment.parsed_options.mean_idle)
+
+
+@events.init_command_line_parser.add_listener
+def add_arguments(parser):
+    parser.add_argument("--slo-p50-ms", type=float, default=50.0, help="p50 latency threshold, in ms")
+    parser.add_argument("--slo-p95-ms", type=float, default=200.0, help="p95 latency threshold, in ms")
+    parser.add_argument("--slo-p99-ms", type=float, default=500.0, help="p99 latency threshold, in ms")
+    parser.add_argument("--slo-min-rps", type=float, default=0.0, help="minimum overall throughput")
+    parser.add_argument("--slo-max-failure-ratio", type=float, default=0.01, help="maximum share of failures")
+    parser.add_argument("--max-burst", type=int, default=20, help="longest burst of back to back requests")
+    parser.add_argument("--mean-idle", type=float, default=1.0, help="mean idle seconds between bursts")
+
+
+@events.quitting.add_listener
+def check_slo(environment, **kwargs):
+    options = environment.parsed_options
+    total = environment.stats.total
+    measured = {
+        "p50_ms": total.get_response_time_percentile(0.50),
+        "p95_ms": total.get_response_time_percentile(0.95),
+        "p99_ms": total.get_response_time_percentile(0.99),
+        "rps": total.total_rps,
+        "failure_ratio": total.fail_ratio
+    }
+    breaches = []
+    for name, threshold in (("p50_ms", options.slo_p50_ms), ("p95_ms", options.slo_p95_ms),
+                            ("p99_ms", options.slo_p99_ms), ("failure_ratio", options.slo_max_failure_ratio)):
+        if measured[name] > threshold:
+            breaches.append("{} {:.3f} > {:.3f}".format(name, measured[name], threshold))
+    if measured["rps"] < options.slo_min_rps:
+        breaches.append("rps {:.3f} < {:.3f}".format(measured["rps"], options.slo_min_rps))
+
+    for entry in sorted(environment.stats.entries.values(), key=lambda entry: entry.name):
+        logging.info("%-24s requests %7d  p50 %6.0fms  p95 %6.0fms  p99 %6.0fms  rps %8.2f", entry.name,
+                     entry.num_requests, entry.get_response_time_percentile(0.50),
+                     entry.get_response_time_percentile(0.95), entry.get_response_time_percentile(0.99),
+                     entry.total_rps)
+    logging.info("Total: p50 %.0fms, p95 %.0fms, p99 %.0fms, %.2f requests/s, failure ratio %.4f",
+                 measured["p50_ms"], measured["p95_ms"], measured["p99_ms"], measured["rps"],
+                 measured["failure_ratio"])
+    if breaches:
+        logging.error("SLO breached: %s", "; ".join(breaches))
+        environment.process_exit_code = 1
+    else:
+        logging.info("SLO met")
+
+
+class ScenarioUser(HttpUser):
+    wait_time = bursty_wait
+
+    def on_start(self):
+        self.burst_left = 0
+
+    def predict(self, amount):
+        self.client.post("/predict", json={"flights": sample_flights(amount)},
+                         name="/predict [{} flights]".format(amount))
+
+    @task(60)
+    def predict_single(self):
+        self.predict(1)
+
+    @task(25)
+    def predict_10(self):
+        self.predict(10)
+
+    @task(8)
+    def predict_100(self):
+        self.predict(100)
+
+    @task(2)
+    def predict_1000(self):
+        self.predict(1000)
+
+    @task(5)
+    def predict_invalid(self):
+        flights = sample_flights(random.randint(0, 9)) + [random.choice(INVALID_FLIGHTS)]
+        random.shuffle(flights)
+        with self.client.post("/predict", json={"flights": flights}, name="/predict [invalid]",
+                              catch_response=True) as response:
+            if response.status_code == 400:
+                response.success()
+            else:
+                response.failure("expected 400, got {}".format(response.status_code))